@@ -0,0 +1,3 @@
+from .families import FAMILIES, get_family
+
+__all__ = ['FAMILIES', 'get_family']
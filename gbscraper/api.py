@@ -0,0 +1,282 @@
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .db import DB_BUSY_TIMEOUT_MS, get_shard_path, get_snapshot_connection, load_shards
+from .indexes import quote_columns
+
+API_DEFAULT_PORT = 8080
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 5000
+API_STREAM_CHUNK_ROWS = 500
+API_CACHE_SIZE = 256
+API_CACHE_TTL = 60
+API_LOOKUPS = {'processor': 'Processor', 'model': 'Model'}
+
+api_state = {
+    'families': {},
+    'cache': collections.OrderedDict(),
+    'lock': threading.Lock(),
+    'watchers': {},
+    'watermarks': {},
+    'cache_ttl': API_CACHE_TTL,
+}
+
+def get_watcher_connection(path):
+    conn = api_state['watchers'].get(path)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        api_state['watchers'][path] = conn
+    return conn
+
+def get_commit_watermark(family):
+    conn = get_watcher_connection(family['database_file'])
+    watermark = [conn.execute('PRAGMA data_version').fetchone()[0]]
+    for start_id, end_id, shard_file, state in load_shards(conn.cursor()):
+        shard_conn = get_watcher_connection(get_shard_path(family, shard_file))
+        watermark.append((shard_file, shard_conn.execute('PRAGMA data_version').fetchone()[0]))
+    return tuple(watermark)
+
+def check_commit_watermark(family):
+    with api_state['lock']:
+        watermark = get_commit_watermark(family)
+        if api_state['watermarks'].get(family['key']) != watermark:
+            for key in [key for key in api_state['cache'] if key[0] == family['key']]:
+                del api_state['cache'][key]
+            api_state['watermarks'][family['key']] = watermark
+
+def get_cached_result(key):
+    with api_state['lock']:
+        entry = api_state['cache'].get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['time'] >= api_state['cache_ttl']:
+            del api_state['cache'][key]
+            return None
+        api_state['cache'].move_to_end(key)
+        return entry
+
+def store_cached_result(key, entry):
+    with api_state['lock']:
+        entry['time'] = time.time()
+        api_state['cache'][key] = entry
+        api_state['cache'].move_to_end(key)
+        while len(api_state['cache']) > API_CACHE_SIZE:
+            api_state['cache'].popitem(last=False)
+
+def get_label_column(family):
+    return 'Processor' if 'Processor' in family['data_columns'] else 'Model'
+
+def resolve_workload(family, workload):
+    if workload in family['workload_id_map']:
+        return family['workload_id_map'][workload]
+    parts = workload.split(':')
+    if len(parts) == 2 and all(part.isdigit() for part in parts):
+        return int(parts[0]), int(parts[1])
+    return None
+
+def iter_row_chunks(c, limit, page, transform=None):
+    fetched = 0
+    while True:
+        chunk = c.fetchmany(API_STREAM_CHUNK_ROWS)
+        if not chunk:
+            return
+        if fetched + len(chunk) > limit:
+            chunk = chunk[:limit - fetched]
+            page['more'] = True
+        fetched += len(chunk)
+        if transform and chunk:
+            chunk = transform(chunk)
+        page['rows'].extend(chunk)
+        if chunk:
+            yield chunk
+        if page['more']:
+            return
+
+def query_lookup(conn, family, column, value, limit, offset, page):
+    page['columns'] = ['id'] + family['score_fields']
+    c = conn.execute(f'SELECT id, {quote_columns(family["score_fields"])} FROM data WHERE "{column}" = ? ORDER BY id LIMIT ? OFFSET ?',
+                     (value, limit + 1, offset))
+    return iter_row_chunks(c, limit, page)
+
+def add_leaderboard_labels(conn, label_column, ranks, chunk):
+    ids = [id for id, score in chunk]
+    labels = dict(conn.execute(f'SELECT id, "{label_column}" FROM data WHERE id IN ({", ".join("?" * len(ids))})', ids))
+    return [(next(ranks), id, labels.get(id), score) for id, score in chunk]
+
+def query_leaderboard(conn, family, section_id, workload_id, limit, offset, page):
+    label_column = get_label_column(family)
+    page['columns'] = ['rank', 'id', label_column, 'score']
+    c = conn.execute('SELECT id, score FROM result_workloads WHERE workload_id = ? AND section_id = ? ORDER BY score DESC, id LIMIT ? OFFSET ?',
+                     (workload_id, section_id, limit + 1, offset))
+    ranks = itertools.count(offset + 1)
+    return iter_row_chunks(c, limit, page, lambda chunk: add_leaderboard_labels(conn, label_column, ranks, chunk))
+
+def query_result(conn, family, id, page):
+    c = conn.execute('SELECT * FROM data WHERE id = ?', (id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    page['columns'] = [description[0] for description in c.description]
+    page['rows'] = [row]
+    page['metrics'] = conn.execute('SELECT metric_id, value, fields FROM result_metrics WHERE id = ? ORDER BY metric_id', (id,)).fetchall()
+    page['workloads'] = conn.execute('SELECT section_id, workload_id, score, fields FROM result_workloads WHERE id = ? ORDER BY section_id, workload_id',
+                                     (id,)).fetchall()
+    return iter([page['rows']])
+
+def decode_fields(fields):
+    return json.loads(fields) if fields else None
+
+def write_chunk(handler, text):
+    handler.wfile.write(text.encode('utf-8'))
+
+def send_json_error(handler, status, message):
+    body = json.dumps({'error': message}).encode('utf-8')
+    handler.send_response(status)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+def stream_page(handler, output_format, kind, page, row_chunks, offset):
+    handler.response_started = True
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/csv; charset=utf-8' if output_format == 'csv' else 'application/json')
+    handler.end_headers()
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(page['columns'])
+        for chunk in row_chunks:
+            writer.writerows(chunk)
+            write_chunk(handler, buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        write_chunk(handler, buffer.getvalue())
+        return
+    if kind == 'result':
+        result = dict(zip(page['columns'], page['rows'][0]))
+        result['metrics'] = [{'metric_id': metric_id, 'value': value, 'fields': decode_fields(fields)} for metric_id, value, fields in page['metrics']]
+        result['workloads'] = [{'section_id': section_id, 'workload_id': workload_id, 'score': score, 'fields': decode_fields(fields)}
+                               for section_id, workload_id, score, fields in page['workloads']]
+        write_chunk(handler, json.dumps(result))
+        return
+    write_chunk(handler, f'{{"columns": {json.dumps(page["columns"])}, "offset": {offset}, "rows": [')
+    separator = ''
+    for chunk in row_chunks:
+        write_chunk(handler, separator + ', '.join(json.dumps(list(row)) for row in chunk))
+        separator = ', '
+    write_chunk(handler, f'], "next_offset": {offset + len(page["rows"]) if page["more"] else "null"}}}')
+
+def parse_page_args(query):
+    limit = int(query.get('limit', [API_PAGE_SIZE])[0])
+    offset = int(query.get('offset', [0])[0])
+    if not 1 <= limit <= API_MAX_PAGE_SIZE or offset < 0:
+        raise ValueError(f'limit must be between 1 and {API_MAX_PAGE_SIZE} and offset must not be negative')
+    return limit, offset
+
+def handle_query_request(handler):
+    handler.response_started = False
+    url = urlsplit(handler.path)
+    parts = [unquote(part) for part in url.path.split('/') if part]
+    query = parse_qs(url.query)
+    output_format = query.get('format', ['json'])[0]
+    if output_format not in ('json', 'csv'):
+        send_json_error(handler, 400, 'format must be json or csv')
+        return
+    if not parts:
+        send_json_error(handler, 404, f"use /<family>/processor/<name>, /<family>/model/<name>, /<family>/leaderboard/<workload> or /<family>/result/<id>; families: {', '.join(api_state['families'])}")
+        return
+    family = api_state['families'].get(parts[0])
+    if family is None or len(parts) != 3 or parts[1] not in tuple(API_LOOKUPS) + ('leaderboard', 'result'):
+        send_json_error(handler, 404, 'unknown family or endpoint')
+        return
+    kind, value = parts[1], parts[2]
+    try:
+        limit, offset = parse_page_args(query)
+    except ValueError as e:
+        send_json_error(handler, 400, str(e))
+        return
+    if kind in API_LOOKUPS and API_LOOKUPS[kind] not in family['data_columns']:
+        send_json_error(handler, 404, f"{family['name']} results have no {API_LOOKUPS[kind]} column")
+        return
+    if kind == 'leaderboard' and resolve_workload(family, value) is None:
+        send_json_error(handler, 404, f"unknown workload {value}; use a workload column name or <section_id>:<workload_id>")
+        return
+    if kind == 'result' and not value.isdigit():
+        send_json_error(handler, 400, 'result ID must be a number')
+        return
+    key = (family['key'], kind, value, limit, offset) if kind != 'result' else (family['key'], kind, value)
+    conn = None
+    try:
+        check_commit_watermark(family)
+        page = get_cached_result(key)
+        if page is not None:
+            stream_page(handler, output_format, kind, page, [page['rows']] if page['rows'] else [], offset)
+            return
+        page = {'columns': [], 'rows': [], 'more': False}
+        conn = get_snapshot_connection(family)
+        if kind in API_LOOKUPS:
+            row_chunks = query_lookup(conn, family, API_LOOKUPS[kind], value, limit, offset, page)
+        elif kind == 'leaderboard':
+            row_chunks = query_leaderboard(conn, family, *resolve_workload(family, value), limit, offset, page)
+        else:
+            row_chunks = query_result(conn, family, int(value), page)
+            if row_chunks is None:
+                send_json_error(handler, 404, f"{family['name']} ID {value} is not in the database")
+                return
+        stream_page(handler, output_format, kind, page, row_chunks, offset)
+        store_cached_result(key, page)
+    except sqlite3.Error as e:
+        if handler.response_started:
+            handler.close_connection = True
+        else:
+            send_json_error(handler, 500, f'database error: {e}')
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        if conn:
+            conn.close()
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        handle_query_request(self)
+
+    def log_message(self, format, *args):
+        pass
+
+def parse_serve_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port or API_DEFAULT_PORT)
+
+def serve_queries(families, address, cache_ttl=API_CACHE_TTL):
+    for family in families:
+        if not os.path.isfile(family['database_file']):
+            print(f"Database {family['database_file']} not found. Run the scraper first.")
+            return
+    api_state['families'] = {family['key']: family for family in families}
+    api_state['cache_ttl'] = cache_ttl
+    try:
+        host, port = parse_serve_address(address)
+        server = ThreadingHTTPServer((host, port), QueryRequestHandler)
+    except (ValueError, OSError) as e:
+        print(f"Cannot serve queries on {address}: {e}")
+        return
+    print(f"Serving read-only {' + '.join(family['name'] for family in families)} queries on http://{host}:{port}/ (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nQuery server stopped.")
+    finally:
+        server.server_close()
+        for conn in api_state['watchers'].values():
+            conn.close()
+        api_state['watchers'].clear()
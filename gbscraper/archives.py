@@ -0,0 +1,222 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+
+from .db import DB_BUSY_TIMEOUT_MS, configure_db_connection, get_populated_id_ranges
+from .idranges import clip_id_ranges, count_id_ranges, normalize_id_ranges, subtract_id_ranges
+from .shutdown import open_worker_pool
+
+ARCHIVE_INDEX_FILE = 'archive_index.db'
+ARCHIVE_HASH_CHUNK_SIZE = 1048576
+
+def get_archive_index_path(family):
+    return os.path.join(family['raw_data_dir'], ARCHIVE_INDEX_FILE)
+
+def get_archive_index_connection(family):
+    conn = sqlite3.connect(get_archive_index_path(family), timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    configure_db_connection(conn)
+    c = conn.cursor()
+    c.execute('PRAGMA journal_mode = WAL')
+    c.execute('''CREATE TABLE IF NOT EXISTS archives
+                 (range_name TEXT PRIMARY KEY, start_id INTEGER NOT NULL, end_id INTEGER NOT NULL,
+                  file_size INTEGER NOT NULL, mtime REAL NOT NULL, sha256 TEXT NOT NULL,
+                  member_count INTEGER NOT NULL, missing_count INTEGER NOT NULL,
+                  status TEXT NOT NULL, indexed REAL, verified REAL)''')
+    c.execute('CREATE INDEX IF NOT EXISTS archives_missing ON archives (missing_count) WHERE missing_count > 0')
+    c.execute('''CREATE TABLE IF NOT EXISTS archive_members
+                 (id INTEGER PRIMARY KEY, range_name TEXT NOT NULL, size INTEGER NOT NULL,
+                  compressed_size INTEGER NOT NULL, crc INTEGER NOT NULL)''')
+    c.execute('CREATE INDEX IF NOT EXISTS archive_members_range ON archive_members (range_name)')
+    conn.commit()
+    return conn
+
+def parse_archive_range_name(filename):
+    if not filename.endswith('.zip'):
+        return None
+    try:
+        start_id_str, end_id_str = filename[:-4].split('-')
+        return int(start_id_str), int(end_id_str)
+    except ValueError:
+        return None
+
+def hash_file(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(ARCHIVE_HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def build_archive_manifest(zip_path, extension):
+    try:
+        stat = os.stat(zip_path)
+        members = []
+        with zipfile.ZipFile(zip_path, 'r') as zipf:
+            for info in zipf.infolist():
+                if info.filename.endswith(extension) and info.filename[:-len(extension)].isdigit():
+                    members.append((int(info.filename[:-len(extension)]), info.file_size, info.compress_size, info.CRC))
+        return {'path': zip_path, 'file_size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': hash_file(zip_path),
+                'members': members, 'error': None}
+    except (OSError, zipfile.BadZipFile) as e:
+        return {'path': zip_path, 'error': str(e)}
+
+def list_raw_archives(family):
+    archives = []
+    with os.scandir(family['raw_data_dir']) as entries:
+        for entry in entries:
+            id_range = parse_archive_range_name(entry.name)
+            if id_range and entry.is_file():
+                stat = entry.stat()
+                archives.append((entry.name[:-4], id_range, entry.path, stat.st_size, stat.st_mtime))
+    return sorted(archives, key=lambda archive: archive[1])
+
+def record_archive_manifest(c, range_name, id_range, manifest, populated_ranges):
+    start_id, end_id = id_range
+    member_ranges = normalize_id_ranges((id, id) for id, size, compressed_size, crc in manifest['members'])
+    missing_count = count_id_ranges(subtract_id_ranges(clip_id_ranges(populated_ranges, start_id, end_id), member_ranges))
+    c.execute('DELETE FROM archive_members WHERE range_name = ?', (range_name,))
+    c.executemany('INSERT OR REPLACE INTO archive_members (id, range_name, size, compressed_size, crc) VALUES (?, ?, ?, ?, ?)',
+                  ((id, range_name, size, compressed_size, crc) for id, size, compressed_size, crc in manifest['members']))
+    c.execute('''INSERT OR REPLACE INTO archives (range_name, start_id, end_id, file_size, mtime, sha256, member_count,
+                 missing_count, status, indexed, verified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'indexed', ?, NULL)''',
+              (range_name, start_id, end_id, manifest['file_size'], manifest['mtime'], manifest['sha256'],
+               len(manifest['members']), missing_count, time.time()))
+
+def print_archive_progress(action, done, total):
+    sys.stdout.write(f'\r{action} archives: ({done}/{total}) ')
+    sys.stdout.flush()
+
+def index_raw_archives(family, processes=None, force=False):
+    if not os.path.isdir(family['raw_data_dir']):
+        print(f"Raw data directory {family['raw_data_dir']} not found. Skipping archive indexing.")
+        return
+    conn = None
+    try:
+        conn = get_archive_index_connection(family)
+        c = conn.cursor()
+        indexed = {range_name: (file_size, mtime) for range_name, file_size, mtime in c.execute('SELECT range_name, file_size, mtime FROM archives')}
+        archives = list_raw_archives(family)
+        current_names = set(archive[0] for archive in archives)
+        removed_names = [range_name for range_name in indexed if range_name not in current_names]
+        for range_name in removed_names:
+            c.execute('DELETE FROM archive_members WHERE range_name = ?', (range_name,))
+            c.execute('DELETE FROM archives WHERE range_name = ?', (range_name,))
+        conn.commit()
+        stale_archives = {path: (range_name, id_range) for range_name, id_range, path, file_size, mtime in archives
+                          if force or indexed.get(range_name) != (file_size, mtime)}
+        if not stale_archives:
+            print(f"Archive index for {family['name']} is up to date ({len(archives)} archives).")
+            return
+        print(f"Indexing {len(stale_archives)} of {len(archives)} {family['name']} archives...")
+        populated_ranges = get_populated_id_ranges(family)
+        failed_count = 0
+        with open_worker_pool(processes or os.cpu_count() or 1) as archive_pool:
+            tasks = [(path, family['raw_file_extension']) for path in stale_archives]
+            for done, manifest in enumerate(archive_pool.imap_unordered(build_archive_manifest_task, tasks), 1):
+                range_name, id_range = stale_archives[manifest['path']]
+                if manifest['error']:
+                    print(f"\nError reading archive {manifest['path']}: {manifest['error']}")
+                    failed_count += 1
+                    continue
+                record_archive_manifest(c, range_name, id_range, manifest, populated_ranges)
+                conn.commit()
+                print_archive_progress('Indexing', done, len(tasks))
+        print(f"\nIndexed {len(stale_archives) - failed_count} archives, {failed_count} unreadable, {len(removed_names)} removed from the index.")
+    except sqlite3.Error as e:
+        print(f"\nArchive index database error for {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def build_archive_manifest_task(task):
+    return build_archive_manifest(*task)
+
+def verify_archive(zip_path, file_size, sha256, member_crcs):
+    if not os.path.exists(zip_path):
+        return zip_path, 'missing', 'archive file not found'
+    try:
+        if os.path.getsize(zip_path) != file_size or hash_file(zip_path) != sha256:
+            return zip_path, 'modified', 'archive differs from its manifest'
+        with zipfile.ZipFile(zip_path, 'r') as zipf:
+            bad_member = zipf.testzip()
+            if bad_member:
+                return zip_path, 'corrupt', f'CRC check failed for {bad_member}'
+            archive_crcs = {info.filename: info.CRC for info in zipf.infolist()}
+        for filename, crc in member_crcs.items():
+            if archive_crcs.get(filename) != crc:
+                return zip_path, 'corrupt', f'member {filename} does not match its manifest CRC'
+        return zip_path, 'ok', None
+    except (OSError, zipfile.BadZipFile, EOFError) as e:
+        return zip_path, 'corrupt', str(e)
+
+def verify_archive_task(task):
+    return verify_archive(*task)
+
+def verify_raw_archives(family, processes=None):
+    if not os.path.exists(get_archive_index_path(family)):
+        print(f"No archive index for {family['name']}. Run with --index-archives first.")
+        return
+    conn = None
+    try:
+        conn = get_archive_index_connection(family)
+        c = conn.cursor()
+        extension = family['raw_file_extension']
+        archives = c.execute('SELECT range_name, file_size, sha256 FROM archives ORDER BY start_id').fetchall()
+        print(f"Verifying {len(archives)} {family['name']} archives against the index...")
+        tasks = []
+        for range_name, file_size, sha256 in archives:
+            member_crcs = {f'{id}{extension}': crc for id, crc in c.execute('SELECT id, crc FROM archive_members WHERE range_name = ?', (range_name,))}
+            tasks.append((os.path.join(family['raw_data_dir'], f'{range_name}.zip'), file_size, sha256, member_crcs))
+        status_counts = {}
+        with open_worker_pool(processes or os.cpu_count() or 1) as archive_pool:
+            for done, (zip_path, status, detail) in enumerate(archive_pool.imap_unordered(verify_archive_task, tasks), 1):
+                status_counts[status] = status_counts.get(status, 0) + 1
+                if detail:
+                    print(f"\nArchive {os.path.basename(zip_path)} is {status}: {detail}")
+                c.execute('UPDATE archives SET status = ?, verified = ? WHERE range_name = ?', (status, time.time(), os.path.basename(zip_path)[:-4]))
+                conn.commit()
+                print_archive_progress('Verifying', done, len(tasks))
+        print(f"\nVerification finished: {', '.join(f'{count} {status}' for status, count in sorted(status_counts.items())) or 'no archives'}.")
+    except sqlite3.Error as e:
+        print(f"\nArchive index database error for {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def is_id_archived(family, id, conn=None):
+    index_conn = conn or get_archive_index_connection(family)
+    try:
+        row = index_conn.execute('SELECT range_name FROM archive_members WHERE id = ?', (id,)).fetchone()
+        return row[0] if row else None
+    finally:
+        if conn is None:
+            index_conn.close()
+
+def get_incomplete_archives(family):
+    conn = get_archive_index_connection(family)
+    try:
+        return conn.execute('SELECT range_name, missing_count FROM archives WHERE missing_count > 0 ORDER BY start_id').fetchall()
+    finally:
+        conn.close()
+
+def print_archive_index_summary(family):
+    if not os.path.isdir(family['raw_data_dir']):
+        return
+    conn = None
+    try:
+        conn = get_archive_index_connection(family)
+        archive_count, member_count = conn.execute('SELECT COUNT(*), COALESCE(SUM(member_count), 0) FROM archives').fetchone()
+        incomplete_count, missing_count = conn.execute('SELECT COUNT(*), COALESCE(SUM(missing_count), 0) FROM archives WHERE missing_count > 0').fetchone()
+        bad_count = conn.execute("SELECT COUNT(*) FROM archives WHERE status NOT IN ('indexed', 'ok')").fetchone()[0]
+        print(f"Archive index: {archive_count} archives holding {member_count} documents, {incomplete_count} incomplete ({missing_count} populated IDs not archived), {bad_count} failed verification.")
+        if incomplete_count:
+            incomplete_archives = get_incomplete_archives(family)
+            print("Incomplete archives (populated IDs missing): " + ", ".join(f"{range_name} ({archive_missing_count})" for range_name, archive_missing_count in incomplete_archives[:10])
+                  + (", ..." if len(incomplete_archives) > 10 else ""))
+    except sqlite3.Error as e:
+        print(f"Archive index database error for {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
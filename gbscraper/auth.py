@@ -0,0 +1,202 @@
+import getpass
+import json
+import os
+
+import requests
+from bs4 import BeautifulSoup
+
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+COOKIE_FILE = 'geekbench_cookies.json'
+LOGIN_URL = 'https://browser.geekbench.com/session/create'
+LOGIN_PAGE_URL = 'https://browser.geekbench.com/session/new'
+USERNAME_FIELD_NAME = 'user[username]'
+PASSWORD_FIELD_NAME = 'user[password]'
+AUTHENTICITY_TOKEN_FIELD_NAME = 'authenticity_token'
+CREDENTIALS_FILE = 'geekbench_credentials.json'
+CREDENTIALS_USERNAME_ENV = 'GEEKBENCH_USERNAME'
+CREDENTIALS_PASSWORD_ENV = 'GEEKBENCH_PASSWORD'
+KEYRING_SERVICE = 'geekbench-scraper'
+SESSION_REFRESH_MAX_ATTEMPTS = 3
+
+def save_cookies(cookies, filename):
+    try:
+        cookie_list = []
+        for cookie in cookies:
+            cookie_list.append({
+                'name': cookie.name,
+                'value': cookie.value,
+                'path': cookie.path,
+                'domain': cookie.domain,
+                'expires': cookie.expires,
+                'secure': cookie.secure,
+                'rest': cookie._rest
+            })
+        temp_filename = f'{filename}.tmp'
+        with open(temp_filename, 'w') as f:
+            json.dump(cookie_list, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+    except Exception as e:
+        print(f"Error saving cookies: {e}")
+
+def load_cookies(filename):
+    try:
+        with open(filename, 'r') as f:
+            cookie_list = json.load(f)
+        cookies = requests.cookies.RequestsCookieJar()
+        for cookie_dict in cookie_list:
+            name = cookie_dict.get('name')
+            value = cookie_dict.get('value')
+            if name is not None and value is not None:
+                cookies.set(
+                    name, value,
+                    path=cookie_dict.get('path'),
+                    domain=cookie_dict.get('domain'),
+                    expires=cookie_dict.get('expires'),
+                    secure=cookie_dict.get('secure', False)
+                )
+        return cookies
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading cookies: {e}")
+        return None
+
+def login_and_get_cookies(username, password):
+    print("Attempting to log in...")
+    login_session = requests.Session()
+    try:
+        print(f"Fetching login page from {LOGIN_PAGE_URL} to get authenticity token...")
+        login_page_response = login_session.get(LOGIN_PAGE_URL, timeout=10)
+        login_page_response.raise_for_status()
+        soup = BeautifulSoup(login_page_response.text, 'html.parser')
+        authenticity_token_tag = soup.find('meta', {'name': 'csrf-token'})
+        if authenticity_token_tag and 'content' in authenticity_token_tag.attrs:
+            authenticity_token = authenticity_token_tag['content']
+            print(f"Successfully extracted authenticity token.")
+        else:
+            print("Could not find authenticity token on the login page.")
+            return None
+    except requests.RequestException as e:
+        print(f"Error fetching login page: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while parsing login page: {e}")
+        return None
+    login_payload = {
+        AUTHENTICITY_TOKEN_FIELD_NAME: authenticity_token,
+        USERNAME_FIELD_NAME: username,
+        PASSWORD_FIELD_NAME: password,
+    }
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36',
+        'Accept': 'application/json, text/javascript, */*; q=0.01',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Referer': LOGIN_PAGE_URL,
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Connection': 'keep-alive',
+    }
+    try:
+        print(f"Sending login POST request to {LOGIN_URL}...")
+        response = login_session.post(LOGIN_URL, data=login_payload, headers=headers, allow_redirects=False, timeout=10)
+        if response.status_code == 302 or (response.status_code == 200 and 'Set-Cookie' in response.headers):
+             print("Login request successful based on status code/headers!")
+             if login_session.cookies:
+                 print("Session cookies obtained.")
+                 return login_session.cookies
+             else:
+                 print("Login request successful, but no session cookies were obtained.")
+                 print(f"Response status code: {response.status_code}")
+                 return None
+        else:
+            print(f"Login request failed. Status code: {response.status_code}")
+            try:
+                error_data = response.json()
+                print(f"Error response: {error_data}")
+            except json.JSONDecodeError:
+                pass
+            return None
+    except requests.RequestException as e:
+        print(f"An error occurred during login POST request: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred during login: {e}")
+        return None
+
+def authenticate_interactively(max_attempts=5):
+    print("No valid saved cookies found. Attempting to log in.")
+    for attempt in range(max_attempts):
+        username = input(f"Attempt {attempt + 1}/{max_attempts} - Username (Email): ")
+        password = getpass.getpass("Password: ")
+        authenticated_cookies = login_and_get_cookies(username, password)
+        if authenticated_cookies:
+            save_cookies(authenticated_cookies, COOKIE_FILE)
+            print("Authentication successful.")
+            return authenticated_cookies
+        print("Authentication failed.")
+    return None
+
+def get_stored_credentials():
+    username = os.environ.get(CREDENTIALS_USERNAME_ENV)
+    password = os.environ.get(CREDENTIALS_PASSWORD_ENV)
+    if username and password:
+        return username, password, 'environment'
+    if keyring is not None and username:
+        try:
+            password = keyring.get_password(KEYRING_SERVICE, username)
+        except Exception as e:
+            print(f"Error reading password from keyring: {e}")
+            password = None
+        if password:
+            return username, password, 'keyring'
+    return load_credentials_file(CREDENTIALS_FILE)
+
+def load_credentials_file(filename):
+    try:
+        with open(filename, 'r') as f:
+            credentials = json.load(f)
+        if credentials.get('username') and credentials.get('password'):
+            return credentials['username'], credentials['password'], filename
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading credentials from {filename}: {e}")
+    return None
+
+def refresh_session(cookies_ref, max_attempts=SESSION_REFRESH_MAX_ATTEMPTS):
+    credentials = get_stored_credentials()
+    if not credentials:
+        print(f"No stored credentials found (set {CREDENTIALS_USERNAME_ENV}/{CREDENTIALS_PASSWORD_ENV}, a keyring entry or {CREDENTIALS_FILE}). Cannot refresh the session.")
+        return False
+    username, password, credentials_source = credentials
+    for attempt in range(max_attempts):
+        print(f"Refreshing session with credentials from {credentials_source} (attempt {attempt + 1}/{max_attempts})...")
+        authenticated_cookies = login_and_get_cookies(username, password)
+        if authenticated_cookies:
+            save_cookies(authenticated_cookies, COOKIE_FILE)
+            cookies_ref[0] = authenticated_cookies
+            print("Session refreshed.")
+            return True
+    print("Session refresh failed.")
+    return False
+
+def refresh_cookie_file(credentials_file, cookie_file, max_attempts=SESSION_REFRESH_MAX_ATTEMPTS):
+    credentials = load_credentials_file(credentials_file)
+    if not credentials:
+        print(f"No credentials found in {credentials_file}. Cannot refresh the session in {cookie_file}.")
+        return None
+    username, password, credentials_source = credentials
+    for attempt in range(max_attempts):
+        print(f"Refreshing the session in {cookie_file} with credentials from {credentials_source} (attempt {attempt + 1}/{max_attempts})...")
+        authenticated_cookies = login_and_get_cookies(username, password)
+        if authenticated_cookies:
+            save_cookies(authenticated_cookies, cookie_file)
+            print("Session refreshed.")
+            return authenticated_cookies
+    print(f"Session refresh for {cookie_file} failed.")
+    return None
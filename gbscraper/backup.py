@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+import time
+
+from .db import get_shard_path, get_snapshot_connection, load_shards
+
+BACKUP_STEP_PAGES = 256
+BACKUP_RATE_MB = 50
+
+def is_backup_current(source_path, target_path):
+    return (os.path.exists(target_path) and os.path.getsize(target_path) == os.path.getsize(source_path)
+            and os.path.getmtime(target_path) >= os.path.getmtime(source_path))
+
+def get_backup_targets(family, backup_dir, c):
+    targets = [('main', os.path.join(backup_dir, os.path.basename(family['database_file'])))]
+    for shard_index, (start_id, end_id, shard_file, state) in enumerate(load_shards(c)):
+        target_path = os.path.join(backup_dir, shard_file)
+        if state != 'sealed' or not is_backup_current(get_shard_path(family, shard_file), target_path):
+            targets.append((f'shard_{shard_index}', target_path))
+    return targets
+
+def throttle_backup(throttle, stop_event, copied_pages):
+    if stop_event.is_set():
+        raise InterruptedError('backup stopped')
+    if throttle['rate_mb']:
+        copied_bytes = (throttle['pages'] + copied_pages) * throttle['page_size']
+        delay = copied_bytes / (throttle['rate_mb'] * 1048576) - (time.time() - throttle['started'])
+        if delay > 0 and stop_event.wait(delay):
+            raise InterruptedError('backup stopped')
+
+def backup_database(family, backup_dir, stop_event, rate_mb=BACKUP_RATE_MB, step_pages=BACKUP_STEP_PAGES):
+    conn = None
+    partial_path = None
+    throttle = {'rate_mb': rate_mb, 'pages': 0, 'page_size': 0, 'started': time.time()}
+    try:
+        conn = get_snapshot_connection(family)
+        c = conn.cursor()
+        targets = get_backup_targets(family, backup_dir, c)
+        for schema, target_path in targets:
+            c.execute(f'SELECT COUNT(*) FROM {schema}.sqlite_master').fetchone()
+        throttle['page_size'] = c.execute('PRAGMA page_size').fetchone()[0]
+        for schema, target_path in targets:
+            os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+            partial_path = target_path + '.partial'
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            target = sqlite3.connect(partial_path)
+            try:
+                conn.backup(target, pages=step_pages, name=schema,
+                            progress=lambda status, remaining, total: throttle_backup(throttle, stop_event, total - remaining))
+                target.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target.close()
+            throttle['pages'] += c.execute(f'PRAGMA {schema}.page_count').fetchone()[0]
+            os.replace(partial_path, target_path)
+            partial_path = None
+        elapsed = time.time() - throttle['started']
+        backup_mb = throttle['pages'] * throttle['page_size'] / 1048576
+        print(f"\nBacked up {family['name']} database ({len(targets)} files, {backup_mb:.1f} MB) to {backup_dir} in {elapsed:.1f}s ({backup_mb / elapsed if elapsed > 0 else 0:.1f} MB/s).")
+        return True
+    except InterruptedError:
+        print(f"\nBackup of {family['name']} database stopped before completion; files already in {backup_dir} are untouched.")
+        return False
+    except (sqlite3.Error, OSError) as e:
+        print(f"\nError backing up {family['name']} database to {backup_dir}: {e}")
+        return False
+    finally:
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+        if conn:
+            conn.close()
+
+def backup_task(stop_event, families, backup_dir, rate_mb, interval):
+    while True:
+        for family in families:
+            if stop_event.is_set():
+                return
+            backup_database(family, backup_dir, stop_event, rate_mb)
+        if not interval or stop_event.wait(interval):
+            return
+
+def start_backup(families, backup_dir, rate_mb=BACKUP_RATE_MB, interval=None):
+    stop_event = threading.Event()
+    backup_thread = threading.Thread(target=backup_task, args=(stop_event, families, backup_dir, rate_mb, interval))
+    backup_thread.daemon = True
+    backup_thread.start()
+    return backup_thread, stop_event
+
+def stop_backup(backup_thread, stop_event):
+    if backup_thread and backup_thread.is_alive():
+        stop_event.set()
+        backup_thread.join()
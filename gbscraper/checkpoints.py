@@ -0,0 +1,132 @@
+import sqlite3
+import time
+
+from .db import get_db_connection
+from .idranges import count_id_ranges, merge_id_ranges, normalize_id_ranges
+
+CHECKPOINT_FLUSH_INTERVAL = 5
+
+def iter_checkpoint_ids(ranges, watermark, outstanding_ids):
+    for id in sorted(outstanding_ids):
+        yield id
+    for start_id, end_id in ranges:
+        if end_id > watermark:
+            yield from range(max(start_id, watermark + 1), end_id + 1)
+
+def count_checkpoint_ids(ranges, watermark, outstanding_ids):
+    remaining = len(outstanding_ids)
+    for start_id, end_id in ranges:
+        if end_id > watermark:
+            remaining += end_id - max(start_id, watermark + 1) + 1
+    return remaining
+
+def get_checkpoint_remaining_ranges(checkpoint):
+    remaining_ranges = [(max(start_id, checkpoint['watermark'] + 1), end_id) for start_id, end_id in checkpoint['ranges'] if end_id > checkpoint['watermark']]
+    return merge_id_ranges(normalize_id_ranges((id, id) for id in checkpoint['outstanding_ids']), remaining_ranges)
+
+def load_checkpoint(family, phase):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('SELECT total, completed, watermark FROM phase_checkpoints WHERE phase = ?', (phase,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        total, completed, watermark = row
+        c.execute('SELECT start_id, end_id FROM phase_checkpoint_ranges WHERE phase = ? ORDER BY start_id', (phase,))
+        ranges = c.fetchall()
+        c.execute('SELECT id FROM phase_checkpoint_outstanding WHERE phase = ? ORDER BY id', (phase,))
+        outstanding_ids = [id for (id,) in c.fetchall()]
+        return {'phase': phase, 'total': total, 'completed': completed, 'watermark': watermark,
+                'ranges': ranges, 'outstanding_ids': outstanding_ids}
+    except sqlite3.Error as e:
+        print(f"Database error loading checkpoint for {phase}: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def list_checkpoints(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        return [phase for (phase,) in conn.execute('SELECT phase FROM phase_checkpoints ORDER BY phase')]
+    except sqlite3.Error as e:
+        print(f"Database error listing checkpoints: {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def save_checkpoint(family, phase, ranges):
+    total = count_id_ranges(ranges)
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('DELETE FROM phase_checkpoint_ranges WHERE phase = ?', (phase,))
+        c.execute('DELETE FROM phase_checkpoint_outstanding WHERE phase = ?', (phase,))
+        c.execute('INSERT OR REPLACE INTO phase_checkpoints (phase, total, completed, watermark, updated) VALUES (?, ?, 0, 0, ?)',
+                  (phase, total, time.time()))
+        c.executemany('INSERT INTO phase_checkpoint_ranges (phase, start_id, end_id) VALUES (?, ?, ?)',
+                      ((phase, start_id, end_id) for start_id, end_id in ranges))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error saving checkpoint for {phase}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return {'phase': phase, 'total': total, 'completed': 0, 'watermark': 0, 'ranges': ranges, 'outstanding_ids': []}
+
+def flush_checkpoint(family, phase, watermark, completed, outstanding_ids):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('UPDATE phase_checkpoints SET watermark = ?, completed = ?, updated = ? WHERE phase = ?',
+                  (watermark, completed, time.time(), phase))
+        c.execute('DELETE FROM phase_checkpoint_outstanding WHERE phase = ?', (phase,))
+        c.executemany('INSERT INTO phase_checkpoint_outstanding (phase, id) VALUES (?, ?)',
+                      ((phase, id) for id in outstanding_ids))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"\nDatabase error flushing checkpoint for {phase}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+def delete_checkpoint(family, phase):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('DELETE FROM phase_checkpoints WHERE phase = ?', (phase,))
+        c.execute('DELETE FROM phase_checkpoint_ranges WHERE phase = ?', (phase,))
+        c.execute('DELETE FROM phase_checkpoint_outstanding WHERE phase = ?', (phase,))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"\nDatabase error deleting checkpoint for {phase}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def start_checkpoint(family, phase, ranges):
+    checkpoint = load_checkpoint(family, phase)
+    if checkpoint:
+        remaining_ranges = get_checkpoint_remaining_ranges(checkpoint)
+        if remaining_ranges:
+            print(f"Adding {count_id_ranges(remaining_ranges)} unfinished IDs from the previous {phase} run.")
+        ranges = merge_id_ranges(ranges, remaining_ranges)
+    return save_checkpoint(family, phase, ranges)
+
+def resume_checkpoint(family, phase):
+    checkpoint = load_checkpoint(family, phase)
+    if checkpoint:
+        remaining = count_checkpoint_ids(checkpoint['ranges'], checkpoint['watermark'], checkpoint['outstanding_ids'])
+        print(f"Resuming {family['name']} {phase} from its checkpoint: {checkpoint['completed']}/{checkpoint['total']} done, {remaining} IDs left (watermark {checkpoint['watermark']}).")
+    return checkpoint
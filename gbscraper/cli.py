@@ -0,0 +1,323 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+
+from .api import API_CACHE_TTL, serve_queries
+from .archives import index_raw_archives, print_archive_index_summary, verify_raw_archives
+from .auth import COOKIE_FILE, authenticate_interactively, load_cookies, refresh_session
+from .backup import BACKUP_RATE_MB, start_backup, stop_backup
+from .checkpoints import list_checkpoints, resume_checkpoint, save_checkpoint, start_checkpoint
+from .db import (ensure_coverage, find_all_null_row_ranges, get_last_id_from_db,
+                 get_populated_id_ranges, initialize_database, print_coverage_summary, start_wal_checkpointer,
+                 stop_wal_checkpointer, validate_missing_ids)
+from .egress import load_egress_routes
+from .families import FAMILIES, get_family
+from .fetch import RAW_STORES, TRANSPORTS, create_worker_pool, format_transfer_stats, get_max_remote_id, get_transport_error
+from .idranges import collect_id_ranges, count_id_ranges, iter_id_ranges, subtract_id_ranges
+from .indexes import analyze_queries, defer_managed_indexes, start_index_builder, stop_index_builder
+from .leases import LEASE_DURATION, LEASE_RANGE_SIZE, execute_coordinated_scraping_phase
+from .maintenance import convert_to_incremental_vacuum
+from .merge import merge_sources
+from .packs import get_pack_lock_error, get_zstandard_error, repack_raw_archives, seal_finished_packs, train_pack_dictionary
+from .raw import compress_raw_data, organize_loose_raw_files
+from .reextract import reextract_stale_rows
+from .scheduler import SCHEDULER_BACKFILL_SHARE, make_checkpointed_source, make_live_source, make_work_source, run_scheduler
+from .scrub import scrub_raw_store
+from .shards import SHARD_SIZE, cleanup_null_rows_from_top, print_shard_summary, shard_database
+from .shutdown import SHUTDOWN_DRAIN_TIMEOUT, close_worker_pool, install_shutdown_handlers, is_shutdown_requested, terminate_worker_pool
+
+PHASE_X_NAME = "Phase X: Specific IDs"
+PHASE_N_NAME = "Phase N: All-NULL Rows"
+
+def read_id_tokens(f):
+    for line in f:
+        yield from line.replace(',', ' ').split()
+
+def iter_id_tokens(specific_ids):
+    for part in specific_ids.split(','):
+        part = part.strip()
+        if part == '-':
+            yield from read_id_tokens(sys.stdin)
+        elif part.startswith('@'):
+            try:
+                with open(part[1:], 'r') as f:
+                    yield from read_id_tokens(f)
+            except OSError as e:
+                print(f"Warning: Could not read IDs from {part[1:]}: {e}")
+        elif part:
+            yield part
+
+def parse_id_token(token):
+    start_str, separator, end_str = token.partition('-')
+    try:
+        start_id = int(start_str)
+        end_id = int(end_str) if separator else start_id
+    except ValueError:
+        return None
+    if start_id < 1 or end_id < start_id:
+        return None
+    return (start_id, end_id)
+
+def parse_specific_ids(specific_ids):
+    invalid_inputs = []
+    def iter_valid_ranges():
+        for token in iter_id_tokens(specific_ids):
+            id_range = parse_id_token(token)
+            if id_range:
+                yield id_range
+            else:
+                invalid_inputs.append(token)
+    specific_id_ranges = collect_id_ranges(iter_valid_ranges())
+    if invalid_inputs:
+        print(f"Warning: Skipping {len(invalid_inputs)} invalid specific ID inputs: {', '.join(invalid_inputs[:20])}{'...' if len(invalid_inputs) > 20 else ''}")
+    return specific_id_ranges
+
+def build_backfill_sources(family, args, specific_id_ranges):
+    backfill_sources = []
+    print(f"\n--- Phase 1: Running {family['name']} Database Validation and Fetching Missing IDs ---")
+    if args.coordinator:
+        print("Coordinator mode: missing IDs belong to other nodes' leases, skipping local gap fetching.")
+    else:
+        missing_id_ranges = validate_missing_ids(family)
+        if missing_id_ranges:
+            backfill_sources.append(make_work_source("Phase 1: Missing IDs", family, iter_id_ranges(missing_id_ranges)))
+        else:
+            print("\nNo missing IDs found by validation.")
+    if args.specific_ids:
+        print(f"\n--- Phase X: Fetching Specific {family['name']} IDs ---")
+        requested_count = count_id_ranges(specific_id_ranges)
+        if not args.include_populated:
+            specific_id_ranges = subtract_id_ranges(specific_id_ranges, get_populated_id_ranges(family))
+            if requested_count > count_id_ranges(specific_id_ranges):
+                print(f"Skipping {requested_count - count_id_ranges(specific_id_ranges)} IDs that are already populated (use --include-populated to fetch them anyway).")
+        if specific_id_ranges:
+            print(f"Phase X: {count_id_ranges(specific_id_ranges)} IDs in {len(specific_id_ranges)} ranges.")
+            checkpoint = start_checkpoint(family, PHASE_X_NAME, specific_id_ranges)
+            backfill_sources.append(make_checkpointed_source(PHASE_X_NAME, family, checkpoint))
+        else:
+            print("\nNo valid specific IDs left to fetch for Phase X.")
+    if args.N:
+        print(f"\n--- Phase N: Finding and Fetching {family['name']} Rows with All NULL Data ---")
+        checkpoint = resume_checkpoint(family, PHASE_N_NAME)
+        if checkpoint is None:
+            null_row_ranges = find_all_null_row_ranges(family)
+            if null_row_ranges:
+                checkpoint = save_checkpoint(family, PHASE_N_NAME, null_row_ranges)
+            else:
+                print("\nNo rows found with all specified data columns as NULL, skipping Phase N fetching.")
+        if checkpoint:
+            backfill_sources.append(make_checkpointed_source(PHASE_N_NAME, family, checkpoint))
+    started_phases = [source['checkpoint'] for source in backfill_sources if source.get('checkpoint')]
+    for phase in list_checkpoints(family):
+        if phase not in started_phases:
+            checkpoint = resume_checkpoint(family, phase)
+            if checkpoint:
+                backfill_sources.append(make_checkpointed_source(phase, family, checkpoint))
+    return backfill_sources
+
+def build_live_source(family, backfill_sources):
+    current_db_max_id = get_last_id_from_db(family)
+    print(f"\nGetting max remote ID for {family['name']}...")
+    max_remote_id = get_max_remote_id(family)
+    if max_remote_id is None:
+        print("Failed to get max remote ID. The live frontier will start from the database and retry.")
+        return make_live_source(family, current_db_max_id + 1, None)
+    print(f"Max remote ID found: {max_remote_id}. Catching up from DB ID {current_db_max_id + 1} while syncing new results.")
+    if max_remote_id > current_db_max_id:
+        backfill_sources.append(make_work_source("Phase 2: Catch-up", family, range(current_db_max_id + 1, max_remote_id + 1)))
+    return make_live_source(family, max_remote_id + 1, max_remote_id)
+
+def main(default_families=('gb5',)):
+    parser = argparse.ArgumentParser(description="Geekbench Data Scraper Script.")
+    parser.add_argument('-f', '--family', action='append', choices=sorted(FAMILIES), help=f"Benchmark family to scrape; repeat to scrape several from one process (default: {', '.join(default_families)}).")
+    parser.add_argument('-N', action='store_true', help='Run Phase N: Attempt to fetch data for rows with all NULL data.')
+    parser.add_argument('-c', action='store_true', help='Run Cleaning: Raw data compression.')
+    parser.add_argument('-s', '--specific-ids', type=str, help='Run Phase X: Fetch specific benchmark IDs for every selected family. Comma-separated IDs and ranges (1000000-2500000), @file for IDs or ranges listed in a file, or - to read them from stdin.')
+    parser.add_argument('--include-populated', action='store_true', help='Phase X: also fetch IDs that already have data (they are skipped by default).')
+    parser.add_argument('-C', '--continuous', action='store_true', help='Run Continuous Scraping (catch-up and live sync, scheduled together with any other phases). Default if -N and -s are NOT used.')
+    parser.add_argument('-o', action='store_true', help='Run Organization: Organize loose raw files into subfolders.')
+    parser.add_argument('--merge', nargs='+', metavar='SOURCE', help='Merge other nodes into this one. SOURCE is a node directory (databases and raw data) or, with a single family, a database file.')
+    parser.add_argument('--reextract', action='store_true', help="Re-extract rows stamped with an older extractor version from the local raw data (loose files and zips) without refetching them.")
+    parser.add_argument('--train-dictionary', action='store_true', help='Train a new zstd dictionary on a sample of raw documents; new pack records are compressed with it (needs zstandard).')
+    parser.add_argument('--repack', action='store_true', help='Rewrite finished zip archives, range folders and sealed packs as dictionary-compressed packs with one zstd frame per document (needs zstandard).')
+    parser.add_argument('--index-archives', action='store_true', help='Refresh the raw archive manifest index (member IDs, sizes, CRCs and a SHA-256 per zip). Also done after -c.')
+    parser.add_argument('--verify-archives', action='store_true', help='Check every indexed raw archive against its manifest in parallel.')
+    parser.add_argument('--scrub', action='store_true', help='Check every raw document in packs, range folders and zips in parallel against its recorded content hash, record hashes and validity, and queue IDs without a good copy for refetch.')
+    parser.add_argument('--analyze', action='store_true', help='Print the query plan of every standard query (lookups by processor, model, version, date and operating system, workload leaderboards) and flag those that scan the whole data table.')
+    parser.add_argument('--defer-indexes', action='store_true', help='Drop the managed indexes for a bulk catch-up and rebuild them online once the backfill work is done.')
+    parser.add_argument('--shard', action='store_true', help='Move every completed ID range of --shard-size IDs out of the main database into its own shard file, sealed read-only, and fold newer rows written for sharded IDs back into their shards; queries attach the shards and see one table.')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help=f'Number of IDs per database shard (default {SHARD_SIZE}).')
+    parser.add_argument('--backup', type=str, metavar='DIR', help='Back up the databases (and their shards) into DIR in the background with the SQLite online backup API while scraping continues.')
+    parser.add_argument('--backup-rate', type=float, default=BACKUP_RATE_MB, help=f'Maximum backup read rate in MB/s so the backup does not starve ingestion; 0 for unthrottled (default {BACKUP_RATE_MB}).')
+    parser.add_argument('--backup-interval', type=int, help='Repeat the backup every this many seconds (default: once at startup).')
+    parser.add_argument('--vacuum', action='store_true', help='Rebuild the databases once with VACUUM to enable incremental vacuum, which idle sync intervals then use to return free pages to the file system.')
+    parser.add_argument('--serve', type=str, metavar='[HOST:]PORT', help='Run the read-only HTTP query server on this address instead of scraping (scores by processor or model, workload leaderboards, results by ID).')
+    parser.add_argument('--cache-ttl', type=int, default=API_CACHE_TTL, help=f'Seconds a query server result stays cached; results are also dropped as soon as the database has new commits (default {API_CACHE_TTL}).')
+    parser.add_argument('--rebuild-coverage', action='store_true', help='Rebuild the persisted coverage map of fetched ID ranges from the data table.')
+    parser.add_argument('--concurrency', type=int, help='Maximum number of requests in flight across all work sources (default: twice the number of worker processes).')
+    parser.add_argument('--backfill-share', type=float, default=SCHEDULER_BACKFILL_SHARE, help=f'Share of capacity reserved for backfill work while a live frontier has new IDs (default {SCHEDULER_BACKFILL_SHARE}).')
+    parser.add_argument('--coordinator', type=str, help='Coordinator mode: claim ID ranges with time-limited leases from this shared work database instead of scraping from the local highest ID.')
+    parser.add_argument('--node-id', type=str, default=f'{socket.gethostname()}-{os.getpid()}', help='Node name recorded on leases in coordinator mode.')
+    parser.add_argument('--lease-size', type=int, default=LEASE_RANGE_SIZE, help=f'Number of IDs per lease in coordinator mode (default {LEASE_RANGE_SIZE}).')
+    parser.add_argument('--lease-duration', type=int, default=LEASE_DURATION, help=f'Seconds a lease stays valid without renewal (default {LEASE_DURATION}).')
+    parser.add_argument('--transport', choices=TRANSPORTS, default='requests', help='HTTP client for result downloads: requests (HTTP/1.1 keep-alive) or httpx (HTTP/2, needs httpx[http2]). Both negotiate compressed responses (default requests).')
+    parser.add_argument('--raw-store', choices=RAW_STORES, default='files', help='Where downloaded raw files go: files (one file per ID in range folders, compressed later with -c) or pack (appended on arrival to one compressed archive per ID range, sealed automatically when the range is complete) (default files).')
+    parser.add_argument('--egress', type=str, metavar='FILE', help='JSON list of egress routes. Each route may set name, proxy, source_address, cookie_file, max_in_flight, rate (requests per second) and burst.')
+    parser.add_argument('--proxy', action='append', metavar='URL', help='Add an HTTP proxy egress route (repeatable).')
+    parser.add_argument('--source-address', action='append', metavar='ADDRESS', help='Add a local source address egress route (repeatable).')
+    parser.add_argument('--route-max-in-flight', type=int, help='Default maximum requests in flight per egress route.')
+    parser.add_argument('--route-rate', type=float, help='Default requests per second per egress route (token bucket).')
+    parser.add_argument('--shutdown-timeout', type=int, default=SHUTDOWN_DRAIN_TIMEOUT, help=f'Seconds to wait for in-flight requests after SIGINT/SIGTERM before stopping (default {SHUTDOWN_DRAIN_TIMEOUT}).')
+    args = parser.parse_args()
+    routes = load_egress_routes(args.egress, args.proxy, args.source_address, args.route_max_in_flight, args.route_rate)
+    if routes is None:
+        sys.exit(1)
+    transport_error = get_transport_error(args.transport)
+    if transport_error:
+        print(transport_error)
+        sys.exit(1)
+    if args.raw_store == 'pack' and get_pack_lock_error():
+        print(get_pack_lock_error())
+        sys.exit(1)
+    families = [get_family(family_key) for family_key in dict.fromkeys(args.family or default_families)]
+    print(f"{' + '.join(family['name'] for family in families)} Data Scraper - Version 1.4")
+    if args.serve:
+        serve_queries(families, args.serve, args.cache_ttl)
+        return
+    authenticated_cookies_ref = [None]
+    pool = None
+    checkpoint_thread, checkpoint_stop_event = None, None
+    index_thread, index_stop_event = None, None
+    backup_thread, backup_stop_event = None, None
+    try:
+        if args.c:
+            for family in families:
+                print(f"\n--- Cleaning: Compressing {family['name']} raw data ---")
+                try:
+                    compress_raw_data(family, group_size=5000)
+                except KeyboardInterrupt:
+                    print("\nCompression process interrupted by user, cleanup performed.")
+                    pass
+        if args.o:
+            for family in families:
+                print(f"\n--- Organizing Loose {family['name']} Raw Files ---")
+                organize_loose_raw_files(family, group_size=5000)
+        for family in families:
+            initialize_database(family)
+        checkpoint_thread, checkpoint_stop_event = start_wal_checkpointer(families)
+        if args.merge:
+            print("\n--- Merging Databases and Raw Data from Other Nodes ---")
+            merge_sources(families, args.merge)
+        for family in families:
+            ensure_coverage(family, force_rebuild=args.rebuild_coverage)
+            print_coverage_summary(family)
+            if args.shard:
+                shard_database(family, args.shard_size)
+            print_shard_summary(family)
+            if args.raw_store == 'pack':
+                seal_finished_packs(family)
+        if args.vacuum:
+            for family in families:
+                print(f"\n--- Vacuuming {family['name']} Database ---")
+                convert_to_incremental_vacuum(family)
+        if args.train_dictionary or args.repack:
+            if get_zstandard_error():
+                print(get_zstandard_error())
+                sys.exit(1)
+            for family in families:
+                print(f"\n--- Repacking {family['name']} Raw Data ---")
+                if args.train_dictionary:
+                    train_pack_dictionary(family)
+                if args.repack:
+                    repack_raw_archives(family)
+        if args.c or args.index_archives or args.verify_archives:
+            for family in families:
+                print(f"\n--- Archive Index: {family['name']} ---")
+                if args.c or args.index_archives:
+                    index_raw_archives(family)
+                if args.verify_archives:
+                    verify_raw_archives(family)
+                print_archive_index_summary(family)
+        if args.scrub:
+            for family in families:
+                print(f"\n--- Scrubbing {family['name']} Raw Store ---")
+                scrub_raw_store(family)
+        if args.reextract:
+            for family in families:
+                print(f"\n--- Re-extracting Stale {family['name']} Rows ---")
+                reextract_stale_rows(family)
+        if args.analyze:
+            for family in families:
+                print(f"\n--- Query Plans: {family['name']} ---")
+                analyze_queries(family)
+        authenticated_cookies_ref[0] = load_cookies(COOKIE_FILE)
+        if authenticated_cookies_ref[0]:
+            print("Loaded cookies from file.")
+        elif not refresh_session(authenticated_cookies_ref):
+            authenticated_cookies_ref[0] = authenticate_interactively()
+            if not authenticated_cookies_ref[0]:
+                print("\nFailed to authenticate after multiple attempts. Exiting script.")
+                sys.exit(1)
+        for family in families:
+            if family['trim_null_rows_on_start']:
+                cleanup_null_rows_from_top(family)
+        run_continuous_process = args.continuous or (not args.N and not args.specific_ids)
+        pool_processes = 6
+        install_shutdown_handlers()
+        pool = create_worker_pool(pool_processes, authenticated_cookies_ref[0], args.transport, routes, args.raw_store)
+        index_build_event = threading.Event()
+        if args.defer_indexes:
+            for family in families:
+                defer_managed_indexes(family)
+        else:
+            index_build_event.set()
+        index_thread, index_stop_event = start_index_builder(families, index_build_event)
+        if args.backup:
+            backup_thread, backup_stop_event = start_backup(families, args.backup, args.backup_rate, args.backup_interval)
+        backfill_sources = []
+        live_sources = []
+        specific_id_ranges = parse_specific_ids(args.specific_ids) if args.specific_ids else []
+        for family in families:
+            backfill_sources.extend(build_backfill_sources(family, args, specific_id_ranges))
+        if run_continuous_process and not args.coordinator:
+            for family in families:
+                live_sources.append(build_live_source(family, backfill_sources))
+        if backfill_sources or live_sources:
+            run_scheduler(
+                pool, authenticated_cookies_ref, backfill_sources, live_sources,
+                concurrency=args.concurrency, backfill_share=args.backfill_share, routes=routes,
+                drain_timeout=args.shutdown_timeout, seal_packs=args.raw_store == 'pack',
+                backfill_done_event=index_build_event
+            )
+        index_build_event.set()
+        if run_continuous_process and args.coordinator:
+            execute_coordinated_scraping_phase(
+                pool, authenticated_cookies_ref, families, args.coordinator, args.node_id,
+                range_size=args.lease_size, lease_duration=args.lease_duration, routes=routes
+            )
+        if args.raw_store == 'pack':
+            for family in families:
+                seal_finished_packs(family)
+        if is_shutdown_requested():
+            print("Shutting down: closing worker processes and flushing the database...")
+        close_worker_pool(pool)
+        pool = None
+    except KeyboardInterrupt:
+         print("\nCtrl+C detected. Shutting down...")
+         if pool:
+             print("Terminating worker processes...")
+             terminate_worker_pool(pool)
+             print("Worker processes terminated.")
+         print(f"Transfer: {format_transfer_stats()}.")
+    except Exception as e:
+        print(f"\nAn unexpected critical error occurred in the main process: {e}")
+        if pool:
+             print("Terminating worker processes due to main process error...")
+             terminate_worker_pool(pool)
+             print("Worker processes terminated.")
+    finally:
+        stop_backup(backup_thread, backup_stop_event)
+        stop_index_builder(index_thread, index_stop_event)
+        stop_wal_checkpointer(checkpoint_thread, checkpoint_stop_event)
@@ -0,0 +1,414 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from .idranges import count_id_ranges, subtract_id_ranges
+
+DB_BUSY_TIMEOUT_MS = 30000
+DB_CACHE_SIZE_KB = 65536
+DB_MMAP_SIZE = 268435456
+WAL_CHECKPOINT_INTERVAL = 60
+SHARD_TABLES = ('data', 'result_metrics', 'result_workloads')
+
+def configure_db_connection(conn):
+    c = conn.cursor()
+    c.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    c.execute('PRAGMA synchronous = NORMAL')
+    c.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+    c.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+    c.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def get_db_connection(family):
+    conn = sqlite3.connect(family['database_file'], timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    return configure_db_connection(conn)
+
+def get_snapshot_connection(family):
+    conn = sqlite3.connect(f"file:{family['database_file']}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    configure_db_connection(conn)
+    attach_shards(conn, family)
+    conn.execute('BEGIN')
+    conn.execute('SELECT COUNT(*) FROM db_version').fetchone()
+    return conn
+
+def get_shard_path(family, shard_file):
+    return os.path.join(os.path.dirname(family['database_file']), shard_file)
+
+def load_shards(c):
+    return c.execute('SELECT start_id, end_id, path, state FROM shards ORDER BY start_id').fetchall()
+
+def attach_shards(conn, family):
+    c = conn.cursor()
+    shards = load_shards(c)
+    if not shards:
+        return
+    if len(shards) > conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+        raise sqlite3.OperationalError(f"{len(shards)} shards exceed the SQLite limit of {conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)} attached databases")
+    for shard_index, (start_id, end_id, shard_file, state) in enumerate(shards):
+        c.execute(f'ATTACH DATABASE ? AS shard_{shard_index}', (get_shard_path(family, shard_file),))
+    for table in SHARD_TABLES:
+        columns = [row[1] for row in c.execute(f'PRAGMA main.table_info({table})')]
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        selects = [f'SELECT {column_list} FROM main.{table}']
+        for shard_index in range(len(shards)):
+            shard_columns = set(row[1] for row in c.execute(f'PRAGMA shard_{shard_index}.table_info({table})'))
+            select_list = ', '.join(f'shard_row."{col}"' if col in shard_columns else f'NULL AS "{col}"' for col in columns)
+            selects.append(f'SELECT {select_list} FROM shard_{shard_index}.{table} AS shard_row '
+                           f'WHERE NOT EXISTS (SELECT 1 FROM main.data AS overlay WHERE overlay.id = shard_row.id)')
+        c.execute(f"CREATE TEMP VIEW {table} AS {' UNION ALL '.join(selects)}")
+
+def checkpoint_wal(family, mode='PASSIVE'):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        return conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+    except sqlite3.Error as e:
+        print(f"\nDatabase error during WAL checkpoint of {family['database_file']}: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def wal_checkpoint_task(stop_event, families, interval):
+    while not stop_event.wait(interval):
+        for family in families:
+            checkpoint_wal(family, 'PASSIVE')
+    for family in families:
+        checkpoint_wal(family, 'TRUNCATE')
+
+def start_wal_checkpointer(families, interval=WAL_CHECKPOINT_INTERVAL):
+    stop_event = threading.Event()
+    checkpoint_thread = threading.Thread(target=wal_checkpoint_task, args=(stop_event, families, interval))
+    checkpoint_thread.daemon = True
+    checkpoint_thread.start()
+    return checkpoint_thread, stop_event
+
+def stop_wal_checkpointer(checkpoint_thread, stop_event):
+    if checkpoint_thread and checkpoint_thread.is_alive():
+        stop_event.set()
+        checkpoint_thread.join()
+
+def initialize_database(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        journal_mode = c.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+        if str(journal_mode).lower() != 'wal':
+            print(f"Warning: Could not enable WAL mode, journal mode is {journal_mode}.")
+        c.execute('''CREATE TABLE IF NOT EXISTS db_version
+                     (version REAL PRIMARY KEY)''')
+        current_version = None
+        c.execute('SELECT version FROM db_version LIMIT 1')
+        row = c.fetchone()
+        if row:
+            current_version = row[0]
+        columns_sql = 'id INTEGER PRIMARY KEY'
+        for col in family['data_columns']:
+            columns_sql += f', "{col}" TEXT'
+        columns_sql += ', extractor_version INTEGER'
+        create_data_table_sql = f'CREATE TABLE IF NOT EXISTS data ({columns_sql})'
+        c.execute(create_data_table_sql)
+        add_missing_data_columns(c, family)
+        create_coverage_tables(c)
+        create_checkpoint_tables(c)
+        create_detail_tables(c)
+        create_raw_document_table(c)
+        create_index_tables(c)
+        create_shard_tables(c)
+        conn.commit()
+        if c.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            print(f"Warning: the {family['name']} database was created without auto_vacuum = INCREMENTAL, so idle-time maintenance cannot return its free pages to the file system. Run once with --vacuum to convert it.")
+        database_version = family['database_version']
+        if current_version != database_version:
+            print(f"{family['name']} database version mismatch or first run. Expected {database_version}, found {current_version}. ")
+            print(f"If you are downgrading the database version (e.g., from 1.1 or 1.2 to {database_version}), you will lose existing data.")
+            c.execute('DROP TABLE IF EXISTS data')
+            conn.commit()
+            c.execute(create_data_table_sql)
+            conn.commit()
+            c.execute('DELETE FROM db_version')
+            c.execute('INSERT INTO db_version VALUES (?)', (database_version,))
+            c.execute('DELETE FROM coverage_ranges')
+            c.execute('DELETE FROM phase_checkpoints')
+            c.execute('DELETE FROM phase_checkpoint_ranges')
+            c.execute('DELETE FROM phase_checkpoint_outstanding')
+            c.execute('DELETE FROM result_metrics')
+            c.execute('DELETE FROM result_workloads')
+            for start_id, end_id, shard_file, state in load_shards(c):
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(get_shard_path(family, shard_file) + suffix):
+                        os.remove(get_shard_path(family, shard_file) + suffix)
+            c.execute('DELETE FROM shards')
+            set_coverage_valid(c, True)
+            conn.commit()
+            print("Database table recreated due to version mismatch.")
+    except sqlite3.Error as e:
+        print(f"Database initialization error for {family['database_file']}: {e}")
+        sys.exit(1)
+    finally:
+        if conn:
+            conn.close()
+
+def add_missing_data_columns(c, family):
+    existing_columns = set(row[1] for row in c.execute('PRAGMA table_info(data)'))
+    for col in family['data_columns']:
+        if col not in existing_columns:
+            print(f"Adding new column {col} to the {family['name']} data table.")
+            c.execute(f'ALTER TABLE data ADD COLUMN "{col}" TEXT')
+    if 'extractor_version' not in existing_columns:
+        c.execute('ALTER TABLE data ADD COLUMN extractor_version INTEGER')
+
+def create_coverage_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS coverage_ranges
+                 (kind TEXT NOT NULL, start_id INTEGER NOT NULL, end_id INTEGER NOT NULL,
+                  PRIMARY KEY (kind, start_id)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS coverage_meta
+                 (key TEXT PRIMARY KEY, value TEXT)''')
+
+def create_checkpoint_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS phase_checkpoints
+                 (phase TEXT PRIMARY KEY, total INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0,
+                  watermark INTEGER NOT NULL DEFAULT 0, updated REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS phase_checkpoint_ranges
+                 (phase TEXT NOT NULL, start_id INTEGER NOT NULL, end_id INTEGER NOT NULL,
+                  PRIMARY KEY (phase, start_id)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS phase_checkpoint_outstanding
+                 (phase TEXT NOT NULL, id INTEGER NOT NULL,
+                  PRIMARY KEY (phase, id)) WITHOUT ROWID''')
+
+def create_detail_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS result_metrics
+                 (id INTEGER NOT NULL, metric_id INTEGER NOT NULL, value, fields TEXT,
+                  PRIMARY KEY (id, metric_id)) WITHOUT ROWID''')
+    c.execute('CREATE INDEX IF NOT EXISTS result_metrics_metric ON result_metrics (metric_id, value)')
+    c.execute('''CREATE TABLE IF NOT EXISTS result_workloads
+                 (id INTEGER NOT NULL, section_id INTEGER NOT NULL, workload_id INTEGER NOT NULL, score NUMERIC, fields TEXT,
+                  PRIMARY KEY (id, section_id, workload_id)) WITHOUT ROWID''')
+    c.execute('CREATE INDEX IF NOT EXISTS result_workloads_workload ON result_workloads (workload_id, section_id, score)')
+
+def write_detail_rows(c, ids, metric_rows, workload_rows):
+    c.executemany('DELETE FROM result_metrics WHERE id = ?', ((id,) for id in ids))
+    c.executemany('DELETE FROM result_workloads WHERE id = ?', ((id,) for id in ids))
+    c.executemany('INSERT OR REPLACE INTO result_metrics (id, metric_id, value, fields) VALUES (?, ?, ?, ?)', metric_rows)
+    c.executemany('INSERT OR REPLACE INTO result_workloads (id, section_id, workload_id, score, fields) VALUES (?, ?, ?, ?, ?)', workload_rows)
+
+def create_index_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS managed_indexes
+                 (name TEXT PRIMARY KEY, index_name TEXT NOT NULL, columns TEXT NOT NULL,
+                  state TEXT NOT NULL, generation INTEGER NOT NULL, built REAL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS index_builds
+                 (table_name TEXT PRIMARY KEY, generation INTEGER NOT NULL, watermark INTEGER NOT NULL, started REAL NOT NULL)''')
+
+def create_shard_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS shards
+                 (start_id INTEGER PRIMARY KEY, end_id INTEGER NOT NULL, path TEXT NOT NULL,
+                  state TEXT NOT NULL, row_count INTEGER, sealed REAL)''')
+
+def create_raw_document_table(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS raw_documents
+                 (id INTEGER PRIMARY KEY, sha256 BLOB, size INTEGER NOT NULL, valid INTEGER NOT NULL, checked REAL NOT NULL)''')
+
+def record_raw_documents(c, rows):
+    checked = time.time()
+    c.executemany('INSERT OR REPLACE INTO raw_documents (id, sha256, size, valid, checked) VALUES (?, ?, ?, ?, ?)',
+                  ((id, sha256, size, 1 if valid else 0, checked) for id, sha256, size, valid in rows))
+
+def record_raw_document(c, id, sha256, size, valid):
+    record_raw_documents(c, [(id, sha256, size, valid)])
+
+def clear_raw_document(c, id):
+    c.execute('DELETE FROM raw_documents WHERE id = ?', (id,))
+
+def get_raw_document_record(c, id):
+    c.execute('SELECT sha256, valid FROM raw_documents WHERE id = ?', (id,))
+    return c.fetchone()
+
+def set_coverage_valid(c, valid):
+    c.execute("INSERT OR REPLACE INTO coverage_meta (key, value) VALUES ('valid', ?)", ('1' if valid else '0',))
+
+def is_coverage_valid(c):
+    c.execute("SELECT value FROM coverage_meta WHERE key = 'valid'")
+    row = c.fetchone()
+    return row is not None and row[0] == '1'
+
+def coverage_add_id(c, kind, id):
+    c.execute('SELECT start_id, end_id FROM coverage_ranges WHERE kind = ? AND start_id <= ? ORDER BY start_id DESC LIMIT 1', (kind, id))
+    left = c.fetchone()
+    if left and left[1] >= id:
+        return
+    c.execute('SELECT end_id FROM coverage_ranges WHERE kind = ? AND start_id = ?', (kind, id + 1))
+    right = c.fetchone()
+    if left and left[1] == id - 1:
+        if right:
+            c.execute('DELETE FROM coverage_ranges WHERE kind = ? AND start_id = ?', (kind, id + 1))
+        c.execute('UPDATE coverage_ranges SET end_id = ? WHERE kind = ? AND start_id = ?', (right[0] if right else id, kind, left[0]))
+    elif right:
+        c.execute('UPDATE coverage_ranges SET start_id = ? WHERE kind = ? AND start_id = ?', (id, kind, id + 1))
+    else:
+        c.execute('INSERT INTO coverage_ranges (kind, start_id, end_id) VALUES (?, ?, ?)', (kind, id, id))
+
+def coverage_remove_range(c, kind, start_id, end_id):
+    c.execute('SELECT start_id, end_id FROM coverage_ranges WHERE kind = ? AND start_id < ? ORDER BY start_id DESC LIMIT 1', (kind, start_id))
+    overlapping = [row for row in c.fetchall() if row[1] >= start_id]
+    c.execute('SELECT start_id, end_id FROM coverage_ranges WHERE kind = ? AND start_id BETWEEN ? AND ?', (kind, start_id, end_id))
+    overlapping.extend(c.fetchall())
+    for range_start_id, range_end_id in overlapping:
+        c.execute('DELETE FROM coverage_ranges WHERE kind = ? AND start_id = ?', (kind, range_start_id))
+        if range_start_id < start_id:
+            c.execute('INSERT INTO coverage_ranges (kind, start_id, end_id) VALUES (?, ?, ?)', (kind, range_start_id, start_id - 1))
+        if range_end_id > end_id:
+            c.execute('INSERT INTO coverage_ranges (kind, start_id, end_id) VALUES (?, ?, ?)', (kind, end_id + 1, range_end_id))
+
+def record_coverage_row(c, id, all_null):
+    coverage_add_id(c, 'present', id)
+    if all_null:
+        coverage_add_id(c, 'null', id)
+    else:
+        coverage_remove_range(c, 'null', id, id)
+
+def build_id_ranges(id_rows):
+    ranges = []
+    start_id = previous_id = None
+    for (id,) in id_rows:
+        if previous_id is not None and id == previous_id + 1:
+            previous_id = id
+            continue
+        if start_id is not None:
+            ranges.append((start_id, previous_id))
+        start_id = previous_id = id
+    if start_id is not None:
+        ranges.append((start_id, previous_id))
+    return ranges
+
+def get_null_rows_where_clause(family):
+    where_clause_parts = []
+    for col in family['data_columns']:
+        if col != 'id':
+             where_clause_parts.append(f'"{col}" IS NULL')
+    return ' AND '.join(where_clause_parts)
+
+def rebuild_coverage(family):
+    conn = None
+    try:
+        print(f"Rebuilding {family['name']} coverage map from the data table...")
+        started_at = time.time()
+        conn = get_db_connection(family)
+        attach_shards(conn, family)
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        present_ranges = build_id_ranges(c.execute('SELECT id FROM data ORDER BY id'))
+        null_ranges = build_id_ranges(c.execute(f'SELECT id FROM data WHERE {get_null_rows_where_clause(family)} ORDER BY id'))
+        c.execute('DELETE FROM coverage_ranges')
+        c.executemany("INSERT INTO coverage_ranges (kind, start_id, end_id) VALUES ('present', ?, ?)", present_ranges)
+        c.executemany("INSERT INTO coverage_ranges (kind, start_id, end_id) VALUES ('null', ?, ?)", null_ranges)
+        set_coverage_valid(c, True)
+        conn.commit()
+        print(f"Coverage map rebuilt in {time.time() - started_at:.1f}s: {len(present_ranges)} present ranges, {len(null_ranges)} NULL ranges.")
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error rebuilding coverage map: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def ensure_coverage(family, force_rebuild=False):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        valid = is_coverage_valid(conn.cursor())
+    except sqlite3.Error as e:
+        print(f"Database error checking coverage map: {e}")
+        valid = False
+    finally:
+        if conn:
+            conn.close()
+    if force_rebuild or not valid:
+        return rebuild_coverage(family)
+    return True
+
+def get_coverage_ranges(family, kind):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('SELECT start_id, end_id FROM coverage_ranges WHERE kind = ? ORDER BY start_id', (kind,))
+        return c.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error reading coverage map: {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+def get_missing_id_ranges(present_ranges):
+    missing_ranges = []
+    next_expected_id = 1
+    for start_id, end_id in present_ranges:
+        if start_id > next_expected_id:
+            missing_ranges.append((next_expected_id, start_id - 1))
+        next_expected_id = end_id + 1
+    return missing_ranges
+
+def print_coverage_summary(family):
+    present_ranges = get_coverage_ranges(family, 'present')
+    null_ranges = get_coverage_ranges(family, 'null')
+    max_contiguous_id = present_ranges[0][1] if present_ranges and present_ranges[0][0] == 1 else 0
+    max_id = present_ranges[-1][1] if present_ranges else 0
+    missing_ranges = get_missing_id_ranges(present_ranges)
+    missing_count = sum(end_id - start_id + 1 for start_id, end_id in missing_ranges)
+    null_count = sum(end_id - start_id + 1 for start_id, end_id in null_ranges)
+    print(f"{family['name']} coverage: highest ID {max_id}, contiguous up to {max_contiguous_id}, {missing_count} missing IDs in {len(missing_ranges)} gaps, {null_count} NULL/404 rows.")
+
+def get_last_id_from_db(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('SELECT MAX(id) FROM data')
+        last_id = c.fetchone()[0] or 0
+        for start_id, end_id, shard_file, state in load_shards(c):
+            if end_id > last_id:
+                shard_conn = sqlite3.connect(f"file:{get_shard_path(family, shard_file)}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+                try:
+                    last_id = max(last_id, shard_conn.execute('SELECT MAX(id) FROM data').fetchone()[0] or 0)
+                finally:
+                    shard_conn.close()
+        return last_id
+    except sqlite3.Error as e:
+        print(f"Database error getting last ID: {e}")
+        return 0
+    finally:
+        if conn:
+            conn.close()
+
+def find_all_null_row_ranges(family):
+    null_ranges = get_coverage_ranges(family, 'null')
+    null_count = sum(end_id - start_id + 1 for start_id, end_id in null_ranges)
+    print(f"Found {null_count} {family['name']} rows with all specified data columns as NULL.")
+    return null_ranges
+
+def get_populated_id_ranges(family):
+    return subtract_id_ranges(get_coverage_ranges(family, 'present'), get_coverage_ranges(family, 'null'))
+
+def format_id_ranges(ranges, limit=20):
+    text = ",".join(str(start_id) if start_id == end_id else f"{start_id}-{end_id}" for start_id, end_id in ranges[:limit])
+    return text + ("..." if len(ranges) > limit else "")
+
+def validate_missing_ids(family):
+    present_ranges = get_coverage_ranges(family, 'present')
+    if not present_ranges:
+        return []
+    max_id_in_db = present_ranges[-1][1]
+    print(f"Checking for missing {family['name']} IDs between 1 and {max_id_in_db}...")
+    missing_ranges = get_missing_id_ranges(present_ranges)
+    if missing_ranges:
+        print(f"\nFound {count_id_ranges(missing_ranges)} missing IDs in {len(missing_ranges)} ranges less than or equal to {max_id_in_db}:")
+        print(format_id_ranges(missing_ranges))
+    return missing_ranges
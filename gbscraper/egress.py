@@ -0,0 +1,126 @@
+import json
+import time
+
+from requests.adapters import HTTPAdapter
+
+EGRESS_QUARANTINE_FAILURES = 5
+EGRESS_QUARANTINE_SECONDS = 60
+EGRESS_QUARANTINE_MAX_SECONDS = 1800
+EGRESS_MAX_RETRIES = 2
+ROUTE_CONFIG_KEYS = ['name', 'proxy', 'source_address', 'cookie_file', 'credentials_file', 'max_in_flight', 'rate', 'burst']
+
+class SourceAddressAdapter(HTTPAdapter):
+    def __init__(self, source_address, **kwargs):
+        self.source_address = source_address
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['source_address'] = (self.source_address, 0)
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['source_address'] = (self.source_address, 0)
+        return super().proxy_manager_for(*args, **kwargs)
+
+def make_egress_route(config, max_in_flight=None, rate=None):
+    route = {key: config.get(key) for key in ROUTE_CONFIG_KEYS}
+    if not route['name']:
+        route['name'] = route['proxy'] or route['source_address'] or 'direct'
+    if route['max_in_flight'] is None:
+        route['max_in_flight'] = max_in_flight
+    if route['rate'] is None:
+        route['rate'] = rate
+    if route['burst'] is None:
+        route['burst'] = max(1.0, route['rate'] or 1.0)
+    route.update({'in_flight': 0, 'tokens': route['burst'], 'last_refill': time.time(),
+                  'consecutive_failures': 0, 'quarantines': 0, 'quarantined_until': 0,
+                  'successful': 0, 'failed': 0})
+    return route
+
+def load_egress_routes(egress_file=None, proxies=(), source_addresses=(), max_in_flight=None, rate=None):
+    configs = []
+    if egress_file:
+        try:
+            with open(egress_file, 'r') as f:
+                configs.extend(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error loading egress routes from {egress_file}: {e}")
+            return None
+    configs.extend({'proxy': proxy} for proxy in proxies or ())
+    configs.extend({'source_address': source_address} for source_address in source_addresses or ())
+    if not configs:
+        configs.append({'name': 'direct'})
+    return [make_egress_route(config, max_in_flight, rate) for config in configs]
+
+def get_route_config(route):
+    return {key: route[key] for key in ROUTE_CONFIG_KEYS}
+
+def refill_route_tokens(route, now):
+    if route['rate']:
+        route['tokens'] = min(route['burst'], route['tokens'] + (now - route['last_refill']) * route['rate'])
+    route['last_refill'] = now
+
+def is_route_available(route, now):
+    if route['quarantined_until'] > now:
+        return False
+    if route['max_in_flight'] and route['in_flight'] >= route['max_in_flight']:
+        return False
+    if route['quarantines'] and route['in_flight'] > 0:
+        return False
+    refill_route_tokens(route, now)
+    return not route['rate'] or route['tokens'] >= 1
+
+def get_route_load(route):
+    return route['in_flight'] + route['consecutive_failures']
+
+def pick_egress_route(routes, excluded_route=None):
+    now = time.time()
+    best_route = None
+    for index, route in enumerate(routes):
+        if index != excluded_route and is_route_available(route, now) and (best_route is None or get_route_load(route) < get_route_load(routes[best_route])):
+            best_route = index
+    return best_route
+
+def take_egress_route(routes, index):
+    route = routes[index]
+    if route['rate']:
+        route['tokens'] -= 1
+    route['in_flight'] += 1
+
+def get_route_wait_time(routes):
+    now = time.time()
+    wait_times = []
+    for route in routes:
+        if route['quarantined_until'] > now:
+            wait_times.append(route['quarantined_until'] - now)
+        elif route['rate'] and route['tokens'] < 1:
+            wait_times.append((1 - route['tokens']) / route['rate'])
+    return max(0.05, min(wait_times)) if wait_times else 0.05
+
+def quarantine_route(route, reason, quarantine_seconds=EGRESS_QUARANTINE_MAX_SECONDS):
+    route['quarantined_until'] = time.time() + quarantine_seconds
+    route['quarantines'] += 1
+    route['consecutive_failures'] = 0
+    print(f"\nEgress route {route['name']} {reason}, quarantined for {quarantine_seconds} seconds.")
+
+def record_route_result(routes, index, result):
+    route = routes[index]
+    route['in_flight'] -= 1
+    if result == 'route_error':
+        route['failed'] += 1
+        if len(routes) == 1 or route['quarantined_until'] > time.time():
+            return
+        route['consecutive_failures'] += 1
+        if route['consecutive_failures'] >= EGRESS_QUARANTINE_FAILURES or route['quarantines']:
+            quarantine_route(route, 'is unhealthy', min(EGRESS_QUARANTINE_SECONDS * 2 ** route['quarantines'], EGRESS_QUARANTINE_MAX_SECONDS))
+    elif result in ('success', '404'):
+        route['successful'] += 1
+        route['consecutive_failures'] = 0
+        if route['quarantines']:
+            print(f"\nEgress route {route['name']} recovered.")
+            route['quarantines'] = 0
+
+def print_route_summary(routes):
+    if len(routes) > 1:
+        for route in routes:
+            print(f"Egress route {route['name']}: {route['successful']} ok, {route['failed']} route errors.")
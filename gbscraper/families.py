@@ -0,0 +1,210 @@
+GB5_DATA_COLUMNS = [
+    'date', 'version', 'Platform', 'Compiler', 'Operating_System',
+    'Model', 'Processor', 'Threads', 'Cores', 'Processors',
+    'Processor_Frequency', 'L1_Instruction_Cache', 'L1_Data_Cache',
+    'L2_Cache', 'L3_Cache', 'L4_Cache', 'RAM', 'Type',
+    'Processor_Minimum_Multiplier', 'Processor_Maximum_Multiplier',
+    'Power_Plan', 'Number_of_Channels', 'multicore_score', 'score',
+    'AES_XTS_ST_Score', 'AES_XTS_MT_Score',
+    'Text_Compression_ST_Score', 'Text_Compression_MT_Score',
+    'Image_Compression_ST_Score', 'Image_Compression_MT_Score',
+    'Navigation_ST_Score', 'Navigation_MT_Score',
+    'HTML5_ST_Score', 'HTML5_MT_Score',
+    'SQLite_ST_Score', 'SQLite_MT_Score',
+    'PDF_Rendering_ST_Score', 'PDF_Rendering_MT_Score',
+    'Text_Rendering_ST_Score', 'Text_Rendering_MT_Score',
+    'Clang_ST_Score', 'Clang_MT_Score',
+    'Camera_ST_Score', 'Camera_MT_Score',
+    'N_Body_Physics_ST_Score', 'N_Body_Physics_MT_Score',
+    'Rigid_Body_Physics_ST_Score', 'Rigid_Body_Physics_MT_Score',
+    'Gaussian_Blur_ST_Score', 'Gaussian_Blur_MT_Score',
+    'Face_Detection_ST_Score', 'Face_Detection_MT_Score',
+    'Horizon_Detection_ST_Score', 'Horizon_Detection_MT_Score',
+    'Image_Inpainting_ST_Score', 'Image_Inpainting_MT_Score',
+    'HDR_ST_Score', 'HDR_MT_Score',
+    'Ray_Tracing_ST_Score', 'Ray_Tracing_MT_Score',
+    'Structure_from_Motion_ST_Score', 'Structure_from_Motion_MT_Score',
+    'Speech_Recognition_ST_Score', 'Speech_Recognition_MT_Score',
+    'Machine_Learning_ST_Score', 'Machine_Learning_MT_Score',
+]
+GB5_METRIC_ID_MAP = {
+    'Platform': (1, 'value'),
+    'Compiler': (2, 'value'),
+    'Operating_System': (3, 'value'),
+    'Model': (5, 'value'),
+    'Processor': (9, 'value'),
+    'Threads': (12, 'value'),
+    'Cores': (13, 'value'),
+    'Processors': (14, 'value'),
+    'Processor_Frequency': (15, 'value'),
+    'RAM': (29, 'value'),
+    'Type': (30, 'value'),
+    'Processor_Minimum_Multiplier': (66, 'value'),
+    'Processor_Maximum_Multiplier': (67, 'value'),
+    'Power_Plan': (70, 'value'),
+    'Number_of_Channels': (76, 'value'),
+}
+GB5_CACHE_ID_MAP = {
+    'L1_Instruction_Cache': {'size_id': 17, 'count_id': 18},
+    'L1_Data_Cache': {'size_id': 19, 'count_id': 20},
+    'L2_Cache': {'size_id': 21, 'count_id': 22},
+    'L3_Cache': {'size_id': 23, 'count_id': 24},
+    'L4_Cache': {'size_id': 25, 'count_id': 26},
+}
+GB5_WORKLOAD_ID_MAP = {
+    'AES_XTS_ST_Score': (1, 101),
+    'AES_XTS_MT_Score': (2, 101),
+    'Text_Compression_ST_Score': (1, 201),
+    'Text_Compression_MT_Score': (2, 201),
+    'Image_Compression_ST_Score': (1, 202),
+    'Image_Compression_MT_Score': (2, 202),
+    'Navigation_ST_Score': (1, 203),
+    'Navigation_MT_Score': (2, 203),
+    'HTML5_ST_Score': (1, 204),
+    'HTML5_MT_Score': (2, 204),
+    'SQLite_ST_Score': (1, 205),
+    'SQLite_MT_Score': (2, 205),
+    'PDF_Rendering_ST_Score': (1, 206),
+    'PDF_Rendering_MT_Score': (2, 206),
+    'Text_Rendering_ST_Score': (1, 207),
+    'Text_Rendering_MT_Score': (2, 207),
+    'Clang_ST_Score': (1, 208),
+    'Clang_MT_Score': (2, 208),
+    'Camera_ST_Score': (1, 209),
+    'Camera_MT_Score': (2, 209),
+    'N_Body_Physics_ST_Score': (1, 301),
+    'N_Body_Physics_MT_Score': (2, 301),
+    'Rigid_Body_Physics_ST_Score': (1, 302),
+    'Rigid_Body_Physics_MT_Score': (2, 302),
+    'Gaussian_Blur_ST_Score': (1, 303),
+    'Gaussian_Blur_MT_Score': (2, 303),
+    'Face_Detection_ST_Score': (1, 305),
+    'Face_Detection_MT_Score': (2, 305),
+    'Horizon_Detection_ST_Score': (1, 306),
+    'Horizon_Detection_MT_Score': (2, 306),
+    'Image_Inpainting_ST_Score': (1, 307),
+    'Image_Inpainting_MT_Score': (2, 307),
+    'HDR_ST_Score': (1, 308),
+    'HDR_MT_Score': (2, 308),
+    'Ray_Tracing_ST_Score': (1, 309),
+    'Ray_Tracing_MT_Score': (2, 309),
+    'Structure_from_Motion_ST_Score': (1, 310),
+    'Structure_from_Motion_MT_Score': (2, 310),
+    'Speech_Recognition_ST_Score': (1, 312),
+    'Speech_Recognition_MT_Score': (2, 312),
+    'Machine_Learning_ST_Score': (1, 313),
+    'Machine_Learning_MT_Score': (2, 313),
+}
+GBAI_BASE_COLUMNS = [
+    'date', 'version', 'Platform', 'Compiler', 'Operating_System',
+    'Model', 'RAM', 'device_name', 'backend_name', 'framework_name',
+    'f32_score', 'f16_score', 'i8_score',
+]
+GBAI_METRIC_ID_MAP = {
+    'Platform': (1, 'value'),
+    'Compiler': (2, 'value'),
+    'Operating_System': (3, 'value'),
+    'Model': (5, 'value'),
+    'RAM': (29, 'value'),
+}
+GBAI_WORKLOAD_ID_NAME_MAP = {
+    1111: 'Image Classification (SP)',
+    1112: 'Image Classification (HP)',
+    1113: 'Image Classification (Q)',
+    1121: 'Image Segmentation (SP)',
+    1122: 'Image Segmentation (HP)',
+    1123: 'Image Segmentation (Q)',
+    1131: 'Pose Estimation (SP)',
+    1132: 'Pose Estimation (HP)',
+    1133: 'Pose Estimation (Q)',
+    1141: 'Object Detection (SP)',
+    1142: 'Object Detection (HP)',
+    1143: 'Object Detection (Q)',
+    1151: 'Face Detection (SP)',
+    1152: 'Face Detection (HP)',
+    1153: 'Face Detection (Q)',
+    1161: 'Depth Estimation (SP)',
+    1162: 'Depth Estimation (HP)',
+    1163: 'Depth Estimation (Q)',
+    1171: 'Style Transfer (SP)',
+    1172: 'Style Transfer (HP)',
+    1173: 'Style Transfer (Q)',
+    1181: 'Image Super-Resolution (SP)',
+    1182: 'Image Super-Resolution (HP)',
+    1183: 'Image Super-Resolution (Q)',
+    1211: 'Text Classification (SP)',
+    1212: 'Text Classification (HP)',
+    1213: 'Text Classification (Q)',
+    1221: 'Machine Translation (SP)',
+    1222: 'Machine Translation (HP)',
+    1223: 'Machine Translation (Q)',
+}
+
+def workload_column_name(workload_name):
+    safe_workload_name = workload_name.replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_')
+    return f"Workload_{safe_workload_name}_Score"
+
+GBAI_WORKLOAD_ID_MAP = {
+    workload_column_name(workload_name): (None, workload_id)
+    for workload_id, workload_name in GBAI_WORKLOAD_ID_NAME_MAP.items()
+}
+
+FAMILIES = {
+    'gb5': {
+        'key': 'gb5',
+        'name': 'Geekbench 5',
+        'database_file': 'geekbench_5_data.db',
+        'database_version': 1,
+        'extractor_version': 2,
+        'raw_data_dir': 'raw_data_5',
+        'raw_file_extension': '.gb5',
+        'result_url': 'https://browser.geekbench.com/v5/cpu/',
+        'latest_results_url': 'https://browser.geekbench.com/v5/cpu/',
+        'latest_results_style': 'first_link',
+        'result_path_prefix': '/v5/cpu/',
+        'data_columns': GB5_DATA_COLUMNS,
+        'text_fields': ['date', 'version'],
+        'score_fields': ['multicore_score', 'score'],
+        'metric_id_map': GB5_METRIC_ID_MAP,
+        'cache_id_map': GB5_CACHE_ID_MAP,
+        'workload_id_map': GB5_WORKLOAD_ID_MAP,
+        'indexes': {
+            'data_processor': ['Processor', 'multicore_score', 'score'],
+            'data_model': ['Model', 'multicore_score', 'score'],
+            'data_version': ['version'],
+            'data_date': ['date'],
+            'data_operating_system': ['Operating_System'],
+        },
+        'trim_null_rows_on_start': True,
+    },
+    'gbai': {
+        'key': 'gbai',
+        'name': 'Geekbench AI',
+        'database_file': 'geekbench_ai_data.db',
+        'database_version': 1,
+        'extractor_version': 2,
+        'raw_data_dir': 'raw_data_ai',
+        'raw_file_extension': '.gbml',
+        'result_url': 'https://browser.geekbench.com/ai/v1/',
+        'latest_results_url': 'https://browser.geekbench.com/ai/v1/',
+        'latest_results_style': 'device_table',
+        'result_path_prefix': '/ai/v1/',
+        'data_columns': GBAI_BASE_COLUMNS + list(GBAI_WORKLOAD_ID_MAP),
+        'text_fields': ['date', 'version', 'device_name', 'backend_name', 'framework_name'],
+        'score_fields': ['f32_score', 'f16_score', 'i8_score'],
+        'metric_id_map': GBAI_METRIC_ID_MAP,
+        'cache_id_map': {},
+        'workload_id_map': GBAI_WORKLOAD_ID_MAP,
+        'indexes': {
+            'data_model': ['Model', 'f32_score', 'f16_score', 'i8_score'],
+            'data_device': ['device_name', 'backend_name', 'framework_name'],
+            'data_version': ['version'],
+            'data_date': ['date'],
+            'data_operating_system': ['Operating_System'],
+        },
+        'trim_null_rows_on_start': False,
+    },
+}
+
+def get_family(family_key):
+    return FAMILIES[family_key]
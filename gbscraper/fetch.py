@@ -0,0 +1,457 @@
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import sqlite3
+import struct
+
+import requests
+from bs4 import BeautifulSoup
+from urllib3.util import make_headers
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .auth import COOKIE_FILE, load_cookies, refresh_cookie_file, refresh_session
+from .db import clear_raw_document, get_db_connection, get_raw_document_record, record_coverage_row, record_raw_document, write_detail_rows
+from .egress import SourceAddressAdapter, get_route_config
+from .families import get_family
+from .packs import append_pack_document, get_pack_path, read_pack_document
+from .shutdown import reset_worker_signal_handlers
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36',
+    'Accept': 'application/json, text/javascript, */*; q=0.01',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://browser.geekbench.com/',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+}
+
+TRANSPORTS = ['requests', 'httpx']
+RAW_STORES = ['files', 'pack']
+ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+cookie_version = None
+transfer_stats = None
+worker_state = {}
+
+def get_transport_error(transport):
+    if transport == 'httpx':
+        if httpx is None:
+            return "The httpx transport needs the httpx package (pip install 'httpx[http2]')."
+        if importlib.util.find_spec('h2') is None:
+            return "The httpx transport needs HTTP/2 support (pip install 'httpx[http2]')."
+    return None
+
+def make_worker_session(transport, cookies, route=None):
+    proxy = route.get('proxy') if route else None
+    source_address = route.get('source_address') if route else None
+    if transport == 'httpx':
+        http_transport = httpx.HTTPTransport(http2=True, proxy=proxy, local_address=source_address)
+        return httpx.Client(transport=http_transport, headers=REQUEST_HEADERS, cookies=cookies, follow_redirects=True)
+    worker_session = requests.Session()
+    worker_session.headers.update(REQUEST_HEADERS)
+    worker_session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    if proxy:
+        worker_session.proxies = {'http': proxy, 'https': proxy}
+    if source_address:
+        worker_session.mount('http://', SourceAddressAdapter(source_address))
+        worker_session.mount('https://', SourceAddressAdapter(source_address))
+    if cookies:
+        worker_session.cookies.update(cookies)
+    return worker_session
+
+def init_worker(shared_cookie_version, shared_transfer_stats, cookies, transport, route_configs, raw_store):
+    reset_worker_signal_handlers()
+    worker_state['raw_store'] = raw_store
+    worker_state['cookies'] = cookies
+    worker_state['routes'] = route_configs
+    worker_state['sessions'] = {}
+    worker_state['transport'] = transport
+    worker_state['transfer_stats'] = shared_transfer_stats
+    worker_state['cookie_version'] = shared_cookie_version
+    worker_state['seen_cookie_version'] = shared_cookie_version.value
+    worker_state['db_connections'] = {}
+    worker_state['subfolders'] = set()
+
+def create_worker_pool(processes, cookies, transport='requests', routes=None, raw_store='files'):
+    global cookie_version, transfer_stats
+    cookie_version = multiprocessing.Value('i', 0)
+    transfer_stats = multiprocessing.Array('q', 3)
+    route_configs = [get_route_config(route) for route in routes or []]
+    return multiprocessing.Pool(processes=processes, initializer=init_worker, initargs=(cookie_version, transfer_stats, cookies, transport, route_configs, raw_store))
+
+def broadcast_cookies():
+    if cookie_version is not None:
+        with cookie_version.get_lock():
+            cookie_version.value += 1
+
+def refresh_route_sessions(cookies_ref, routes, route_indexes):
+    if any(not routes[index].get('cookie_file') for index in route_indexes) and not refresh_session(cookies_ref):
+        return None
+    cookie_file_routes = {}
+    for index in sorted(route_indexes):
+        if routes[index].get('cookie_file'):
+            cookie_file_routes.setdefault(routes[index]['cookie_file'], []).append(index)
+    unrefreshed_routes = []
+    for cookie_file, indexes in cookie_file_routes.items():
+        credentials_file = routes[indexes[0]].get('credentials_file')
+        if not credentials_file:
+            print(f"Egress route {routes[indexes[0]]['name']} has no credentials_file, so the account in {cookie_file} cannot be logged in again.")
+        if not credentials_file or not refresh_cookie_file(credentials_file, cookie_file):
+            unrefreshed_routes.extend(indexes)
+    broadcast_cookies()
+    return unrefreshed_routes
+
+def get_route_cookies(route):
+    if route and route.get('cookie_file'):
+        return load_cookies(route['cookie_file'])
+    return worker_state['cookies']
+
+def get_worker_session(route_index=0):
+    current_version = worker_state['cookie_version'].value
+    if current_version != worker_state['seen_cookie_version']:
+        cookies = load_cookies(COOKIE_FILE)
+        if cookies:
+            worker_state['cookies'] = cookies
+        for session_route_index, worker_session in worker_state['sessions'].items():
+            route = worker_state['routes'][session_route_index] if worker_state['routes'] else None
+            route_cookies = get_route_cookies(route)
+            if route_cookies:
+                worker_session.cookies.clear()
+                worker_session.cookies.update(route_cookies)
+        worker_state['seen_cookie_version'] = current_version
+    worker_session = worker_state['sessions'].get(route_index)
+    if worker_session is None:
+        route = worker_state['routes'][route_index] if worker_state['routes'] else None
+        worker_session = make_worker_session(worker_state['transport'], get_route_cookies(route), route)
+        worker_state['sessions'][route_index] = worker_session
+    return worker_session
+
+def record_transfer(wire_bytes, decoded_bytes):
+    stats = worker_state['transfer_stats']
+    with stats.get_lock():
+        stats[0] += 1
+        stats[1] += wire_bytes
+        stats[2] += decoded_bytes
+
+def get_transfer_stats():
+    if transfer_stats is None:
+        return (0, 0, 0)
+    with transfer_stats.get_lock():
+        return tuple(transfer_stats)
+
+def format_transfer_stats():
+    responses, wire_bytes, decoded_bytes = get_transfer_stats()
+    if responses == 0:
+        return "no responses downloaded"
+    ratio = decoded_bytes / wire_bytes if wire_bytes else 0
+    return f"{responses} responses, {wire_bytes / 1048576:.1f} MiB on the wire, {decoded_bytes / 1048576:.1f} MiB decoded ({ratio:.1f}x)"
+
+def http_get(url, route_index=0):
+    worker_session = get_worker_session(route_index)
+    if worker_state['transport'] == 'httpx':
+        try:
+            response = worker_session.get(url, timeout=20)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e))
+        except httpx.HTTPError as e:
+            raise requests.RequestException(str(e))
+        wire_bytes = response.num_bytes_downloaded
+    else:
+        response = worker_session.get(url, timeout=20)
+        wire_bytes = response.raw.tell()
+    record_transfer(wire_bytes, len(response.content))
+    if response.status_code >= 400:
+        raise requests.HTTPError(f"{response.status_code} error for {url}", response=response)
+    return response.text
+
+def write_raw_file_atomic(raw_file_path, raw_text_data):
+    temp_file_path = f'{raw_file_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(raw_text_data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file_path, raw_file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+
+def get_worker_db_connection(family):
+    conn = worker_state['db_connections'].get(family['key'])
+    if conn is None:
+        conn = get_db_connection(family)
+        worker_state['db_connections'][family['key']] = conn
+    return conn
+
+def close_worker_db_connection(family):
+    conn = worker_state['db_connections'].pop(family['key'], None)
+    if conn:
+        conn.close()
+
+def ensure_worker_subfolder(subfolder_path):
+    if subfolder_path not in worker_state['subfolders']:
+        os.makedirs(subfolder_path, exist_ok=True)
+        worker_state['subfolders'].add(subfolder_path)
+
+def parse_result_id(href):
+    try:
+        return int(href.rstrip('/').split('/')[-1])
+    except ValueError:
+        return None
+
+def get_max_remote_id(family):
+    url = family['latest_results_url']
+    prefix = family['result_path_prefix']
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, 'html.parser')
+        if family['latest_results_style'] == 'device_table':
+            links = [td.find('a', href=True) for td in soup.find_all('td', class_='device')]
+        else:
+            links = soup.find_all('a', href=True)
+        for link in links:
+            if link and link['href'].startswith(prefix):
+                max_id = parse_result_id(link['href'])
+                if max_id is not None:
+                    return max_id
+        print(f"Could not find a result link on {url}")
+        return None
+    except requests.RequestException as e:
+        print(f"Error fetching max remote ID page: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while parsing max remote ID page: {e}")
+        return None
+
+def get_raw_data_subfolder(family, id, group_size=5000):
+    start_id = ((id - 1) // group_size) * group_size + 1
+    end_id = start_id + group_size - 1
+    return os.path.join(family['raw_data_dir'], f'{start_id}-{end_id}')
+
+def format_cache_value(size, count):
+    if size is not None and count is not None:
+        try:
+            count_value_num = float(count)
+            if count_value_num > 0:
+                return f"{int(count_value_num)}x {size}"
+            return str(size)
+        except (ValueError, TypeError):
+            return str(size)
+    if size is not None:
+        return str(size)
+    if count is not None:
+        return str(count)
+    return None
+
+def extract_data_entry(family, raw_json_data, data_entry):
+    for field in family['text_fields']:
+        data_entry[field] = raw_json_data.get(field)
+    for field in family['score_fields']:
+        data_entry[field] = str(raw_json_data.get(field)) if raw_json_data.get(field) is not None else None
+    metrics = raw_json_data.get('metrics', [])
+    metrics_by_id = {metric.get('id'): metric for metric in metrics if metric.get('id') is not None}
+    for db_col, (metric_id, json_key) in family['metric_id_map'].items():
+        metric = metrics_by_id.get(metric_id)
+        if metric:
+            value = metric.get(json_key)
+            data_entry[db_col] = str(value) if value is not None else None
+    for db_col, ids in family['cache_id_map'].items():
+        size_metric = metrics_by_id.get(ids.get('size_id'))
+        count_metric = metrics_by_id.get(ids.get('count_id'))
+        size = size_metric.get('value') if size_metric else None
+        cache_count = count_metric.get('value') if count_metric else None
+        data_entry[db_col] = format_cache_value(size, cache_count)
+    workloads_by_section_and_id = {}
+    for section in raw_json_data.get('sections', []):
+        section_id = section.get('id')
+        for workload in section.get('workloads', []):
+            workload_id = workload.get('id')
+            if workload_id is not None:
+                workloads_by_section_and_id[(section_id, workload_id)] = workload
+                workloads_by_section_and_id.setdefault((None, workload_id), workload)
+    for db_col, (section_id, workload_id) in family['workload_id_map'].items():
+        workload_data = workloads_by_section_and_id.get((section_id, workload_id))
+        if workload_data:
+            score = workload_data.get('score')
+            data_entry[db_col] = str(score) if score is not None else None
+    return data_entry
+
+def encode_detail_fields(item, excluded_keys):
+    fields = {key: value for key, value in item.items() if key not in excluded_keys}
+    return json.dumps(fields, separators=(',', ':')) if fields else None
+
+def encode_detail_value(value):
+    return json.dumps(value, separators=(',', ':')) if isinstance(value, (dict, list)) else value
+
+def extract_detail_rows(id, raw_json_data):
+    metric_rows = []
+    for metric in raw_json_data.get('metrics', []):
+        if metric.get('id') is not None:
+            metric_rows.append((id, metric['id'], encode_detail_value(metric.get('value')), encode_detail_fields(metric, ('id', 'value'))))
+    workload_rows = []
+    for section in raw_json_data.get('sections', []):
+        section_id = section.get('id')
+        for workload in section.get('workloads', []):
+            if workload.get('id') is not None:
+                workload_rows.append((id, section_id if section_id is not None else 0, workload['id'], encode_detail_value(workload.get('score')),
+                                      encode_detail_fields(workload, ('id', 'score'))))
+    return metric_rows, workload_rows
+
+def read_local_raw_data(family, count):
+    pack_path = get_pack_path(family, count, 5000)
+    if os.path.exists(pack_path):
+        try:
+            raw_text_data = read_pack_document(pack_path, count)
+            if raw_text_data is not None:
+                return raw_text_data
+        except Exception as e:
+            print(f"\nError reading {family['name']} ID {count} from {pack_path}: {e}. Falling back to network.")
+            return None
+    raw_file_path = os.path.join(get_raw_data_subfolder(family, count, 5000), f"{count}{family['raw_file_extension']}")
+    if os.path.exists(raw_file_path):
+        try:
+            with open(raw_file_path, 'r', encoding='utf-8', newline='') as f:
+                return f.read()
+        except Exception as e:
+            print(f"\nError reading local file {raw_file_path}: {e}. Falling back to network.")
+    return None
+
+def read_checked_local_raw_data(family, c, count):
+    record = get_raw_document_record(c, count)
+    if record and not record[1]:
+        return None, None
+    raw_text_data = read_local_raw_data(family, count)
+    if raw_text_data is None:
+        return None, None
+    if record and record[0] is not None and hashlib.sha256(raw_text_data.encode('utf-8')).digest() != record[0]:
+        print(f"\nLocal raw data for {family['name']} ID {count} does not match its recorded content hash. Falling back to network.")
+        return None, None
+    try:
+        return raw_text_data, json.loads(raw_text_data)
+    except json.JSONDecodeError as e:
+        print(f"\nLocal raw data for {family['name']} ID {count} is corrupt or truncated ({e}). Falling back to network.")
+        return None, None
+
+def save_raw_data(family, count, raw_text_data):
+    if worker_state.get('raw_store') == 'pack':
+        pack_path = get_pack_path(family, count, 5000)
+        try:
+            ensure_worker_subfolder(family['raw_data_dir'])
+            append_pack_document(pack_path, count, raw_text_data)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"\nError saving raw data for ID {count} to pack {pack_path}: {e}")
+        return
+    subfolder_path = get_raw_data_subfolder(family, count, 5000)
+    raw_file_path = os.path.join(subfolder_path, f"{count}{family['raw_file_extension']}")
+    try:
+        ensure_worker_subfolder(subfolder_path)
+        try:
+            write_raw_file_atomic(raw_file_path, raw_text_data)
+        except FileNotFoundError:
+            worker_state['subfolders'].discard(subfolder_path)
+            ensure_worker_subfolder(subfolder_path)
+            write_raw_file_atomic(raw_file_path, raw_text_data)
+    except IOError as e:
+        print(f"\nError saving raw data for ID {count} to file {raw_file_path}: {e}")
+
+def fetch_data(family_key, count, route_index=0):
+    family = get_family(family_key)
+    url = f"{family['result_url']}{count}{family['raw_file_extension']}"
+    try:
+        conn = get_worker_db_connection(family)
+        c = conn.cursor()
+        raw_text_data, raw_json_data = read_checked_local_raw_data(family, c, count)
+        raw_document = None
+        data_entry = {'id': count}
+        for col in family['data_columns']:
+             data_entry[col] = None
+        if raw_text_data is None:
+            try:
+                raw_text_data = http_get(url, route_index)
+                save_raw_data(family, count, raw_text_data)
+                raw_bytes = raw_text_data.encode('utf-8')
+                raw_document = [hashlib.sha256(raw_bytes).digest(), len(raw_bytes), True]
+            except requests.HTTPError as e:
+                if e.response.status_code == 404:
+                    c.execute("INSERT OR REPLACE INTO data (id) VALUES (?)", (count,))
+                    record_coverage_row(c, count, True)
+                    write_detail_rows(c, (count,), [], [])
+                    clear_raw_document(c, count)
+                    conn.commit()
+                    print(f"{family['name']} ID {count} returned 404, marked as checked in DB with NULL data.")
+                    return '404'
+                elif e.response.status_code in [401, 403]:
+                     print(f"\nAuthentication/Authorization error for {family['name']} ID {count}.")
+                     return 'auth_error'
+                elif e.response.status_code == 429 or e.response.status_code >= 500:
+                    print(f"\nHTTP error {e.response.status_code} for {family['name']} ID {count}, counting against the egress route.")
+                    return 'route_error'
+                else:
+                    print(f"\nOther HTTP error {e.response.status_code} for {family['name']} ID {count}.")
+                    return 'other_error'
+            except requests.Timeout:
+                print(f"\nRequest timed out for {family['name']} ID {count}.")
+                return 'route_error'
+            except requests.RequestException as e:
+                print(f"\nRequest Exception for {family['name']} ID {count}: {e}")
+                return 'route_error'
+            except Exception as e:
+                print(f"\nAn unexpected error occurred for {family['name']} ID {count} during network fetch: {e}")
+                return 'other_error'
+        error_occured_during_parsing = False
+        detail_rows = ([], [])
+        if raw_text_data is not None:
+            try:
+                if raw_json_data is None:
+                    raw_json_data = json.loads(raw_text_data)
+                extract_data_entry(family, raw_json_data, data_entry)
+                detail_rows = extract_detail_rows(count, raw_json_data)
+                data_entry['extractor_version'] = family['extractor_version']
+            except json.JSONDecodeError as e:
+                print(f"\nJSON Decode Error for {family['name']} ID {count}: {e}. Response text starts with: {raw_text_data[:500]}...")
+                error_occured_during_parsing = True
+                if raw_document:
+                    raw_document[2] = False
+            except Exception as e:
+                print(f"\nAn unexpected error occurred for {family['name']} ID {count} during JSON parsing/data extraction: {e}")
+                error_occured_during_parsing = True
+            columns = ', '.join(f'"{col}"' for col in data_entry.keys())
+            placeholders = ', '.join('?' * len(data_entry))
+            sql = f"INSERT OR REPLACE INTO data ({columns}) VALUES ({placeholders})"
+            values = tuple(data_entry.values())
+            try:
+                c.execute(sql, values)
+                record_coverage_row(c, count, all(data_entry[col] is None for col in family['data_columns']))
+                write_detail_rows(c, (count,), *detail_rows)
+                if raw_document:
+                    record_raw_document(c, count, *raw_document)
+                conn.commit()
+                if error_occured_during_parsing:
+                    return 'other_error'
+                else:
+                    return 'success'
+            except sqlite3.Error as e:
+                print(f"\nDatabase error inserting/replacing data for {family['name']} ID {count}: {e}")
+                conn.rollback()
+                return 'other_error'
+        else:
+             try:
+                 c.execute("INSERT OR IGNORE INTO data (id) VALUES (?)", (count,))
+                 if c.rowcount == 1:
+                     record_coverage_row(c, count, True)
+                 conn.commit()
+             except sqlite3.Error as db_err:
+                 print(f"\nDatabase error marking {family['name']} ID {count} as attempted (no data): {db_err}")
+             return 'other_error'
+    except sqlite3.Error as e:
+        print(f"\nCritical Database connection error for {family['name']} ID {count} during fetch: {e}")
+        close_worker_db_connection(family)
+        return 'other_error'
@@ -0,0 +1,74 @@
+import bisect
+
+ID_RANGE_CHUNK_SIZE = 100000
+
+def normalize_id_ranges(ranges):
+    merged = []
+    for start_id, end_id in sorted(ranges):
+        if merged and start_id <= merged[-1][1] + 1:
+            if end_id > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end_id)
+        else:
+            merged.append((start_id, end_id))
+    return merged
+
+def merge_id_ranges(ranges_a, ranges_b):
+    merged = []
+    i = j = 0
+    while i < len(ranges_a) or j < len(ranges_b):
+        if j >= len(ranges_b) or (i < len(ranges_a) and ranges_a[i][0] <= ranges_b[j][0]):
+            start_id, end_id = ranges_a[i]
+            i += 1
+        else:
+            start_id, end_id = ranges_b[j]
+            j += 1
+        if merged and start_id <= merged[-1][1] + 1:
+            if end_id > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end_id)
+        else:
+            merged.append((start_id, end_id))
+    return merged
+
+def subtract_id_ranges(ranges, removed_ranges):
+    result = []
+    j = 0
+    for start_id, end_id in ranges:
+        while j < len(removed_ranges) and removed_ranges[j][1] < start_id:
+            j += 1
+        k = j
+        while start_id <= end_id and k < len(removed_ranges) and removed_ranges[k][0] <= end_id:
+            removed_start_id, removed_end_id = removed_ranges[k]
+            if removed_start_id > start_id:
+                result.append((start_id, removed_start_id - 1))
+            start_id = max(start_id, removed_end_id + 1)
+            k += 1
+        if start_id <= end_id:
+            result.append((start_id, end_id))
+    return result
+
+def collect_id_ranges(range_stream, chunk_size=ID_RANGE_CHUNK_SIZE):
+    ranges = []
+    chunk = []
+    for id_range in range_stream:
+        chunk.append(id_range)
+        if len(chunk) >= chunk_size:
+            ranges = merge_id_ranges(ranges, normalize_id_ranges(chunk))
+            chunk = []
+    return merge_id_ranges(ranges, normalize_id_ranges(chunk))
+
+def count_id_ranges(ranges):
+    return sum(end_id - start_id + 1 for start_id, end_id in ranges)
+
+def iter_id_ranges(ranges):
+    for start_id, end_id in ranges:
+        yield from range(start_id, end_id + 1)
+
+def clip_id_ranges(ranges, start_id, end_id):
+    index = bisect.bisect_left(ranges, (start_id,))
+    if index > 0 and ranges[index - 1][1] >= start_id:
+        index -= 1
+    clipped = []
+    while index < len(ranges) and ranges[index][0] <= end_id:
+        clipped.append((max(ranges[index][0], start_id), min(ranges[index][1], end_id)))
+        index += 1
+    return clipped
@@ -0,0 +1,301 @@
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+from .db import get_coverage_ranges, get_db_connection, get_snapshot_connection
+from .idranges import count_id_ranges
+
+INDEX_BUILD_CHUNK_SIZE = 20000
+INDEX_BUILD_PAUSE = 0.05
+INDEX_ONLINE_MIN_ROWS = 1000000
+INDEX_ANALYSIS_LIMIT = 1000
+REBUILD_TABLE = 'data_rebuild'
+RETIRED_TABLE = 'data_retired'
+INDEX_FREE_SPACE_MARGIN = 1.2
+REBUILD_TRIGGERS = ('data_rebuild_insert', 'data_rebuild_update', 'data_rebuild_delete')
+
+QUERY_LIBRARY = [
+    {'name': 'Scores for a processor', 'sql': 'SELECT id, {score_columns} FROM data WHERE Processor = ?', 'columns': ['Processor'], 'params': ('',)},
+    {'name': 'Scores for a model', 'sql': 'SELECT id, {score_columns} FROM data WHERE Model = ?', 'columns': ['Model'], 'params': ('',)},
+    {'name': 'Results per processor', 'sql': 'SELECT Processor, COUNT(*) FROM data GROUP BY Processor', 'columns': ['Processor'], 'params': ()},
+    {'name': 'Results for a device', 'sql': 'SELECT id, {score_columns} FROM data WHERE device_name = ? AND backend_name = ?', 'columns': ['device_name', 'backend_name'], 'params': ('', '')},
+    {'name': 'Results of a version', 'sql': 'SELECT id FROM data WHERE version = ?', 'columns': ['version'], 'params': ('',)},
+    {'name': 'Results in a date range', 'sql': 'SELECT id FROM data WHERE date >= ? AND date < ?', 'columns': ['date'], 'params': ('', '')},
+    {'name': 'Results per operating system', 'sql': 'SELECT Operating_System, COUNT(*) FROM data GROUP BY Operating_System', 'columns': ['Operating_System'], 'params': ()},
+    {'name': 'Workload leaderboard', 'sql': 'SELECT id, score FROM result_workloads WHERE workload_id = ? AND section_id = ? ORDER BY score DESC LIMIT 100', 'columns': [], 'params': (0, 0)},
+    {'name': 'Results with a metric value', 'sql': 'SELECT id FROM result_metrics WHERE metric_id = ? AND value = ?', 'columns': [], 'params': (0, '')},
+]
+
+def quote_columns(columns, prefix=''):
+    return ', '.join(f'{prefix}"{col}"' for col in columns)
+
+def get_index_sql(index_name, table, columns):
+    return f'CREATE INDEX IF NOT EXISTS "{index_name}" ON {table} ({quote_columns(columns)})'
+
+def get_table_columns(c, table):
+    return [row[1] for row in c.execute(f'PRAGMA table_info({table})')]
+
+def get_physical_indexes(c, table):
+    return dict(c.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)))
+
+def get_managed_indexes(c):
+    return {name: (index_name, columns, state) for name, index_name, columns, state in c.execute('SELECT name, index_name, columns, state FROM managed_indexes')}
+
+def get_pending_indexes(c, family):
+    physical = get_physical_indexes(c, 'data')
+    pending = []
+    for name, (index_name, columns, state) in get_managed_indexes(c).items():
+        if name not in family['indexes'] or columns != ','.join(family['indexes'][name]):
+            c.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+            c.execute('DELETE FROM managed_indexes WHERE name = ?', (name,))
+        elif state != 'ready' or index_name not in physical:
+            pending.append(name)
+    managed = get_managed_indexes(c)
+    return pending + [name for name in family['indexes'] if name not in managed]
+
+def get_next_index_generation(c):
+    return max(c.execute('SELECT COALESCE(MAX(generation), 0) FROM managed_indexes').fetchone()[0],
+               c.execute('SELECT COALESCE(MAX(generation), 0) FROM index_builds').fetchone()[0]) + 1
+
+def record_managed_index(c, name, index_name, columns, generation):
+    c.execute("INSERT OR REPLACE INTO managed_indexes (name, index_name, columns, state, generation, built) VALUES (?, ?, ?, 'ready', ?, ?)",
+              (name, index_name, ','.join(columns), generation, time.time()))
+
+def analyze_indexes(c, index_names):
+    c.execute(f'PRAGMA analysis_limit = {INDEX_ANALYSIS_LIMIT}')
+    for index_name in index_names:
+        c.execute(f'ANALYZE "{index_name}"')
+
+def create_indexes_directly(family, conn, pending):
+    c = conn.cursor()
+    generation = get_next_index_generation(c)
+    index_names = []
+    for name in pending:
+        index_name = f'{name}_{generation}'
+        c.execute(get_index_sql(index_name, 'data', family['indexes'][name]))
+        record_managed_index(c, name, index_name, family['indexes'][name], generation)
+        conn.commit()
+        index_names.append(index_name)
+    analyze_indexes(c, index_names)
+    conn.commit()
+    print(f"\nBuilt {len(pending)} {family['name']} indexes: {', '.join(pending)}.")
+
+def drop_online_rebuild(c):
+    for trigger in REBUILD_TRIGGERS:
+        c.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    c.execute(f'DROP TABLE IF EXISTS {REBUILD_TABLE}')
+    c.execute("DELETE FROM index_builds WHERE table_name = 'data'")
+
+def is_online_rebuild_intact(c):
+    trigger_count = c.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' * len(REBUILD_TRIGGERS))})", REBUILD_TRIGGERS).fetchone()[0]
+    return trigger_count == len(REBUILD_TRIGGERS) and get_table_columns(c, REBUILD_TABLE) == get_table_columns(c, 'data')
+
+def start_online_rebuild(family, c):
+    drop_online_rebuild(c)
+    generation = get_next_index_generation(c)
+    table_sql = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'data'").fetchone()[0]
+    table_definition = re.match(r'CREATE TABLE\s+(?:data|"data")\s*(\(.*)', table_sql, re.DOTALL)
+    if not table_definition:
+        raise sqlite3.OperationalError(f'unexpected data table definition: {table_sql[:80]}')
+    c.execute(f'CREATE TABLE {REBUILD_TABLE} {table_definition.group(1)}')
+    for name, columns in family['indexes'].items():
+        c.execute(get_index_sql(f'{name}_{generation}', REBUILD_TABLE, columns))
+    columns = get_table_columns(c, 'data')
+    column_list = quote_columns(columns)
+    new_values = quote_columns(columns, 'NEW.')
+    c.execute(f'CREATE TRIGGER data_rebuild_insert AFTER INSERT ON data BEGIN INSERT OR REPLACE INTO {REBUILD_TABLE} ({column_list}) VALUES ({new_values}); END')
+    c.execute(f'CREATE TRIGGER data_rebuild_update AFTER UPDATE ON data BEGIN INSERT OR REPLACE INTO {REBUILD_TABLE} ({column_list}) VALUES ({new_values}); END')
+    c.execute(f'CREATE TRIGGER data_rebuild_delete AFTER DELETE ON data BEGIN DELETE FROM {REBUILD_TABLE} WHERE id = OLD.id; END')
+    c.execute("INSERT INTO index_builds (table_name, generation, watermark, started) VALUES ('data', ?, 0, ?)", (generation, time.time()))
+    return generation, 0
+
+def swap_rebuilt_table(family, conn, generation, watermark):
+    c = conn.cursor()
+    column_list = quote_columns(get_table_columns(c, 'data'))
+    managed_names = set(index_name for index_name, columns, state in get_managed_indexes(c).values())
+    c.execute('BEGIN IMMEDIATE')
+    c.execute(f'INSERT OR IGNORE INTO {REBUILD_TABLE} ({column_list}) SELECT {column_list} FROM data WHERE id > ?', (watermark,))
+    unmanaged_sqls = {index_name: sql for index_name, sql in get_physical_indexes(c, 'data').items() if index_name not in managed_names}
+    for trigger in REBUILD_TRIGGERS:
+        c.execute(f'DROP TRIGGER {trigger}')
+    for index_name in unmanaged_sqls:
+        c.execute(f'DROP INDEX "{index_name}"')
+    c.execute(f'ALTER TABLE data RENAME TO {RETIRED_TABLE}')
+    c.execute(f'ALTER TABLE {REBUILD_TABLE} RENAME TO data')
+    for sql in unmanaged_sqls.values():
+        c.execute(sql)
+    c.execute('DELETE FROM managed_indexes')
+    for name, columns in family['indexes'].items():
+        record_managed_index(c, name, f'{name}_{generation}', columns, generation)
+    c.execute("DELETE FROM index_builds WHERE table_name = 'data'")
+    conn.commit()
+    analyze_indexes(c, [f'{name}_{generation}' for name in family['indexes']])
+    conn.commit()
+
+def has_free_space_for_rebuild(family, c):
+    page_size = c.execute('PRAGMA page_size').fetchone()[0]
+    used_pages = c.execute('PRAGMA page_count').fetchone()[0] - c.execute('PRAGMA freelist_count').fetchone()[0]
+    needed = used_pages * page_size * INDEX_FREE_SPACE_MARGIN
+    free = shutil.disk_usage(os.path.dirname(os.path.abspath(family['database_file']))).free
+    if free >= needed:
+        return True
+    print(f"\nNot enough free disk space for the online {family['name']} index build: the indexed copy of the data table needs up to {needed / 1048576:.0f} MB, "
+          f"only {free / 1048576:.0f} MB are free. The indexes are not built.")
+    return False
+
+def drop_retired_table(family, conn, stop_event=None, chunk_size=INDEX_BUILD_CHUNK_SIZE, pause=INDEX_BUILD_PAUSE):
+    c = conn.cursor()
+    if not c.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (RETIRED_TABLE,)).fetchone()[0]:
+        return True
+    while True:
+        if stop_event and stop_event.is_set():
+            print(f"\nPaused dropping the old {family['name']} data table; it continues on the next run.")
+            return False
+        c.execute(f'DELETE FROM {RETIRED_TABLE} WHERE rowid IN (SELECT rowid FROM {RETIRED_TABLE} ORDER BY rowid LIMIT ?)', (chunk_size,))
+        deleted = c.rowcount
+        conn.commit()
+        if deleted == 0:
+            break
+        if stop_event:
+            stop_event.wait(pause)
+        else:
+            time.sleep(pause)
+    c.execute(f'DROP TABLE {RETIRED_TABLE}')
+    conn.commit()
+    return True
+
+def rebuild_data_table_online(family, conn, stop_event=None, chunk_size=INDEX_BUILD_CHUNK_SIZE, pause=INDEX_BUILD_PAUSE):
+    c = conn.cursor()
+    build = c.execute("SELECT generation, watermark FROM index_builds WHERE table_name = 'data'").fetchone()
+    if build and not is_online_rebuild_intact(c):
+        print(f"\nThe interrupted {family['name']} index build no longer matches the data table, starting it over.")
+        build = None
+    if build:
+        generation, watermark = build
+        print(f"\nResuming the online {family['name']} index build after ID {watermark}.")
+    else:
+        if not has_free_space_for_rebuild(family, c):
+            return False
+        generation, watermark = start_online_rebuild(family, c)
+        conn.commit()
+        print(f"\nBuilding {family['name']} indexes online: copying the data table in chunks of {chunk_size} rows into an indexed copy.")
+    column_list = quote_columns(get_table_columns(c, 'data'))
+    started_at = time.time()
+    copied = 0
+    while True:
+        if stop_event and stop_event.is_set():
+            print(f"\nPaused the online {family['name']} index build after ID {watermark}; it resumes on the next run.")
+            return False
+        chunk_end_id = c.execute('SELECT MAX(id) FROM (SELECT id FROM data WHERE id > ? ORDER BY id LIMIT ?)', (watermark, chunk_size)).fetchone()[0]
+        if chunk_end_id is None:
+            break
+        c.execute(f'INSERT OR IGNORE INTO {REBUILD_TABLE} ({column_list}) SELECT {column_list} FROM data WHERE id > ? AND id <= ?', (watermark, chunk_end_id))
+        copied += c.rowcount
+        c.execute("UPDATE index_builds SET watermark = ? WHERE table_name = 'data'", (chunk_end_id,))
+        conn.commit()
+        watermark = chunk_end_id
+        if stop_event:
+            stop_event.wait(pause)
+        else:
+            time.sleep(pause)
+    swap_rebuilt_table(family, conn, generation, watermark)
+    print(f"\nFinished the online {family['name']} index build in {time.time() - started_at:.1f}s ({copied} rows copied): {', '.join(family['indexes'])}.")
+    return drop_retired_table(family, conn, stop_event, chunk_size, pause)
+
+def build_managed_indexes(family, stop_event=None, chunk_size=INDEX_BUILD_CHUNK_SIZE, pause=INDEX_BUILD_PAUSE):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        if not drop_retired_table(family, conn, stop_event, chunk_size, pause):
+            return False
+        pending = get_pending_indexes(c, family)
+        conn.commit()
+        build = c.execute("SELECT generation FROM index_builds WHERE table_name = 'data'").fetchone()
+        if not pending:
+            if build:
+                drop_online_rebuild(c)
+                conn.commit()
+            return True
+        if build is None and count_id_ranges(get_coverage_ranges(family, 'present')) < INDEX_ONLINE_MIN_ROWS:
+            create_indexes_directly(family, conn, pending)
+            return True
+        return rebuild_data_table_online(family, conn, stop_event, chunk_size, pause)
+    except sqlite3.Error as e:
+        print(f"\nDatabase error building indexes for {family['name']}: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def defer_managed_indexes(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        deferred = []
+        for name, (index_name, columns, state) in get_managed_indexes(c).items():
+            if state == 'ready':
+                c.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+                c.execute("UPDATE managed_indexes SET state = 'deferred' WHERE name = ?", (name,))
+                deferred.append(name)
+        conn.commit()
+        if deferred:
+            print(f"Deferred {len(deferred)} {family['name']} indexes until the backfill is done: {', '.join(deferred)}.")
+    except sqlite3.Error as e:
+        print(f"Database error deferring indexes for {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def index_builder_task(stop_event, start_event, families):
+    while not start_event.wait(1):
+        if stop_event.is_set():
+            return
+    for family in families:
+        if stop_event.is_set() or not build_managed_indexes(family, stop_event):
+            return
+
+def start_index_builder(families, start_event):
+    stop_event = threading.Event()
+    builder_thread = threading.Thread(target=index_builder_task, args=(stop_event, start_event, families))
+    builder_thread.daemon = True
+    builder_thread.start()
+    return builder_thread, stop_event
+
+def stop_index_builder(builder_thread, stop_event):
+    if builder_thread and builder_thread.is_alive():
+        stop_event.set()
+        builder_thread.join()
+
+def analyze_queries(family):
+    conn = None
+    try:
+        conn = get_snapshot_connection(family)
+        available_columns = set(family['data_columns'])
+        managed = get_managed_indexes(conn.cursor())
+        missing = [name for name in family['indexes'] if name not in managed or managed[name][2] != 'ready']
+        if missing:
+            print(f"Managed indexes not built yet: {', '.join(missing)}.")
+        full_scan_count = 0
+        for query in QUERY_LIBRARY:
+            if not set(query['columns']) <= available_columns:
+                continue
+            sql = query['sql'].format(score_columns=quote_columns(family['score_fields']))
+            plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', query['params'])]
+            full_scan = any(detail.startswith('SCAN data') and 'INDEX' not in detail for detail in plan)
+            full_scan_count += full_scan
+            print(f"{query['name']}{' [FULL SCAN]' if full_scan else ''}:\n    {sql}")
+            for detail in plan:
+                print(f"      {detail}")
+        print(f"{full_scan_count} standard {family['name']} queries scan the whole data table.")
+    except sqlite3.Error as e:
+        print(f"Database error analyzing {family['name']} queries: {e}")
+    finally:
+        if conn:
+            conn.close()
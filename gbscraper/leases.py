@@ -0,0 +1,212 @@
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from .auth import SESSION_REFRESH_MAX_ATTEMPTS
+from .db import DB_BUSY_TIMEOUT_MS, get_last_id_from_db
+from .egress import (EGRESS_MAX_RETRIES, get_route_wait_time, load_egress_routes, pick_egress_route,
+                     record_route_result, take_egress_route)
+from .fetch import fetch_data, get_max_remote_id
+from .scheduler import SYNC_INTERVAL, refresh_failed_routes, spinner_task
+from .shutdown import is_shutdown_requested, wait_for_shutdown
+
+LEASE_RANGE_SIZE = 500
+LEASE_DURATION = 300
+
+def get_coordinator_connection(coordinator_path):
+    conn = sqlite3.connect(coordinator_path, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute('''CREATE TABLE IF NOT EXISTS work_leases
+                    (family TEXT NOT NULL, start_id INTEGER NOT NULL, end_id INTEGER NOT NULL, next_id INTEGER NOT NULL,
+                     status TEXT NOT NULL, owner TEXT, lease_expires REAL,
+                     successful INTEGER DEFAULT 0, failed INTEGER DEFAULT 0, not_found INTEGER DEFAULT 0,
+                     PRIMARY KEY (family, start_id))''')
+    conn.execute('CREATE INDEX IF NOT EXISTS work_leases_status ON work_leases (family, status, lease_expires)')
+    return conn
+
+def claim_lease(conn, family_key, node_id, max_remote_id, seed_id, range_size=LEASE_RANGE_SIZE, lease_duration=LEASE_DURATION):
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        c = conn.cursor()
+        c.execute("SELECT start_id, end_id, next_id, owner FROM work_leases WHERE family = ? AND status = 'leased' AND lease_expires < ? ORDER BY start_id LIMIT 1", (family_key, now))
+        row = c.fetchone()
+        if row:
+            start_id, end_id, next_id, previous_owner = row
+            c.execute('UPDATE work_leases SET owner = ?, lease_expires = ? WHERE family = ? AND start_id = ?', (node_id, now + lease_duration, family_key, start_id))
+            conn.execute('COMMIT')
+            print(f"\nReclaimed expired {family_key} lease {start_id}-{end_id} from {previous_owner} (resuming at {next_id}).")
+            return (start_id, end_id, next_id)
+        c.execute('SELECT MAX(end_id) FROM work_leases WHERE family = ?', (family_key,))
+        last_end_id = c.fetchone()[0]
+        start_id = last_end_id + 1 if last_end_id is not None else max(seed_id, 1)
+        if start_id > max_remote_id:
+            conn.execute('COMMIT')
+            return None
+        end_id = min(start_id + range_size - 1, max_remote_id)
+        c.execute("INSERT INTO work_leases (family, start_id, end_id, next_id, status, owner, lease_expires) VALUES (?, ?, ?, ?, 'leased', ?, ?)",
+                  (family_key, start_id, end_id, start_id, node_id, now + lease_duration))
+        conn.execute('COMMIT')
+        return (start_id, end_id, start_id)
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+
+def renew_lease(conn, family_key, node_id, start_id, next_id, counts, lease_duration=LEASE_DURATION):
+    successful, failed, not_found = counts
+    c = conn.execute("UPDATE work_leases SET next_id = ?, lease_expires = ?, successful = successful + ?, failed = failed + ?, not_found = not_found + ? WHERE family = ? AND start_id = ? AND owner = ? AND status = 'leased'",
+                     (next_id, time.time() + lease_duration, successful, failed, not_found, family_key, start_id, node_id))
+    return c.rowcount == 1
+
+def complete_lease(conn, family_key, node_id, start_id):
+    c = conn.execute("UPDATE work_leases SET status = 'done', lease_expires = NULL WHERE family = ? AND start_id = ? AND owner = ? AND status = 'leased'",
+                     (family_key, start_id, node_id))
+    return c.rowcount == 1
+
+def release_lease(conn, family_key, node_id, start_id):
+    conn.execute("UPDATE work_leases SET lease_expires = 0 WHERE family = ? AND start_id = ? AND owner = ? AND status = 'leased'",
+                 (family_key, start_id, node_id))
+
+def pick_pending_id(pending_ids, failed_routes, routes):
+    blocked_routes = set()
+    for index in range(len(pending_ids) - 1, -1, -1):
+        excluded_route = failed_routes.get(pending_ids[index])
+        if excluded_route in blocked_routes:
+            continue
+        route_index = pick_egress_route(routes, excluded_route)
+        if route_index is not None:
+            return index, route_index
+        blocked_routes.add(excluded_route)
+    return None, None
+
+def fetch_lease_batch(pool, family, ids_to_fetch_batch, counts, routes, failed_routes=None):
+    completions = queue.Queue()
+    pending_ids = list(reversed(ids_to_fetch_batch))
+    route_retries = {}
+    failed_routes = dict(failed_routes or {})
+    in_flight = 0
+    auth_failed = []
+    while (pending_ids and not is_shutdown_requested()) or in_flight:
+        while pending_ids and not is_shutdown_requested():
+            pending_index, route_index = pick_pending_id(pending_ids, failed_routes, routes)
+            if pending_index is None:
+                break
+            id = pending_ids.pop(pending_index)
+            take_egress_route(routes, route_index)
+            pool.apply_async(fetch_data, args=(family['key'], id, route_index),
+                             callback=lambda result, id=id, route_index=route_index: completions.put((id, route_index, result)),
+                             error_callback=lambda e, id=id, route_index=route_index: completions.put((id, route_index, e)))
+            in_flight += 1
+        try:
+            id, route_index, result = completions.get(timeout=get_route_wait_time(routes))
+        except queue.Empty:
+            continue
+        in_flight -= 1
+        if isinstance(result, Exception):
+            print(f"\nError processing {family['name']} ID {id} from pool: {result}")
+            result = 'other_error'
+        record_route_result(routes, route_index, result)
+        if result == 'success':
+            counts[0] += 1
+        elif result == '404':
+            counts[2] += 1
+        elif result == 'auth_error':
+            auth_failed.append((id, route_index))
+        elif result == 'route_error' and len(routes) > 1 and route_retries.get(id, 0) < EGRESS_MAX_RETRIES:
+            route_retries[id] = route_retries.get(id, 0) + 1
+            failed_routes[id] = route_index
+            pending_ids.append(id)
+        else:
+            counts[1] += 1
+    return auth_failed
+
+def process_lease(pool, cookies_ref, family, coordinator_conn, node_id, lease, lease_duration, routes):
+    family_key = family['key']
+    start_id, end_id, next_id = lease
+    batch_size = pool._processes * 2
+    while next_id <= end_id:
+        ids_to_fetch_batch = list(range(next_id, min(next_id + batch_size, end_id + 1)))
+        spinner_message = f"{family['name']} lease {start_id}-{end_id}: fetching batch {ids_to_fetch_batch[0]}-{ids_to_fetch_batch[-1]}"
+        stop_spinner_event = threading.Event()
+        spinner_thread = threading.Thread(target=spinner_task, args=(stop_spinner_event, spinner_message))
+        spinner_thread.daemon = True
+        spinner_thread.start()
+        counts = [0, 0, 0]
+        auth_failed = fetch_lease_batch(pool, family, ids_to_fetch_batch, counts, routes)
+        if spinner_thread and spinner_thread.is_alive():
+            stop_spinner_event.set()
+            spinner_thread.join()
+        if is_shutdown_requested():
+            print(f"\nShutdown requested. Releasing lease {start_id}-{end_id} at ID {next_id} for another node.")
+            release_lease(coordinator_conn, family_key, node_id, start_id)
+            return 'shutdown'
+        refresh_attempts = 0
+        while auth_failed:
+            print(f"\nAuthentication error for {len(auth_failed)} {family['name']} IDs. Pausing the lease to refresh the session.")
+            unrefreshed_routes = None
+            if refresh_attempts < SESSION_REFRESH_MAX_ATTEMPTS:
+                unrefreshed_routes = refresh_failed_routes(cookies_ref, routes, {route_index for id, route_index in auth_failed})
+            if unrefreshed_routes is None:
+                print("Could not refresh the session. Releasing lease and stopping coordinated scraping.")
+                release_lease(coordinator_conn, family_key, node_id, start_id)
+                return 'auth_error'
+            refresh_attempts += 1
+            auth_failed = fetch_lease_batch(pool, family, [id for id, route_index in auth_failed], counts, routes,
+                                            {id: route_index for id, route_index in auth_failed if route_index in unrefreshed_routes})
+        next_id = ids_to_fetch_batch[-1] + 1
+        try:
+            renewed = renew_lease(coordinator_conn, family_key, node_id, start_id, next_id, counts, lease_duration)
+        except sqlite3.Error as e:
+            print(f"\nCoordinator error while renewing lease {start_id}-{end_id}: {e}")
+            renewed = True
+        if not renewed:
+            print(f"\nLease {start_id}-{end_id} was lost to another node, claiming a new one.")
+            return 'lost'
+    try:
+        complete_lease(coordinator_conn, family_key, node_id, start_id)
+    except sqlite3.Error as e:
+        print(f"\nCoordinator error while completing lease {start_id}-{end_id}: {e}")
+    return 'done'
+
+def execute_coordinated_scraping_phase(pool, cookies_ref, families, coordinator_path, node_id, range_size=LEASE_RANGE_SIZE, lease_duration=LEASE_DURATION, routes=None):
+    routes = routes or load_egress_routes()
+    phase_name = f"Coordinated Scraping (node {node_id})"
+    print(f"\n--- {phase_name} ---")
+    try:
+        coordinator_conn = get_coordinator_connection(coordinator_path)
+    except sqlite3.Error as e:
+        print(f"Could not open coordinator database {coordinator_path}: {e}")
+        return
+    seed_ids = {family['key']: get_last_id_from_db(family) + 1 for family in families}
+    try:
+        while not is_shutdown_requested():
+            claimed_any_lease = False
+            for family in families:
+                if is_shutdown_requested():
+                    break
+                max_remote_id = get_max_remote_id(family)
+                if max_remote_id is None:
+                    print(f"Failed to get max remote ID for {family['name']}. Skipping its lease claim this round.")
+                    continue
+                try:
+                    lease = claim_lease(coordinator_conn, family['key'], node_id, max_remote_id, seed_ids[family['key']], range_size, lease_duration)
+                except sqlite3.Error as e:
+                    print(f"\nCoordinator error while claiming a {family['name']} lease: {e}")
+                    continue
+                if lease is None:
+                    continue
+                claimed_any_lease = True
+                if process_lease(pool, cookies_ref, family, coordinator_conn, node_id, lease, lease_duration, routes) in ('auth_error', 'shutdown'):
+                    return
+            if not claimed_any_lease:
+                for i in range(SYNC_INTERVAL, 0, -1):
+                    sys.stdout.write(f'\rNo unclaimed IDs up to the max remote IDs (Waiting {i} seconds for next lease) ')
+                    sys.stdout.flush()
+                    if wait_for_shutdown(1):
+                        break
+                sys.stdout.write('\r' + ' ' * 80 + '\r')
+                sys.stdout.flush()
+    finally:
+        coordinator_conn.close()
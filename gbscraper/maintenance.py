@@ -0,0 +1,86 @@
+import sqlite3
+import time
+
+from .db import get_db_connection
+from .indexes import INDEX_ANALYSIS_LIMIT
+
+MAINTENANCE_SLICE_SECONDS = 0.25
+MAINTENANCE_BUSY_TIMEOUT_MS = 100
+MAINTENANCE_VACUUM_PAGES = 256
+MAINTENANCE_ANALYZE_INTERVAL = 3600
+MAINTENANCE_CHECKPOINT_INTERVAL = 60
+
+def get_maintenance_state(maintenance, family):
+    return maintenance.setdefault(family['key'], {'analyzed': 0, 'analyze_queue': [], 'checkpointed': 0, 'freed_pages': 0, 'incremental_vacuum': None})
+
+def vacuum_free_pages(family, c, state, deadline):
+    free_pages = c.execute('PRAGMA freelist_count').fetchone()[0]
+    while free_pages and time.time() < deadline:
+        c.execute(f'PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES})').fetchall()
+        remaining_pages = c.execute('PRAGMA freelist_count').fetchone()[0]
+        state['freed_pages'] += free_pages - remaining_pages
+        free_pages = remaining_pages
+    if not free_pages and state['freed_pages']:
+        page_size = c.execute('PRAGMA page_size').fetchone()[0]
+        print(f"\nMaintenance: incremental vacuum returned {state['freed_pages']} free pages ({state['freed_pages'] * page_size / 1048576:.1f} MB) of the {family['name']} database to the file system.")
+        state['freed_pages'] = 0
+
+def analyze_tables(c, state, deadline):
+    if not state['analyze_queue'] and time.time() - state['analyzed'] >= MAINTENANCE_ANALYZE_INTERVAL:
+        state['analyze_queue'] = [row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    if not state['analyze_queue']:
+        return
+    c.execute(f'PRAGMA analysis_limit = {INDEX_ANALYSIS_LIMIT}')
+    while state['analyze_queue'] and time.time() < deadline:
+        c.execute(f'ANALYZE "{state["analyze_queue"][0]}"')
+        state['analyze_queue'].pop(0)
+    if not state['analyze_queue']:
+        state['analyzed'] = time.time()
+
+def run_maintenance_slice(families, maintenance, budget=MAINTENANCE_SLICE_SECONDS):
+    deadline = time.time() + budget
+    for family in families:
+        if time.time() >= deadline:
+            return
+        state = get_maintenance_state(maintenance, family)
+        conn = None
+        try:
+            conn = get_db_connection(family)
+            c = conn.cursor()
+            c.execute(f'PRAGMA busy_timeout = {MAINTENANCE_BUSY_TIMEOUT_MS}')
+            analyze_tables(c, state, deadline)
+            if state['incremental_vacuum'] is None:
+                state['incremental_vacuum'] = c.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+            if state['incremental_vacuum']:
+                vacuum_free_pages(family, c, state, deadline)
+            if time.time() < deadline and time.time() - state['checkpointed'] >= MAINTENANCE_CHECKPOINT_INTERVAL:
+                if c.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()[0] == 0:
+                    state['checkpointed'] = time.time()
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                print(f"\nDatabase error during maintenance of {family['name']}: {e}")
+        except sqlite3.Error as e:
+            print(f"\nDatabase error during maintenance of {family['name']}: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+def convert_to_incremental_vacuum(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        if c.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            free_pages = c.execute('PRAGMA freelist_count').fetchone()[0]
+            print(f"{family['name']} database already uses incremental vacuum ({free_pages} free pages are returned during idle sync intervals).")
+            return
+        print(f"Rebuilding the {family['name']} database with VACUUM to enable incremental vacuum. This rewrites the whole file and blocks writers until it finishes...")
+        started_at = time.time()
+        c.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        c.execute('VACUUM')
+        print(f"VACUUM finished in {time.time() - started_at:.1f}s.")
+    except sqlite3.Error as e:
+        print(f"Database error while vacuuming {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
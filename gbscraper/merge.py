@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import sys
+import time
+
+from .db import get_db_connection, get_snapshot_connection, set_coverage_valid
+from .raw import merge_raw_data, replace_raw_documents
+
+MERGE_CHUNK_SIZE = 50000
+MERGE_DETAIL_TABLES = {
+    'result_metrics': 'id, metric_id, value, fields',
+    'result_workloads': 'id, section_id, workload_id, score, fields',
+}
+
+def print_merge_progress(source_name, rows_done, started_at):
+    elapsed = time.time() - started_at
+    rate = rows_done / elapsed if elapsed > 0 else 0
+    sys.stdout.write(f'\rMerging {source_name}: {rows_done} rows ({rate:.0f} rows/s) ')
+    sys.stdout.flush()
+
+def has_table(c, schema, table):
+    c.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return c.fetchone()[0] > 0
+
+def get_source_shard_paths(c, source_db_path):
+    if not has_table(c, 'src', 'shards'):
+        return []
+    source_dir = os.path.dirname(os.path.abspath(source_db_path))
+    return [os.path.join(source_dir, row[0]) for row in c.execute('SELECT path FROM src.shards ORDER BY start_id').fetchall()]
+
+def get_row_rank_sql(data_table, rank_columns, raw_documents_table):
+    populated = ' OR '.join(f'row."{col}" IS NOT NULL' for col in rank_columns if col not in ('id', 'extractor_version')) or '0'
+    extractor_version = 'COALESCE(row.extractor_version, 0)' if 'extractor_version' in rank_columns else '0'
+    if raw_documents_table is None:
+        return f'SELECT row.id, ({populated}), {extractor_version}, 0 FROM {data_table} AS row WHERE row.id >= ? AND row.id < ?'
+    return (f'SELECT row.id, ({populated}), {extractor_version}, COALESCE(raw.checked, 0) FROM {data_table} AS row '
+            f'LEFT JOIN {raw_documents_table} AS raw ON raw.id = row.id WHERE row.id >= ? AND row.id < ?')
+
+def merge_source_rows(conn, family, schema, chunk_size, source_name, progress, source_raw_dir):
+    c = conn.cursor()
+    if not has_table(c, schema, 'data'):
+        return
+    target_columns = [row[1] for row in c.execute('PRAGMA main.table_info(data)')]
+    source_columns = set(row[1] for row in c.execute(f'PRAGMA {schema}.table_info(data)'))
+    columns = [col for col in target_columns if col in source_columns]
+    missing_columns = [col for col in target_columns if col not in source_columns]
+    if missing_columns:
+        print(f"\nSource {schema} data lacks {len(missing_columns)} columns, they will be left untouched.")
+    column_list = ', '.join(f'"{col}"' for col in columns)
+    update_list = ', '.join(f'"{col}" = excluded."{col}"' for col in columns if col != 'id')
+    rank_columns = family['data_columns'] + ['extractor_version']
+    raw_documents_table = 'src.raw_documents' if has_table(c, 'src', 'raw_documents') else None
+    source_rank_sql = get_row_rank_sql(f'{schema}.data', [col for col in rank_columns if col in source_columns], raw_documents_table)
+    if schema != 'src':
+        source_rank_sql += ' AND NOT EXISTS (SELECT 1 FROM src.data AS newer WHERE newer.id = row.id)'
+    target_rank_sql = get_row_rank_sql('data', rank_columns, 'raw_documents')
+    detail_tables = [(table, detail_columns, has_table(c, schema, table)) for table, detail_columns in MERGE_DETAIL_TABLES.items()]
+    c.execute(f'SELECT MIN(id), MAX(id) FROM {schema}.data')
+    min_id, max_id = c.fetchone()
+    if min_id is None:
+        return
+    chunk_start_id = min_id
+    while chunk_start_id <= max_id:
+        chunk_end_id = chunk_start_id + chunk_size
+        target = get_snapshot_connection(family)
+        try:
+            target_ranks = {row[0]: row[1:] for row in target.execute(target_rank_sql, (chunk_start_id, chunk_end_id))}
+        finally:
+            target.close()
+        source_ranks = c.execute(source_rank_sql, (chunk_start_id, chunk_end_id)).fetchall()
+        ids = [(row[0],) for row in source_ranks if row[0] not in target_ranks or row[1:] > target_ranks[row[0]]]
+        if ids:
+            c.execute('DELETE FROM temp.merge_ids')
+            c.executemany('INSERT INTO temp.merge_ids (id) VALUES (?)', ids)
+            c.execute(f'INSERT INTO main.data ({column_list}) SELECT {column_list} FROM {schema}.data WHERE id IN (SELECT id FROM temp.merge_ids) '
+                      f'ON CONFLICT(id) DO UPDATE SET {update_list}')
+            for table, detail_columns, source_has_table in detail_tables:
+                c.execute(f'DELETE FROM main.{table} WHERE id IN (SELECT id FROM temp.merge_ids)')
+                if source_has_table:
+                    c.execute(f'INSERT INTO main.{table} ({detail_columns}) SELECT {detail_columns} FROM {schema}.{table} WHERE id IN (SELECT id FROM temp.merge_ids)')
+            c.execute('DELETE FROM main.raw_documents WHERE id IN (SELECT id FROM temp.merge_ids)')
+            if raw_documents_table:
+                c.execute(f'INSERT INTO main.raw_documents (id, sha256, size, valid, checked) '
+                          f'SELECT id, sha256, size, valid, checked FROM {raw_documents_table} WHERE id IN (SELECT id FROM temp.merge_ids)')
+        conn.commit()
+        replaced_ids = [row[0] for row in ids if row[0] in target_ranks]
+        if source_raw_dir and replaced_ids:
+            progress['raw_replaced'] += replace_raw_documents(family, source_raw_dir, replaced_ids)
+        progress['rows_examined'] += len(source_ranks)
+        progress['rows_done'] += len(ids)
+        print_merge_progress(source_name, progress['rows_done'], progress['started_at'])
+        chunk_start_id = chunk_end_id
+
+def merge_database(family, source_db_path, chunk_size=MERGE_CHUNK_SIZE, source_raw_dir=None):
+    if not os.path.isfile(source_db_path):
+        print(f"Source database {source_db_path} not found. Skipping.")
+        return 0
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute('ATTACH DATABASE ? AS src', (source_db_path,))
+        if not has_table(c, 'src', 'data'):
+            print(f"Source database {source_db_path} has no data table. Skipping.")
+            return 0
+        shard_paths = get_source_shard_paths(c, source_db_path)
+        missing_shard_paths = [path for path in shard_paths if not os.path.isfile(path)]
+        if missing_shard_paths:
+            print(f"Source shard files not found, their rows are skipped: {', '.join(missing_shard_paths)}")
+        c.execute('CREATE TEMP TABLE IF NOT EXISTS merge_ids (id INTEGER PRIMARY KEY)')
+        set_coverage_valid(c, False)
+        conn.commit()
+        source_name = os.path.basename(os.path.dirname(os.path.abspath(source_db_path))) or source_db_path
+        print(f"Merging {family['name']} rows from {source_db_path} and {len(shard_paths) - len(missing_shard_paths)} shard files, keeping the most complete and recent copy of each ID...")
+        progress = {'rows_examined': 0, 'rows_done': 0, 'raw_replaced': 0, 'started_at': time.time()}
+        for shard_path in shard_paths:
+            if shard_path in missing_shard_paths:
+                continue
+            c.execute('ATTACH DATABASE ? AS src_shard', (shard_path,))
+            try:
+                merge_source_rows(conn, family, 'src_shard', chunk_size, source_name, progress, source_raw_dir)
+            finally:
+                conn.rollback()
+                c.execute('DETACH DATABASE src_shard')
+        merge_source_rows(conn, family, 'src', chunk_size, source_name, progress, source_raw_dir)
+        elapsed = time.time() - progress['started_at']
+        print(f"\nMerged {progress['rows_done']} of {progress['rows_examined']} rows from {source_db_path} in {elapsed:.1f}s "
+              f"({progress['rows_examined'] / elapsed if elapsed > 0 else 0:.0f} rows/s); the other rows were not newer than the local copy.")
+        if progress['raw_replaced']:
+            print(f"Replaced the local raw data of {progress['raw_replaced']} IDs with the source's copy of the winning rows.")
+        return progress['rows_done']
+    except sqlite3.Error as e:
+        print(f"\nDatabase error merging {source_db_path}: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if conn:
+            try:
+                conn.execute('DETACH DATABASE src')
+            except sqlite3.Error:
+                pass
+            conn.close()
+
+def merge_sources(families, source_paths, chunk_size=MERGE_CHUNK_SIZE):
+    for source_path in source_paths:
+        if os.path.isdir(source_path):
+            for family in families:
+                merge_database(family, os.path.join(source_path, family['database_file']), chunk_size, os.path.join(source_path, family['raw_data_dir']))
+                merge_raw_data(family, os.path.join(source_path, family['raw_data_dir']))
+        elif len(families) == 1:
+            merge_database(families[0], source_path, chunk_size)
+        else:
+            print(f"Cannot merge database file {source_path} when several families are selected. Pass a node directory instead.")
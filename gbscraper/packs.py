@@ -0,0 +1,454 @@
+import os
+import random
+import shutil
+import struct
+import sys
+import time
+import zipfile
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .db import get_coverage_ranges
+from .idranges import clip_id_ranges
+from .shutdown import open_worker_pool
+
+PACK_EXTENSION = '.pack'
+PACK_INDEX_EXTENSION = '.pack.idx'
+PACK_REPACK_SUFFIX = '.repack'
+PACK_RECORD_MAGIC = b'GBR1'
+PACK_INDEX_MAGIC = b'GBI1'
+PACK_RECORD_HEADER = struct.Struct('<4sQII')
+PACK_INDEX_HEADER = struct.Struct('<4sI')
+PACK_INDEX_ENTRY = struct.Struct('<QQII')
+PACK_FLAG_SEALED = 1
+PACK_FLAG_REPACKED = 2
+PACK_COMPRESSION_LEVEL = 6
+PACK_ZSTD_LEVEL = 3
+PACK_REPACK_ZSTD_LEVEL = 19
+PACK_DICTIONARY_DIR = 'dictionaries'
+PACK_DICTIONARY_SIZE = 112640
+PACK_DICTIONARY_SAMPLES = 5000
+ZSTD_FRAME_MAGIC = b'\x28\xb5\x2f\xfd'
+
+PACK_READ_ERRORS = (OSError, ValueError, struct.error, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+pack_compressors = {}
+pack_dictionaries = {}
+
+def get_pack_lock_error():
+    if fcntl is None:
+        return "The pack raw store needs file locking (fcntl), which is not available on this platform."
+    return None
+
+def get_pack_path(family, id, group_size=5000):
+    start_id = ((id - 1) // group_size) * group_size + 1
+    end_id = start_id + group_size - 1
+    return os.path.join(family['raw_data_dir'], f'{start_id}-{end_id}{PACK_EXTENSION}')
+
+def get_dictionary_dir(data_dir):
+    return os.path.join(data_dir, PACK_DICTIONARY_DIR)
+
+def get_current_dictionary_id(data_dir):
+    try:
+        with open(os.path.join(get_dictionary_dir(data_dir), 'current'), 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def load_pack_dictionary(data_dir, dict_id):
+    key = (data_dir, dict_id)
+    if key not in pack_dictionaries:
+        with open(os.path.join(get_dictionary_dir(data_dir), f'{dict_id}.zdict'), 'rb') as f:
+            pack_dictionaries[key] = zstandard.ZstdCompressionDict(f.read())
+    return pack_dictionaries[key]
+
+def get_pack_compressor(data_dir, level=PACK_ZSTD_LEVEL):
+    if (data_dir, level) not in pack_compressors:
+        compressor = None
+        if zstandard is not None:
+            dict_id = get_current_dictionary_id(data_dir)
+            dict_data = load_pack_dictionary(data_dir, dict_id) if dict_id is not None else None
+            compressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+        pack_compressors[(data_dir, level)] = compressor
+    return pack_compressors[(data_dir, level)]
+
+def compress_pack_payload(data_dir, raw_bytes, level=PACK_ZSTD_LEVEL):
+    compressor = get_pack_compressor(data_dir, level)
+    if compressor is not None:
+        return compressor.compress(raw_bytes)
+    return zlib.compress(raw_bytes, PACK_COMPRESSION_LEVEL)
+
+def decompress_pack_payload(data_dir, payload):
+    if payload[:4] == ZSTD_FRAME_MAGIC:
+        if zstandard is None:
+            raise ValueError("record is zstd compressed but the zstandard package is not installed")
+        dict_id = zstandard.get_frame_parameters(payload).dict_id
+        dict_data = load_pack_dictionary(data_dir, dict_id) if dict_id else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+    return zlib.decompress(payload)
+
+def get_pack_index_path(pack_path):
+    return pack_path[:-len(PACK_EXTENSION)] + PACK_INDEX_EXTENSION
+
+def load_pack_index(pack_path, index_path=None):
+    try:
+        with open(index_path or get_pack_index_path(pack_path), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0, {}
+    magic, flags = PACK_INDEX_HEADER.unpack_from(data)
+    if magic != PACK_INDEX_MAGIC:
+        raise ValueError(f"{pack_path} has an invalid index header")
+    entries = {}
+    for offset in range(PACK_INDEX_HEADER.size, len(data) - PACK_INDEX_ENTRY.size + 1, PACK_INDEX_ENTRY.size):
+        id, record_offset, length, crc = PACK_INDEX_ENTRY.unpack_from(data, offset)
+        entries[id] = (record_offset, length, crc)
+    return flags, entries
+
+def write_pack_index(pack_path, flags, entries, index_path=None):
+    index_path = index_path or get_pack_index_path(pack_path)
+    temp_path = f'{index_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(PACK_INDEX_HEADER.pack(PACK_INDEX_MAGIC, flags))
+            for id, (record_offset, length, crc) in sorted(entries.items()):
+                f.write(PACK_INDEX_ENTRY.pack(id, record_offset, length, crc))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, index_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def get_pack_end_offset(entries):
+    return max((record_offset + length for record_offset, length, crc in entries.values()), default=0)
+
+def write_pack_records(f, data_dir, documents, entries, end_offset, level=PACK_ZSTD_LEVEL):
+    record_offsets = {(length, crc): record_offset for record_offset, length, crc in entries.values()}
+    changed = False
+    for id, raw_bytes in documents:
+        payload = compress_pack_payload(data_dir, raw_bytes, level)
+        crc = zlib.crc32(raw_bytes)
+        record_offset = record_offsets.get((len(payload), crc))
+        if record_offset is not None:
+            f.seek(record_offset)
+            if f.read(len(payload)) == payload:
+                if entries.get(id) != (record_offset, len(payload), crc):
+                    entries[id] = (record_offset, len(payload), crc)
+                    changed = True
+                continue
+        f.seek(end_offset)
+        f.write(PACK_RECORD_HEADER.pack(PACK_RECORD_MAGIC, id, len(payload), crc))
+        f.write(payload)
+        entries[id] = (end_offset + PACK_RECORD_HEADER.size, len(payload), crc)
+        record_offsets[(len(payload), crc)] = end_offset + PACK_RECORD_HEADER.size
+        end_offset += PACK_RECORD_HEADER.size + len(payload)
+        changed = True
+    return end_offset, changed
+
+def is_pack_index_current(f, entries):
+    for record_offset, length, crc in entries.values():
+        f.seek(record_offset - PACK_RECORD_HEADER.size)
+        header = f.read(PACK_RECORD_HEADER.size)
+        if len(header) != PACK_RECORD_HEADER.size:
+            return False
+        magic, id, record_length, record_crc = PACK_RECORD_HEADER.unpack(header)
+        if (magic, record_length, record_crc) != (PACK_RECORD_MAGIC, length, crc):
+            return False
+    return True
+
+def finish_pack_repack(f, pack_path):
+    repack_index_path = get_pack_index_path(pack_path) + PACK_REPACK_SUFFIX
+    if not os.path.exists(repack_index_path):
+        return
+    try:
+        entries = load_pack_index(pack_path, repack_index_path)[1]
+        current = is_pack_index_current(f, entries)
+    except PACK_READ_ERRORS:
+        current = False
+    if current:
+        os.replace(repack_index_path, get_pack_index_path(pack_path))
+    else:
+        os.remove(repack_index_path)
+
+def open_locked_pack(pack_path, mode):
+    while True:
+        f = open(pack_path, mode)
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.path.samestat(os.fstat(f.fileno()), os.stat(pack_path)):
+                finish_pack_repack(f, pack_path)
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+def append_pack_documents(pack_path, documents):
+    with open_locked_pack(pack_path, 'a+b') as f:
+        try:
+            flags, entries = load_pack_index(pack_path)
+            end_offset = get_pack_end_offset(entries)
+            f.truncate(end_offset)
+            end_offset, changed = write_pack_records(f, os.path.dirname(pack_path), documents, entries, end_offset)
+            if changed:
+                f.flush()
+                os.fsync(f.fileno())
+                write_pack_index(pack_path, flags & ~PACK_FLAG_SEALED, entries)
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def append_pack_document(pack_path, id, raw_text_data):
+    append_pack_documents(pack_path, [(id, raw_text_data.encode('utf-8'))])
+
+def read_pack_record(f, entry, data_dir):
+    record_offset, length, crc = entry
+    f.seek(record_offset)
+    raw_bytes = decompress_pack_payload(data_dir, f.read(length))
+    if zlib.crc32(raw_bytes) != crc:
+        raise ValueError("CRC mismatch")
+    return raw_bytes
+
+def read_pack_document(pack_path, id):
+    flags, entries = load_pack_index(pack_path)
+    entry = entries.get(id)
+    if entry is None:
+        return None
+    with open(pack_path, 'rb') as f:
+        return read_pack_record(f, entry, os.path.dirname(pack_path)).decode('utf-8')
+
+def merge_pack_documents(source_pack_path, target_pack_path):
+    source_entries = load_pack_index(source_pack_path)[1]
+    target_entries = load_pack_index(target_pack_path)[1]
+    with open(source_pack_path, 'rb') as f:
+        documents = [(id, read_pack_record(f, entry, os.path.dirname(source_pack_path))) for id, entry in sorted(source_entries.items()) if id not in target_entries]
+    if documents:
+        append_pack_documents(target_pack_path, documents)
+    return len(documents)
+
+def list_unsealed_packs(family):
+    unsealed_packs = []
+    if not os.path.isdir(family['raw_data_dir']):
+        return unsealed_packs
+    with os.scandir(family['raw_data_dir']) as entries:
+        for entry in entries:
+            if entry.name.endswith(PACK_EXTENSION) and entry.is_file():
+                try:
+                    start_id_str, end_id_str = entry.name[:-len(PACK_EXTENSION)].split('-')
+                    if not load_pack_index(entry.path)[0] & PACK_FLAG_SEALED:
+                        unsealed_packs.append((int(start_id_str), int(end_id_str), entry.path))
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"\nError reading pack index for {entry.path}: {e}")
+    return sorted(unsealed_packs)
+
+def seal_pack(pack_path):
+    with open_locked_pack(pack_path, 'r+b') as f:
+        try:
+            flags, entries = load_pack_index(pack_path)
+            f.truncate(get_pack_end_offset(entries))
+            os.fsync(f.fileno())
+            write_pack_index(pack_path, flags | PACK_FLAG_SEALED, entries)
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def seal_finished_packs(family):
+    unsealed_packs = list_unsealed_packs(family)
+    if not unsealed_packs:
+        return 0
+    present_ranges = get_coverage_ranges(family, 'present')
+    sealed_count = 0
+    for start_id, end_id, pack_path in unsealed_packs:
+        if clip_id_ranges(present_ranges, start_id, end_id) == [(start_id, end_id)]:
+            try:
+                seal_pack(pack_path)
+                sealed_count += 1
+            except (OSError, ValueError, struct.error) as e:
+                print(f"\nError sealing pack {pack_path}: {e}")
+    if sealed_count:
+        print(f"\nSealed {sealed_count} finished {family['name']} pack archives.")
+    return sealed_count
+
+def get_zstandard_error():
+    if zstandard is None:
+        return "Dictionary-compressed packs need the zstandard package (pip install zstandard)."
+    return None
+
+def list_range_archives(data_dir):
+    range_archives = {}
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            for suffix in ('.zip', PACK_EXTENSION, ''):
+                range_name = entry.name[:-len(suffix)] if suffix else entry.name
+                if entry.name.endswith(suffix) and range_name.count('-') == 1 and range_name.replace('-', '').isdigit():
+                    range_archives.setdefault(range_name, set()).add(suffix)
+                    break
+    return range_archives
+
+def read_range_documents(data_dir, range_name, extension, include_unsealed=False):
+    documents = {}
+    range_path = os.path.join(data_dir, range_name)
+    if os.path.isfile(range_path + '.zip'):
+        with zipfile.ZipFile(range_path + '.zip', 'r') as zipf:
+            for name in zipf.namelist():
+                if name.endswith(extension) and name[:-len(extension)].isdigit():
+                    documents[int(name[:-len(extension)])] = zipf.read(name)
+    if os.path.isdir(range_path):
+        for name in os.listdir(range_path):
+            if name.endswith(extension) and name[:-len(extension)].isdigit():
+                with open(os.path.join(range_path, name), 'rb') as f:
+                    documents[int(name[:-len(extension)])] = f.read()
+    pack_path = range_path + PACK_EXTENSION
+    if os.path.isfile(pack_path):
+        flags, entries = load_pack_index(pack_path)
+        if flags & PACK_FLAG_SEALED or include_unsealed:
+            with open(pack_path, 'rb') as f:
+                for id, entry in entries.items():
+                    try:
+                        documents[id] = read_pack_record(f, entry, data_dir)
+                    except PACK_READ_ERRORS as e:
+                        if id not in documents:
+                            print(f"\nError reading ID {id} from {pack_path}: {e}")
+    return documents
+
+def collect_dictionary_samples(family, sample_count=PACK_DICTIONARY_SAMPLES):
+    data_dir = family['raw_data_dir']
+    range_names = list(list_range_archives(data_dir))
+    random.shuffle(range_names)
+    samples = []
+    per_range = max(20, sample_count // max(1, len(range_names)))
+    for range_name in range_names:
+        try:
+            documents = list(read_range_documents(data_dir, range_name, family['raw_file_extension'], include_unsealed=True).values())
+        except (zipfile.BadZipFile,) + PACK_READ_ERRORS as e:
+            print(f"\nError sampling documents from {range_name}: {e}")
+            continue
+        samples.extend(random.sample(documents, min(per_range, len(documents))))
+        if len(samples) >= sample_count:
+            break
+    return samples[:sample_count]
+
+def train_pack_dictionary(family, sample_count=PACK_DICTIONARY_SAMPLES, dict_size=PACK_DICTIONARY_SIZE):
+    data_dir = family['raw_data_dir']
+    if not os.path.isdir(data_dir):
+        print(f"Raw data directory {data_dir} not found. Skipping dictionary training.")
+        return None
+    samples = collect_dictionary_samples(family, sample_count)
+    if len(samples) < 100:
+        print(f"Only {len(samples)} {family['name']} documents available, at least 100 are needed to train a dictionary.")
+        return None
+    print(f"Training a {dict_size // 1024} KiB zstd dictionary on {len(samples)} {family['name']} documents...")
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+    dictionary_dir = get_dictionary_dir(data_dir)
+    os.makedirs(dictionary_dir, exist_ok=True)
+    dict_id = dictionary.dict_id()
+    with open(os.path.join(dictionary_dir, f'{dict_id}.zdict'), 'wb') as f:
+        f.write(dictionary.as_bytes())
+        f.flush()
+        os.fsync(f.fileno())
+    current_path = os.path.join(dictionary_dir, 'current')
+    with open(current_path + '.tmp', 'w') as f:
+        f.write(str(dict_id))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_path + '.tmp', current_path)
+    for key in [key for key in pack_compressors if key[0] == data_dir]:
+        del pack_compressors[key]
+    print(f"Dictionary {dict_id} is now used for new {family['name']} pack records.")
+    return dict_id
+
+def get_range_source_state(range_path):
+    zip_path = range_path + '.zip'
+    zip_state = (os.path.getsize(zip_path), os.path.getmtime(zip_path)) if os.path.isfile(zip_path) else None
+    return zip_state, load_pack_index(range_path + PACK_EXTENSION)
+
+def repack_range(data_dir, range_name, extension):
+    range_path = os.path.join(data_dir, range_name)
+    pack_path = range_path + PACK_EXTENSION
+    index_path = range_path + PACK_INDEX_EXTENSION
+    temp_pack_path = f'{pack_path}.{os.getpid()}.tmp'
+    old_size = sum(os.path.getsize(path) for path in (range_path + '.zip', pack_path, index_path) if os.path.isfile(path))
+    if os.path.isdir(range_path):
+        old_size += sum(entry.stat().st_size for entry in os.scandir(range_path) if entry.is_file())
+    try:
+        source_state = get_range_source_state(range_path)
+        documents = read_range_documents(data_dir, range_name, extension)
+        entries = {}
+        with open(temp_pack_path, 'w+b') as f:
+            write_pack_records(f, data_dir, sorted(documents.items()), entries, 0, PACK_REPACK_ZSTD_LEVEL)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(temp_pack_path, 'rb') as f:
+            for id, entry in entries.items():
+                read_pack_record(f, entry, data_dir)
+        with open_locked_pack(pack_path, 'a+b'):
+            if get_range_source_state(range_path) != source_state:
+                raise ValueError("the range was written to while it was being repacked")
+            write_pack_index(pack_path, PACK_FLAG_SEALED | PACK_FLAG_REPACKED, entries, index_path + PACK_REPACK_SUFFIX)
+            os.replace(temp_pack_path, pack_path)
+            os.replace(index_path + PACK_REPACK_SUFFIX, index_path)
+        if os.path.isfile(range_path + '.zip'):
+            os.remove(range_path + '.zip')
+        if os.path.isdir(range_path):
+            shutil.rmtree(range_path)
+        new_size = os.path.getsize(pack_path) + os.path.getsize(index_path)
+        return range_name, len(entries), old_size, new_size, None
+    except (zipfile.BadZipFile,) + PACK_READ_ERRORS as e:
+        return range_name, 0, old_size, 0, str(e)
+    finally:
+        if os.path.exists(temp_pack_path):
+            os.remove(temp_pack_path)
+
+def repack_range_task(task):
+    return repack_range(*task)
+
+def list_repackable_ranges(data_dir):
+    range_names = []
+    for range_name, suffixes in list_range_archives(data_dir).items():
+        pack_path = os.path.join(data_dir, range_name + PACK_EXTENSION)
+        if PACK_EXTENSION in suffixes:
+            flags, entries = load_pack_index(pack_path)
+            if not flags & PACK_FLAG_SEALED and entries:
+                continue
+            if flags & PACK_FLAG_REPACKED and suffixes == {PACK_EXTENSION}:
+                continue
+        elif '.zip' not in suffixes:
+            continue
+        range_names.append(range_name)
+    return sorted(range_names, key=lambda range_name: int(range_name.split('-')[0]))
+
+def repack_raw_archives(family, processes=None):
+    data_dir = family['raw_data_dir']
+    if not os.path.isdir(data_dir):
+        print(f"Raw data directory {data_dir} not found. Skipping repacking.")
+        return
+    if get_current_dictionary_id(data_dir) is None and train_pack_dictionary(family) is None:
+        print("Repacking without a dictionary.")
+    range_names = list_repackable_ranges(data_dir)
+    if not range_names:
+        print(f"No finished {family['name']} archives left to repack.")
+        return
+    print(f"Repacking {len(range_names)} finished {family['name']} ranges into dictionary-compressed packs...")
+    repacked_count = document_count = old_total = new_total = 0
+    started_at = time.time()
+    with open_worker_pool(processes or os.cpu_count() or 1) as repack_pool:
+        tasks = [(data_dir, range_name, family['raw_file_extension']) for range_name in range_names]
+        for done, (range_name, count, old_size, new_size, error) in enumerate(repack_pool.imap_unordered(repack_range_task, tasks), 1):
+            if error:
+                print(f"\nError repacking {range_name}, its original files were kept: {error}")
+            else:
+                repacked_count += 1
+                document_count += count
+                old_total += old_size
+                new_total += new_size
+            sys.stdout.write(f'\rRepacking ranges: ({done}/{len(tasks)}) ')
+            sys.stdout.flush()
+    ratio = old_total / new_total if new_total else 0
+    print(f"\nRepacked {repacked_count} ranges ({document_count} documents) in {time.time() - started_at:.1f}s: {old_total / 1048576:.1f} MiB -> {new_total / 1048576:.1f} MiB ({ratio:.1f}x).")
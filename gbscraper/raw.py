@@ -0,0 +1,375 @@
+import concurrent.futures
+import os
+import shutil
+import sys
+import time
+import zipfile
+import zlib
+
+from .archives import get_archive_index_connection, is_id_archived
+from .db import get_last_id_from_db
+from .fetch import get_raw_data_subfolder
+from .packs import PACK_EXTENSION, PACK_READ_ERRORS, append_pack_documents, load_pack_index, merge_pack_documents, read_range_documents
+
+ORGANIZE_THREADS = 16
+ORGANIZE_BATCH_SIZE = 50000
+ORGANIZE_PROGRESS_INTERVAL = 0.5
+
+def print_compress_progress(current_end_id, max_end_id, current_folder_range, bar_length=30):
+    progress_ratio = (current_end_id / max_end_id) if max_end_id > 0 else 0
+    progress_ratio = max(0.0, min(1.0, progress_ratio))
+    filled_length = int(bar_length * progress_ratio)
+    bar = '█' * filled_length + '-' * (bar_length - filled_length)
+    sys.stdout.write(f'\rCompressing folder: [{bar}] ({current_folder_range} / {max_end_id}) ')
+    sys.stdout.flush()
+
+def finish_compress_progress(max_end_id):
+    bar_length = 30
+    bar = '█' * bar_length
+    sys.stdout.write(f'\rCompressing folder: [{bar}] ({max_end_id} / {max_end_id}) Finished.\n')
+    sys.stdout.flush()
+
+def scan_loose_raw_files(data_dir, extension):
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(extension) and entry.is_file(follow_symlinks=False):
+                file_id_str = entry.name[:-len(extension)]
+                if file_id_str.isdigit():
+                    yield int(file_id_str), entry.name
+                else:
+                    print(f"\nSkipping invalid loose filename (not an integer ID): {entry.name}")
+
+def move_loose_raw_files(data_dir, range_name, filenames, created_folders):
+    target_folder_path = os.path.join(data_dir, range_name)
+    if os.path.exists(target_folder_path + '.zip'):
+        return move_loose_raw_files_into_zip(data_dir, range_name, filenames)
+    if range_name not in created_folders:
+        os.makedirs(target_folder_path, exist_ok=True)
+        created_folders.add(range_name)
+    moved_count = 0
+    for filename in filenames:
+        try:
+            os.rename(os.path.join(data_dir, filename), os.path.join(target_folder_path, filename))
+            moved_count += 1
+        except FileNotFoundError:
+            continue
+    return moved_count
+
+def is_loose_file_newer(file_path, data, info):
+    if len(data) == info.file_size and zlib.crc32(data) == info.CRC:
+        return False
+    return os.path.getmtime(file_path) > time.mktime(info.date_time + (0, 0, -1))
+
+def replace_zip_members(zip_path, replacements):
+    temp_path = zip_path + '.part'
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as source_zip, \
+                zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as target_zip:
+            for info in source_zip.infolist():
+                if info.filename not in replacements:
+                    target_zip.writestr(info, source_zip.read(info))
+            for filename, data in replacements.items():
+                target_zip.writestr(filename, data)
+        os.replace(temp_path, zip_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def move_loose_raw_files_into_zip(data_dir, range_name, filenames):
+    zip_path = os.path.join(data_dir, f'{range_name}.zip')
+    replacements = {}
+    with zipfile.ZipFile(zip_path, 'r') as zipf:
+        archived = {info.filename: info for info in zipf.infolist()}
+    for filename in filenames:
+        if filename in archived:
+            file_path = os.path.join(data_dir, filename)
+            data = read_raw_file(file_path)
+            if is_loose_file_newer(file_path, data, archived[filename]):
+                replacements[filename] = data
+    if replacements:
+        replace_zip_members(zip_path, replacements)
+        print(f"\nReplaced {len(replacements)} older archived files in {range_name}.zip with the newer loose copies.")
+    members = [(filename, lambda path=os.path.join(data_dir, filename): read_raw_file(path)) for filename in filenames if filename not in archived]
+    merge_raw_range(data_dir, range_name, members)
+    for filename in filenames:
+        os.remove(os.path.join(data_dir, filename))
+    return len(filenames)
+
+def organize_loose_raw_batch(executor, data_dir, batch, created_folders):
+    moved_count = 0
+    futures = {executor.submit(move_loose_raw_files, data_dir, range_name, filenames, created_folders): range_name
+               for range_name, filenames in batch.items()}
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            moved_count += future.result()
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"\nError moving loose files into {futures[future]}: {e}")
+    return moved_count
+
+def organize_loose_raw_files(family, group_size=5000, threads=ORGANIZE_THREADS, batch_size=ORGANIZE_BATCH_SIZE):
+    data_dir = family['raw_data_dir']
+    extension = family['raw_file_extension']
+    print(f"Starting organization of loose {extension} files...")
+    if not os.path.exists(data_dir):
+        print(f"Raw data directory {data_dir} not found. Skipping organization.")
+        return
+    created_folders = set()
+    moved_count = 0
+    started_at = time.time()
+    last_progress = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        batch = {}
+        batch_count = 0
+        for file_id, filename in scan_loose_raw_files(data_dir, extension):
+            range_name = os.path.basename(get_raw_data_subfolder(family, file_id, group_size))
+            batch.setdefault(range_name, []).append(filename)
+            batch_count += 1
+            if batch_count >= batch_size:
+                moved_count += organize_loose_raw_batch(executor, data_dir, batch, created_folders)
+                batch = {}
+                batch_count = 0
+            if time.time() - last_progress >= ORGANIZE_PROGRESS_INTERVAL:
+                print_organize_progress(moved_count, started_at)
+                last_progress = time.time()
+        if batch:
+            moved_count += organize_loose_raw_batch(executor, data_dir, batch, created_folders)
+    if moved_count == 0:
+        print(f"No loose {extension} files found directly in the base directory. Skipping organization.")
+        return
+    print_organize_progress(moved_count, started_at)
+    sys.stdout.write(" Finished\n")
+    sys.stdout.flush()
+
+def print_organize_progress(moved_count, started_at):
+    elapsed = time.time() - started_at
+    rate = moved_count / elapsed if elapsed > 0 else 0
+    sys.stdout.write(f'\rOrganizing loose files: {moved_count} moved into range folders ({rate:.0f} files/s) ')
+    sys.stdout.flush()
+
+def add_unarchived_files(family, range_name, folder_path):
+    extension = family['raw_file_extension']
+    conn = get_archive_index_connection(family)
+    try:
+        filenames = [filename for filename in os.listdir(folder_path)
+                     if filename.endswith(extension) and not (filename[:-len(extension)].isdigit()
+                                                              and is_id_archived(family, int(filename[:-len(extension)]), conn) == range_name)]
+    finally:
+        conn.close()
+    members = [(filename, lambda path=os.path.join(folder_path, filename): read_raw_file(path)) for filename in filenames]
+    return merge_raw_range(family['raw_data_dir'], range_name, members)
+
+def compress_raw_data(family, group_size=5000):
+    data_dir = family['raw_data_dir']
+    extension = family['raw_file_extension']
+    print(f"Starting compression of raw data in {data_dir} based on database content...")
+    if not os.path.exists(data_dir):
+        print(f"Raw data directory {data_dir} not found. Skipping compression.")
+        return
+    max_id_in_db = get_last_id_from_db(family)
+    if max_id_in_db is None or max_id_in_db == 0:
+        return
+    print(f"Highest ID found in database: {max_id_in_db}")
+    compress_up_to_id = (max_id_in_db // group_size) * group_size
+    if max_id_in_db > 0 and max_id_in_db % group_size == 0:
+         compress_up_to_id = max_id_in_db
+    all_subfolders = []
+    for entry in os.listdir(data_dir):
+        entry_path = os.path.join(data_dir, entry)
+        if os.path.isdir(entry_path):
+            try:
+                start_id_str, end_id_str = entry.split('-')
+                start_id = int(start_id_str)
+                end_id = int(end_id_str)
+                if start_id > 0 and end_id > start_id and end_id - start_id + 1 == group_size:
+                     all_subfolders.append((start_id, end_id, entry_path, entry))
+            except ValueError:
+                continue
+    folders_to_compress = sorted([
+        (start_id, end_id, folder_path, folder_name)
+        for start_id, end_id, folder_path, folder_name in all_subfolders
+        if end_id <= compress_up_to_id
+    ])
+    if not folders_to_compress:
+        print(f"No full {group_size}-ID folders to compress up to {compress_up_to_id}.")
+        return
+    max_compress_end_id_display = folders_to_compress[-1][1] if folders_to_compress else 0
+    print(f"Will compress {len(folders_to_compress)} folders with End ID up to: {max_compress_end_id_display}")
+    compressed_folders_count = 0
+    for start_id, end_id, folder_path, folder_name in folders_to_compress:
+        zip_filename = os.path.join(data_dir, f'{start_id}-{end_id}.zip')
+        print_compress_progress(end_id, max_compress_end_id_display, folder_name)
+        try:
+            if os.path.exists(zip_filename):
+                 if os.path.exists(folder_path):
+                     try:
+                         add_unarchived_files(family, folder_name, folder_path)
+                         shutil.rmtree(folder_path)
+                         compressed_folders_count += 1
+                     except OSError as e:
+                         print(f"\nError deleting folder {os.path.basename(folder_path)} when zip existed: {e}")
+                 continue
+            if not os.path.exists(folder_path) or not os.listdir(folder_path):
+                continue
+            try:
+                with zipfile.ZipFile(zip_filename, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
+                    files_added_to_zip = 0
+                    for filename in os.listdir(folder_path):
+                        if filename.endswith(extension):
+                            file_path = os.path.join(folder_path, filename)
+                            if os.path.exists(file_path):
+                                zipf.write(file_path, filename)
+                                files_added_to_zip += 1
+                if files_added_to_zip > 0:
+                    try:
+                        shutil.rmtree(folder_path)
+                        compressed_folders_count += 1
+                    except OSError as e:
+                         print(f"\nError deleting folder {os.path.basename(folder_path)} after compression: {e}")
+            except KeyboardInterrupt:
+                 print(f"\nCompression interrupted for folder {os.path.basename(folder_path)}. Cleaning up incomplete zip file...")
+                 if os.path.exists(zip_filename):
+                     try:
+                         os.remove(zip_filename)
+                         print(f"Deleted incomplete zip file: {os.path.basename(zip_filename)}")
+                     except OSError as e:
+                         print(f"Error deleting incomplete zip file {os.path.basename(zip_filename)}: {e}")
+                 raise
+        except Exception as e:
+            print(f"\nError compressing folder {os.path.basename(folder_path)}: {e}. Original folder NOT deleted.")
+            if os.path.exists(zip_filename):
+                 try:
+                     os.remove(zip_filename)
+                     print(f"Deleted potentially incomplete zip file due to error: {os.path.basename(zip_filename)}")
+                 except OSError as cleanup_e:
+                     print(f"Error during cleanup of incomplete zip file {os.path.basename(zip_filename)}: {cleanup_e}")
+    if folders_to_compress:
+         finish_compress_progress(max_compress_end_id_display)
+    print("Compression process finished.")
+    print(f"Compressed and deleted {compressed_folders_count} folders in this run.")
+
+def copy_file_atomic(source_path, target_path):
+    temp_path = target_path + '.part'
+    shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, target_path)
+
+def write_file_atomic(target_path, data):
+    with open(target_path + '.part', 'wb') as f:
+        f.write(data)
+    os.replace(target_path + '.part', target_path)
+
+def read_raw_file(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+def merge_raw_range(data_dir, range_name, members):
+    target_zip_path = os.path.join(data_dir, f'{range_name}.zip')
+    target_folder_path = os.path.join(data_dir, range_name)
+    merged_count = 0
+    if os.path.exists(target_zip_path):
+        with zipfile.ZipFile(target_zip_path, 'a', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
+            existing_names = set(zipf.namelist())
+            for filename, read_member in members:
+                if filename not in existing_names:
+                    zipf.writestr(filename, read_member())
+                    merged_count += 1
+        return merged_count
+    existing_names = set(os.listdir(target_folder_path)) if os.path.isdir(target_folder_path) else set()
+    for filename, read_member in members:
+        if filename in existing_names:
+            continue
+        os.makedirs(target_folder_path, exist_ok=True)
+        write_file_atomic(os.path.join(target_folder_path, filename), read_member())
+        merged_count += 1
+    return merged_count
+
+def read_source_range_documents(source_dir, range_name, extension, ids):
+    documents = {id: data for id, data in read_range_documents(source_dir, range_name, extension, include_unsealed=True).items() if id in ids}
+    for id in ids:
+        loose_path = os.path.join(source_dir, f'{id}{extension}')
+        if os.path.isfile(loose_path):
+            documents[id] = read_raw_file(loose_path)
+    return documents
+
+def replace_range_documents(data_dir, range_name, extension, documents):
+    range_path = os.path.join(data_dir, range_name)
+    replaced_ids = set()
+    pack_path = range_path + PACK_EXTENSION
+    if os.path.isfile(pack_path):
+        pack_entries = load_pack_index(pack_path)[1]
+        pack_documents = [(id, data) for id, data in sorted(documents.items()) if id in pack_entries]
+        if pack_documents:
+            append_pack_documents(pack_path, pack_documents)
+            replaced_ids.update(id for id, data in pack_documents)
+    zip_path = range_path + '.zip'
+    if os.path.isfile(zip_path):
+        with zipfile.ZipFile(zip_path, 'r') as zipf:
+            archived = set(zipf.namelist())
+        replacements = {f'{id}{extension}': data for id, data in documents.items() if f'{id}{extension}' in archived}
+        if replacements:
+            replace_zip_members(zip_path, replacements)
+            replaced_ids.update(int(filename[:-len(extension)]) for filename in replacements)
+    for id, data in documents.items():
+        for file_path in (os.path.join(range_path, f'{id}{extension}'), os.path.join(data_dir, f'{id}{extension}')):
+            if os.path.isfile(file_path):
+                write_file_atomic(file_path, data)
+                replaced_ids.add(id)
+    return len(replaced_ids)
+
+def replace_raw_documents(family, source_dir, ids, group_size=5000):
+    data_dir = family['raw_data_dir']
+    extension = family['raw_file_extension']
+    if not os.path.isdir(source_dir) or not os.path.isdir(data_dir):
+        return 0
+    range_ids = {}
+    for id in ids:
+        range_ids.setdefault(os.path.basename(get_raw_data_subfolder(family, id, group_size)), set()).add(id)
+    replaced_count = 0
+    for range_name, ids_in_range in sorted(range_ids.items()):
+        try:
+            documents = read_source_range_documents(source_dir, range_name, extension, ids_in_range)
+            if documents:
+                replaced_count += replace_range_documents(data_dir, range_name, extension, documents)
+        except (zipfile.BadZipFile,) + PACK_READ_ERRORS as e:
+            print(f"\nError replacing raw data in {range_name} with the copy from {source_dir}: {e}")
+    return replaced_count
+
+def merge_raw_data(family, source_dir, group_size=5000):
+    data_dir = family['raw_data_dir']
+    extension = family['raw_file_extension']
+    if not os.path.isdir(source_dir):
+        print(f"Source raw data directory {source_dir} not found. Skipping raw data merge.")
+        return
+    os.makedirs(data_dir, exist_ok=True)
+    print(f"Merging raw data from {source_dir} into {data_dir}...")
+    archives_copied = 0
+    files_merged = 0
+    started_at = time.time()
+    with os.scandir(source_dir) as entries:
+        source_entries = sorted(entries, key=lambda entry: entry.name)
+    for entry in source_entries:
+        try:
+            if entry.is_file() and entry.name.endswith('.zip'):
+                range_name = entry.name[:-4]
+                target_zip_path = os.path.join(data_dir, entry.name)
+                if not os.path.exists(target_zip_path) and not os.path.exists(os.path.join(data_dir, range_name)):
+                    copy_file_atomic(entry.path, target_zip_path)
+                    archives_copied += 1
+                    continue
+                with zipfile.ZipFile(entry.path, 'r') as source_zip:
+                    members = [(name, lambda name=name: source_zip.read(name)) for name in source_zip.namelist()]
+                    files_merged += merge_raw_range(data_dir, range_name, members)
+            elif entry.is_file() and entry.name.endswith(PACK_EXTENSION):
+                files_merged += merge_pack_documents(entry.path, os.path.join(data_dir, entry.name))
+            elif entry.is_dir():
+                members = [(filename, lambda path=os.path.join(entry.path, filename): read_raw_file(path))
+                           for filename in os.listdir(entry.path) if filename.endswith(extension)]
+                files_merged += merge_raw_range(data_dir, entry.name, members)
+            elif entry.is_file() and entry.name.endswith(extension):
+                file_id = int(entry.name[:-len(extension)])
+                range_name = os.path.basename(get_raw_data_subfolder(family, file_id, group_size))
+                files_merged += merge_raw_range(data_dir, range_name, [(entry.name, lambda path=entry.path: read_raw_file(path))])
+        except (zipfile.BadZipFile,) + PACK_READ_ERRORS as e:
+            print(f"\nError merging raw data entry {entry.path}: {e}")
+            continue
+    elapsed = time.time() - started_at
+    print(f"Raw data merge finished in {elapsed:.1f}s: copied {archives_copied} archives unchanged, merged {files_merged} individual files.")
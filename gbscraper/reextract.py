@@ -0,0 +1,167 @@
+import collections
+import json
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+
+from .db import get_db_connection, get_null_rows_where_clause, get_snapshot_connection, record_coverage_row, write_detail_rows
+from .families import get_family
+from .fetch import extract_data_entry, extract_detail_rows, get_raw_data_subfolder
+from .packs import PACK_EXTENSION, PACK_READ_ERRORS, load_pack_index, read_pack_record
+from .shutdown import open_worker_pool
+
+REEXTRACT_BATCH_SIZE = 5000
+
+def iter_stale_extraction_groups(family, group_size=5000):
+    conn = get_snapshot_connection(family)
+    try:
+        c = conn.execute(f"SELECT id FROM data WHERE (extractor_version IS NULL OR extractor_version < ?) AND NOT ({get_null_rows_where_clause(family)}) ORDER BY id",
+                         (family['extractor_version'],))
+        subfolder_path, ids = None, []
+        for (id,) in c:
+            id_subfolder_path = get_raw_data_subfolder(family, id, group_size)
+            if id_subfolder_path != subfolder_path and ids:
+                yield subfolder_path, ids
+                ids = []
+            subfolder_path = id_subfolder_path
+            ids.append(id)
+        if ids:
+            yield subfolder_path, ids
+    finally:
+        conn.close()
+
+def read_raw_documents(family, subfolder_path, ids):
+    extension = family['raw_file_extension']
+    zip_path = subfolder_path + '.zip'
+    pack_path = subfolder_path + PACK_EXTENSION
+    zipf = None
+    pack_file = None
+    try:
+        if os.path.exists(pack_path):
+            try:
+                pack_entries = load_pack_index(pack_path)[1]
+                pack_file = open(pack_path, 'rb')
+            except PACK_READ_ERRORS as e:
+                print(f"\nError opening pack archive {pack_path}: {e}")
+        if os.path.exists(zip_path):
+            try:
+                zipf = zipfile.ZipFile(zip_path, 'r')
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"\nError opening raw archive {zip_path}: {e}")
+        zip_names = set(zipf.namelist()) if zipf else set()
+        for id in ids:
+            filename = f'{id}{extension}'
+            raw_bytes = None
+            try:
+                if pack_file and id in pack_entries:
+                    raw_bytes = read_pack_record(pack_file, pack_entries[id], family['raw_data_dir'])
+                for file_path in (os.path.join(subfolder_path, filename), os.path.join(family['raw_data_dir'], filename)):
+                    if raw_bytes is None and os.path.exists(file_path):
+                        with open(file_path, 'rb') as f:
+                            raw_bytes = f.read()
+                        break
+                if raw_bytes is None and filename in zip_names:
+                    raw_bytes = zipf.read(filename)
+            except (zipfile.BadZipFile,) + PACK_READ_ERRORS as e:
+                print(f"\nError reading raw document for {family['name']} ID {id}: {e}")
+            yield id, raw_bytes
+    finally:
+        if zipf:
+            zipf.close()
+        if pack_file:
+            pack_file.close()
+
+def reextract_group(family_key, subfolder_path, ids):
+    family = get_family(family_key)
+    rows = []
+    metric_rows = []
+    workload_rows = []
+    missing = 0
+    errors = 0
+    for id, raw_bytes in read_raw_documents(family, subfolder_path, ids):
+        if raw_bytes is None:
+            missing += 1
+            continue
+        data_entry = {col: None for col in family['data_columns']}
+        try:
+            raw_json_data = json.loads(raw_bytes.decode('utf-8'))
+            extract_data_entry(family, raw_json_data, data_entry)
+            id_metric_rows, id_workload_rows = extract_detail_rows(id, raw_json_data)
+        except Exception as e:
+            print(f"\nError re-extracting {family['name']} ID {id}: {e}")
+            errors += 1
+            continue
+        rows.append(tuple(data_entry[col] for col in family['data_columns']) + (family['extractor_version'], id))
+        metric_rows.extend(id_metric_rows)
+        workload_rows.extend(id_workload_rows)
+    return rows, metric_rows, workload_rows, missing, errors
+
+def write_reextracted_rows(family, conn, rows, metric_rows, workload_rows):
+    c = conn.cursor()
+    column_list = ', '.join(f'"{col}"' for col in family['data_columns'])
+    update_list = ', '.join(f'"{col}" = excluded."{col}"' for col in family['data_columns'])
+    column_count = len(family['data_columns'])
+    try:
+        c.executemany(f'INSERT INTO data ({column_list}, extractor_version, id) VALUES ({", ".join("?" * (column_count + 2))}) '
+                      f'ON CONFLICT(id) DO UPDATE SET {update_list}, extractor_version = excluded.extractor_version', rows)
+        for row in rows:
+            record_coverage_row(c, row[-1], all(value is None for value in row[:column_count]))
+        write_detail_rows(c, [row[-1] for row in rows], metric_rows, workload_rows)
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"\nDatabase error writing re-extracted {family['name']} rows: {e}")
+        conn.rollback()
+        return False
+
+def print_reextract_progress(family, checked, updated, started_at):
+    elapsed = time.time() - started_at
+    rate = checked / elapsed if elapsed > 0 else 0
+    sys.stdout.write(f"\rRe-extracting {family['name']}: {checked} stale rows checked, {updated} updated ({rate:.0f} rows/s) ")
+    sys.stdout.flush()
+
+def reextract_stale_rows(family, processes=None, batch_size=REEXTRACT_BATCH_SIZE):
+    version = family['extractor_version']
+    print(f"Re-extracting {family['name']} rows stamped with an extractor version older than {version} from local raw data...")
+    checked = updated = missing = errors = 0
+    started_at = time.time()
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        pending_rows, pending_metric_rows, pending_workload_rows = [], [], []
+        processes = processes or os.cpu_count() or 1
+        with open_worker_pool(processes) as reextract_pool:
+            in_flight = collections.deque()
+            groups = iter_stale_extraction_groups(family)
+            while True:
+                for subfolder_path, ids in groups:
+                    in_flight.append(reextract_pool.apply_async(reextract_group, (family['key'], subfolder_path, ids)))
+                    if len(in_flight) >= processes * 2:
+                        break
+                if not in_flight:
+                    break
+                rows, metric_rows, workload_rows, group_missing, group_errors = in_flight.popleft().get()
+                checked += len(rows) + group_missing + group_errors
+                missing += group_missing
+                errors += group_errors
+                pending_rows.extend(rows)
+                pending_metric_rows.extend(metric_rows)
+                pending_workload_rows.extend(workload_rows)
+                if len(pending_rows) >= batch_size:
+                    if write_reextracted_rows(family, conn, pending_rows, pending_metric_rows, pending_workload_rows):
+                        updated += len(pending_rows)
+                    pending_rows, pending_metric_rows, pending_workload_rows = [], [], []
+                print_reextract_progress(family, checked, updated, started_at)
+        if pending_rows and write_reextracted_rows(family, conn, pending_rows, pending_metric_rows, pending_workload_rows):
+            updated += len(pending_rows)
+    except sqlite3.Error as e:
+        print(f"\nDatabase error during re-extraction for {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
+    if checked:
+        print_reextract_progress(family, checked, updated, started_at)
+        sys.stdout.write("Finished\n")
+    print(f"Re-extraction finished in {time.time() - started_at:.1f}s: {updated} rows updated, {missing} without a local raw document, {errors} failed to parse.")
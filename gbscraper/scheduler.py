@@ -0,0 +1,290 @@
+import queue
+import sys
+import time
+
+from .auth import SESSION_REFRESH_MAX_ATTEMPTS
+from .checkpoints import CHECKPOINT_FLUSH_INTERVAL, delete_checkpoint, flush_checkpoint, iter_checkpoint_ids
+from .egress import (EGRESS_MAX_RETRIES, get_route_wait_time, load_egress_routes, pick_egress_route,
+                     print_route_summary, quarantine_route, record_route_result, take_egress_route)
+from .fetch import fetch_data, format_transfer_stats, get_max_remote_id, refresh_route_sessions
+from .maintenance import run_maintenance_slice
+from .packs import seal_finished_packs
+from .shutdown import SHUTDOWN_DRAIN_TIMEOUT, is_shutdown_requested, wait_for_shutdown
+
+SCHEDULER_BACKFILL_SHARE = 0.25
+SYNC_INTERVAL = 15
+
+spinner_chars = ['|', '/', '-', '\\']
+spinner_index = 0
+
+def spinner_task(stop_event, message):
+    global spinner_index
+    while not stop_event.is_set():
+        current_spinner = spinner_chars[spinner_index % len(spinner_chars)]
+        sys.stdout.write(f'\r{message}: {current_spinner} ')
+        sys.stdout.flush()
+        spinner_index += 1
+        time.sleep(0.05)
+    line_length = len(message) + 2 + 1 + 1
+    sys.stdout.write('\r' + ' ' * line_length + '\r')
+    sys.stdout.flush()
+
+def make_work_source(name, family, ids):
+    return {'name': f"{family['name']} {name}", 'family': family, 'live': False, 'ids': iter(ids), 'pending': None, 'exhausted': False,
+            'dispatched': 0, 'successful': 0, 'failed': 0, 'not_found': 0}
+
+def make_checkpointed_source(name, family, checkpoint):
+    source = make_work_source(name, family, iter_checkpoint_ids(checkpoint['ranges'], checkpoint['watermark'], checkpoint['outstanding_ids']))
+    source.update({'checkpoint': checkpoint['phase'], 'watermark': checkpoint['watermark'], 'completed': checkpoint['completed'],
+                   'in_flight_ids': set(), 'last_flush': time.time(), 'checkpoint_finished': False})
+    return source
+
+def complete_work_item(source, id):
+    if source.get('checkpoint'):
+        source['in_flight_ids'].discard(id)
+        source['completed'] += 1
+
+def flush_source_checkpoints(backfill_sources, force=False):
+    for source in backfill_sources:
+        if not source.get('checkpoint') or source['checkpoint_finished']:
+            continue
+        if source['exhausted'] and not source['in_flight_ids']:
+            delete_checkpoint(source['family'], source['checkpoint'])
+            source['checkpoint_finished'] = True
+        elif force or time.time() - source['last_flush'] >= CHECKPOINT_FLUSH_INTERVAL:
+            flush_checkpoint(source['family'], source['checkpoint'], source['watermark'], source['completed'], source['in_flight_ids'])
+            source['last_flush'] = time.time()
+
+def peek_work_source(source):
+    if source['pending'] is None and not source['exhausted']:
+        source['pending'] = next(source['ids'], None)
+        if source['pending'] is None:
+            source['exhausted'] = True
+    return source['pending']
+
+def take_work_source(source):
+    id = peek_work_source(source)
+    source['pending'] = None
+    source['dispatched'] += 1
+    if source.get('checkpoint'):
+        source['in_flight_ids'].add(id)
+        source['watermark'] = max(source['watermark'], id)
+    return id
+
+def make_live_source(family, next_id, max_remote_id):
+    source = make_work_source("Live Frontier", family, iter(()))
+    source['live'] = True
+    source['next_id'] = next_id
+    source['max_remote_id'] = max_remote_id if max_remote_id is not None else next_id - 1
+    source['last_poll'] = time.time()
+    return source
+
+def take_live_source(source):
+    id = source['next_id']
+    source['next_id'] += 1
+    source['dispatched'] += 1
+    return id
+
+def poll_live_source(source):
+    max_remote_id = get_max_remote_id(source['family'])
+    source['last_poll'] = time.time()
+    if max_remote_id is None:
+        print(f"\nFailed to get max remote ID for {source['family']['name']} during sync. Waiting before next sync check.")
+    elif max_remote_id > source['max_remote_id']:
+        source['max_remote_id'] = max_remote_id
+
+def pick_next_source(backfill_sources, live_sources, backfill_share, dispatched_backfill, dispatched_live):
+    backfill_source = None
+    for source in backfill_sources:
+        if peek_work_source(source) is not None:
+            backfill_source = source
+            break
+    live_source = None
+    for source in live_sources:
+        if source['next_id'] <= source['max_remote_id'] and (live_source is None or source['dispatched'] < live_source['dispatched']):
+            live_source = source
+    if backfill_source and live_source:
+        if dispatched_backfill < backfill_share * (dispatched_backfill + dispatched_live + 1):
+            return backfill_source
+        return live_source
+    if live_source:
+        return live_source
+    return backfill_source
+
+def pick_retry_item(retry_queue, routes):
+    blocked_routes = set()
+    for index in range(len(retry_queue) - 1, -1, -1):
+        excluded_route = retry_queue[index][2]
+        if excluded_route in blocked_routes:
+            continue
+        route_index = pick_egress_route(routes, excluded_route)
+        if route_index is not None:
+            return index, route_index
+        blocked_routes.add(excluded_route)
+    return None, None
+
+def refresh_failed_routes(cookies_ref, routes, route_indexes):
+    unrefreshed_routes = refresh_route_sessions(cookies_ref, routes, route_indexes)
+    if unrefreshed_routes is None or len(unrefreshed_routes) == len(routes):
+        return None
+    for route_index in unrefreshed_routes:
+        quarantine_route(routes[route_index], 'could not log its account in again')
+    return unrefreshed_routes
+
+def print_scheduler_status(in_flight, backfill_sources, live_sources):
+    successful = sum(source['successful'] for source in backfill_sources)
+    failed = sum(source['failed'] for source in backfill_sources)
+    not_found = sum(source['not_found'] for source in backfill_sources)
+    status = f'\rIn flight: {in_flight} | Backfill: {successful} ok, {not_found} 404, {failed} failed'
+    for source in live_sources:
+        status += f" | {source['family']['name']} live: {source['successful']} ok (next ID {source['next_id']}, max remote {source['max_remote_id']})"
+    sys.stdout.write(status + ' ')
+    sys.stdout.flush()
+
+def wait_for_next_sync(live_sources, sync_interval, maintenance):
+    next_poll_time = min(source['last_poll'] for source in live_sources) + sync_interval
+    families = list({source['family']['key']: source['family'] for source in live_sources}.values())
+    for i in range(max(1, int(next_poll_time - time.time())), 0, -1):
+        highest_ids = ', '.join(f"{source['family']['name']} {source['next_id'] - 1}" for source in live_sources)
+        sys.stdout.write(f'\rCurrent highest IDs: {highest_ids} (Waiting {i} seconds for next sync) ')
+        sys.stdout.flush()
+        second_started_at = time.time()
+        run_maintenance_slice(families, maintenance)
+        if wait_for_shutdown(max(0, 1 - (time.time() - second_started_at))):
+            break
+    sys.stdout.write('\r' + ' ' * 80 + '\r')
+    sys.stdout.flush()
+
+def run_scheduler(pool, cookies_ref, backfill_sources, live_sources=(), concurrency=None, backfill_share=SCHEDULER_BACKFILL_SHARE, sync_interval=SYNC_INTERVAL, routes=None, drain_timeout=SHUTDOWN_DRAIN_TIMEOUT, seal_packs=False, backfill_done_event=None):
+    live_sources = list(live_sources)
+    routes = routes or load_egress_routes()
+    print(f"\n--- Scheduler: {', '.join(source['name'] for source in backfill_sources + live_sources)} ---")
+    concurrency = concurrency or pool._processes * 2
+    completions = queue.Queue()
+    in_flight = 0
+    dispatched_backfill = 0
+    dispatched_live = 0
+    auth_paused = False
+    auth_error_occurred = False
+    auth_failed = []
+    retry_queue = []
+    route_retries = {}
+    refreshes_without_success = 0
+    draining = False
+    drain_deadline = None
+    last_status_time = 0
+    maintenance = {}
+    try:
+        while True:
+            if not draining and is_shutdown_requested():
+                draining = True
+                drain_deadline = time.time() + drain_timeout
+                print(f"\nShutdown requested: waiting up to {drain_timeout} seconds for {in_flight} in-flight requests.")
+            if not auth_paused and not draining:
+                for live_source in live_sources:
+                    if time.time() - live_source['last_poll'] >= sync_interval:
+                        poll_live_source(live_source)
+                        if seal_packs:
+                            seal_finished_packs(live_source['family'])
+            if backfill_done_event and not backfill_done_event.is_set() and not retry_queue and all(source['exhausted'] for source in backfill_sources):
+                backfill_done_event.set()
+            route_blocked = False
+            while not auth_paused and not draining and in_flight < concurrency:
+                retry_index, route_index = pick_retry_item(retry_queue, routes)
+                if retry_index is None:
+                    source = pick_next_source(backfill_sources, live_sources, backfill_share, dispatched_backfill, dispatched_live)
+                    if source is None:
+                        route_blocked = bool(retry_queue)
+                        break
+                    route_index = pick_egress_route(routes)
+                    if route_index is None:
+                        route_blocked = True
+                        break
+                if retry_index is not None:
+                    source, id = retry_queue.pop(retry_index)[:2]
+                elif source['live']:
+                    id = take_live_source(source)
+                    dispatched_live += 1
+                else:
+                    id = take_work_source(source)
+                    dispatched_backfill += 1
+                take_egress_route(routes, route_index)
+                pool.apply_async(fetch_data, args=(source['family']['key'], id, route_index),
+                                 callback=lambda result, source=source, id=id, route_index=route_index: completions.put((source, id, route_index, result)),
+                                 error_callback=lambda e, source=source, id=id, route_index=route_index: completions.put((source, id, route_index, e)))
+                in_flight += 1
+            if in_flight == 0:
+                if draining:
+                    break
+                if auth_paused:
+                    unrefreshed_routes = None
+                    if refreshes_without_success < SESSION_REFRESH_MAX_ATTEMPTS:
+                        unrefreshed_routes = refresh_failed_routes(cookies_ref, routes, {route_index for source, id, route_index in auth_failed})
+                    if unrefreshed_routes is not None:
+                        refreshes_without_success += 1
+                        print(f"Re-queueing {len(auth_failed)} IDs that failed authentication.")
+                        retry_queue.extend((source, id, route_index if route_index in unrefreshed_routes else None)
+                                           for source, id, route_index in reversed(auth_failed))
+                        auth_failed = []
+                        auth_paused = False
+                        continue
+                    for source, id, route_index in auth_failed:
+                        source['failed'] += 1
+                    auth_error_occurred = True
+                    break
+                if route_blocked:
+                    wait_for_shutdown(get_route_wait_time(routes))
+                    continue
+                if not live_sources:
+                    break
+                wait_for_next_sync(live_sources, sync_interval, maintenance)
+                continue
+            try:
+                source, id, route_index, result = completions.get(timeout=1 if not route_blocked else get_route_wait_time(routes))
+            except queue.Empty:
+                if draining and time.time() >= drain_deadline:
+                    print(f"\nShutdown deadline reached with {in_flight} requests still in flight, leaving them outstanding.")
+                    break
+                continue
+            in_flight -= 1
+            if isinstance(result, Exception):
+                print(f"\nError processing {source['family']['name']} ID {id} from pool: {result}")
+                result = 'other_error'
+            record_route_result(routes, route_index, result)
+            if result == 'success':
+                source['successful'] += 1
+                complete_work_item(source, id)
+                refreshes_without_success = 0
+            elif result == '404':
+                source['not_found'] += 1
+                complete_work_item(source, id)
+            elif result == 'auth_error':
+                if not auth_paused:
+                    print(f"\nAuthentication error for {source['family']['name']} ID {id}. Pausing dispatch to refresh the session.")
+                auth_paused = True
+                auth_failed.append((source, id, route_index))
+            elif result == 'route_error' and len(routes) > 1 and route_retries.get((source['name'], id), 0) < EGRESS_MAX_RETRIES:
+                route_retries[(source['name'], id)] = route_retries.get((source['name'], id), 0) + 1
+                retry_queue.append((source, id, route_index))
+            else:
+                source['failed'] += 1
+                complete_work_item(source, id)
+            if result != 'route_error':
+                route_retries.pop((source['name'], id), None)
+            flush_source_checkpoints(backfill_sources)
+            if draining and in_flight > 0 and time.time() >= drain_deadline:
+                print(f"\nShutdown deadline reached with {in_flight} requests still in flight, leaving them outstanding.")
+                break
+            if time.time() - last_status_time >= 0.5:
+                print_scheduler_status(in_flight, backfill_sources, live_sources)
+                last_status_time = time.time()
+    finally:
+        flush_source_checkpoints(backfill_sources, force=True)
+    print_scheduler_status(in_flight, backfill_sources, live_sources)
+    print()
+    for source in backfill_sources + live_sources:
+        if source['dispatched'] > 0:
+            print(f"{source['name']}: {source['dispatched']} dispatched, {source['successful']} successful, {source['not_found']} 404, {source['failed']} failed.")
+    print_route_summary(routes)
+    print(f"Transfer: {format_transfer_stats()}.")
+    return not auth_error_occurred
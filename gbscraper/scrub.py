@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+import zlib
+
+from .checkpoints import start_checkpoint
+from .db import get_db_connection, record_raw_documents
+from .idranges import count_id_ranges, normalize_id_ranges
+from .packs import PACK_EXTENSION, PACK_READ_ERRORS, list_range_archives, load_pack_index, read_pack_record
+from .shutdown import open_worker_pool
+
+SCRUB_PHASE_NAME = "Phase S: Corrupt Raw Files"
+SCRUB_SOURCES = ('pack', 'file', 'zip')
+
+def check_raw_document(raw_bytes):
+    try:
+        json.loads(raw_bytes.decode('utf-8'))
+        return True
+    except ValueError:
+        return False
+
+def add_scrubbed_copy(copies, id, source, raw_bytes):
+    if raw_bytes is None:
+        copies.setdefault(id, []).append((source, None, 0, False))
+    else:
+        copies.setdefault(id, []).append((source, hashlib.sha256(raw_bytes).digest(), len(raw_bytes), check_raw_document(raw_bytes)))
+
+def scrub_range(data_dir, range_name, extension):
+    range_path = os.path.join(data_dir, range_name)
+    pack_path = range_path + PACK_EXTENSION
+    copies = {}
+    errors = []
+    if os.path.isfile(pack_path):
+        try:
+            entries = load_pack_index(pack_path)[1]
+            with open(pack_path, 'rb') as f:
+                for id, entry in sorted(entries.items()):
+                    try:
+                        add_scrubbed_copy(copies, id, 'pack', read_pack_record(f, entry, data_dir))
+                    except PACK_READ_ERRORS:
+                        add_scrubbed_copy(copies, id, 'pack', None)
+        except PACK_READ_ERRORS as e:
+            errors.append(f'{pack_path}: {e}')
+    if os.path.isdir(range_path):
+        with os.scandir(range_path) as entries:
+            for entry in entries:
+                if entry.name.endswith(extension) and entry.name[:-len(extension)].isdigit():
+                    try:
+                        with open(entry.path, 'rb') as f:
+                            add_scrubbed_copy(copies, int(entry.name[:-len(extension)]), 'file', f.read())
+                    except OSError:
+                        add_scrubbed_copy(copies, int(entry.name[:-len(extension)]), 'file', None)
+    if os.path.isfile(range_path + '.zip'):
+        try:
+            with zipfile.ZipFile(range_path + '.zip', 'r') as zipf:
+                for name in zipf.namelist():
+                    if name.endswith(extension) and name[:-len(extension)].isdigit():
+                        try:
+                            add_scrubbed_copy(copies, int(name[:-len(extension)]), 'zip', zipf.read(name))
+                        except (OSError, EOFError, zipfile.BadZipFile, zlib.error):
+                            add_scrubbed_copy(copies, int(name[:-len(extension)]), 'zip', None)
+        except (OSError, zipfile.BadZipFile) as e:
+            errors.append(f'{range_path}.zip: {e}')
+    return range_name, copies, errors
+
+def scrub_range_task(task):
+    return scrub_range(*task)
+
+def is_good_copy(copy, recorded_sha256):
+    return copy[3] and (recorded_sha256 is None or copy[1] == recorded_sha256)
+
+def judge_scrubbed_copies(id_copies, recorded_sha256):
+    for copy in id_copies:
+        if is_good_copy(copy, recorded_sha256):
+            return copy[1], copy[2], True
+    return recorded_sha256 or id_copies[0][1], id_copies[0][2], False
+
+def print_scrub_progress(family, done, total, document_count, started_at):
+    elapsed = time.time() - started_at
+    rate = document_count / elapsed if elapsed > 0 else 0
+    sys.stdout.write(f"\rScrubbing {family['name']} raw store: ({done}/{total}) ranges, {document_count} documents ({rate:.0f} documents/s) ")
+    sys.stdout.flush()
+
+def scrub_raw_store(family, processes=None):
+    data_dir = family['raw_data_dir']
+    if not os.path.isdir(data_dir):
+        print(f"Raw data directory {data_dir} not found. Skipping scrub.")
+        return
+    range_names = sorted(list_range_archives(data_dir), key=lambda range_name: int(range_name.split('-')[0]))
+    print(f"Scrubbing {len(range_names)} {family['name']} raw data ranges (packs, range folders and zips)...")
+    document_count = 0
+    bad_copy_counts = dict.fromkeys(SCRUB_SOURCES, 0)
+    corrupt_ids = []
+    started_at = time.time()
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        tasks = [(data_dir, range_name, family['raw_file_extension']) for range_name in range_names]
+        with open_worker_pool(processes or os.cpu_count() or 1) as scrub_pool:
+            for done, (range_name, copies, errors) in enumerate(scrub_pool.imap_unordered(scrub_range_task, tasks), 1):
+                for error in errors:
+                    print(f"\nUnreadable raw archive {error}")
+                start_id, end_id = (int(part) for part in range_name.split('-'))
+                c.execute('SELECT id, sha256 FROM raw_documents WHERE id BETWEEN ? AND ?', (start_id, end_id))
+                recorded = dict(c.fetchall())
+                rows = []
+                for id, id_copies in sorted(copies.items()):
+                    sha256, size, valid = judge_scrubbed_copies(id_copies, recorded.get(id))
+                    for copy in id_copies:
+                        if not is_good_copy(copy, recorded.get(id)):
+                            bad_copy_counts[copy[0]] += 1
+                    if not valid:
+                        corrupt_ids.append(id)
+                    rows.append((id, sha256, size, valid))
+                record_raw_documents(c, rows)
+                conn.commit()
+                document_count += len(copies)
+                print_scrub_progress(family, done, len(tasks), document_count, started_at)
+        duplicate_count = c.execute('SELECT COUNT(*) - COUNT(DISTINCT sha256) FROM raw_documents WHERE valid = 1').fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"\nDatabase error during scrub for {family['name']}: {e}")
+        return
+    finally:
+        if conn:
+            conn.close()
+    print(f"\nScrub finished in {time.time() - started_at:.1f}s: {document_count} documents checked, "
+          f"{', '.join(f'{count} bad {source} copies' for source, count in bad_copy_counts.items())}, "
+          f"{len(corrupt_ids)} IDs without a good copy, {duplicate_count} documents duplicating another payload.")
+    if corrupt_ids:
+        corrupt_ranges = normalize_id_ranges((id, id) for id in corrupt_ids)
+        start_checkpoint(family, SCRUB_PHASE_NAME, corrupt_ranges)
+        print(f"Queued {count_id_ranges(corrupt_ranges)} corrupt IDs for refetch in {SCRUB_PHASE_NAME}; the next scraping run fetches them from the network.")
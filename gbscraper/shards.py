@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import stat
+import time
+
+from .db import (DB_BUSY_TIMEOUT_MS, SHARD_TABLES, add_missing_data_columns, configure_db_connection, coverage_remove_range,
+                 create_detail_tables, get_coverage_ranges, get_db_connection, get_last_id_from_db, get_shard_path, load_shards)
+from .idranges import clip_id_ranges, count_id_ranges
+from .indexes import get_index_sql, quote_columns
+
+SHARD_SIZE = 5000000
+SHARD_MOVE_CHUNK_SIZE = 50000
+
+def get_shard_file(family, start_id, end_id):
+    return os.path.join(f"{os.path.splitext(os.path.basename(family['database_file']))[0]}_shards", f'{start_id}-{end_id}.db')
+
+def set_shard_state(family, start_id, state, row_count=None):
+    conn = get_db_connection(family)
+    try:
+        if state == 'sealed':
+            conn.execute("UPDATE shards SET state = 'sealed', row_count = ?, sealed = ? WHERE start_id = ?", (row_count, time.time(), start_id))
+        else:
+            conn.execute('UPDATE shards SET state = ? WHERE start_id = ?', (state, start_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def unseal_shard(family, shard):
+    start_id, end_id, shard_file, state = shard
+    if state == 'sealed':
+        os.chmod(get_shard_path(family, shard_file), stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+        set_shard_state(family, start_id, 'open')
+
+def open_shard_connection(family, shard):
+    shard_path = get_shard_path(family, shard[2])
+    os.makedirs(os.path.dirname(shard_path), exist_ok=True)
+    conn = sqlite3.connect(shard_path, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    configure_db_connection(conn)
+    c = conn.cursor()
+    c.execute('PRAGMA journal_mode = WAL')
+    c.execute('ATTACH DATABASE ? AS catalog', (family['database_file'],))
+    table_sql = c.execute("SELECT sql FROM catalog.sqlite_master WHERE type = 'table' AND name = 'data'").fetchone()[0]
+    c.execute(table_sql.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+    add_missing_data_columns(c, family)
+    create_detail_tables(c)
+    conn.commit()
+    return conn
+
+def move_rows_into_shard(conn, start_id, end_id, chunk_size=SHARD_MOVE_CHUNK_SIZE):
+    c = conn.cursor()
+    columns = quote_columns(row[1] for row in c.execute('PRAGMA catalog.table_info(data)'))
+    detail_columns = {table: quote_columns(row[1] for row in c.execute(f'PRAGMA catalog.table_info({table})')) for table in SHARD_TABLES[1:]}
+    moved = 0
+    for chunk_start_id in range(start_id, end_id + 1, chunk_size):
+        chunk_end_id = min(chunk_start_id + chunk_size - 1, end_id)
+        c.execute(f'INSERT OR REPLACE INTO main.data ({columns}) SELECT {columns} FROM catalog.data WHERE id BETWEEN ? AND ?', (chunk_start_id, chunk_end_id))
+        moved += c.rowcount
+        for table, column_list in detail_columns.items():
+            c.execute(f'DELETE FROM main.{table} WHERE id IN (SELECT id FROM catalog.data WHERE id BETWEEN ? AND ?)', (chunk_start_id, chunk_end_id))
+            c.execute(f'INSERT OR REPLACE INTO main.{table} ({column_list}) SELECT {column_list} FROM catalog.{table} WHERE id BETWEEN ? AND ?',
+                      (chunk_start_id, chunk_end_id))
+        conn.commit()
+        for table in reversed(SHARD_TABLES):
+            c.execute(f'DELETE FROM catalog.{table} WHERE id BETWEEN ? AND ?', (chunk_start_id, chunk_end_id))
+        conn.commit()
+    return moved
+
+def seal_shard(family, conn, shard):
+    start_id, end_id, shard_file, state = shard
+    c = conn.cursor()
+    for name, columns in family['indexes'].items():
+        c.execute(get_index_sql(name, 'data', columns))
+    row_count = c.execute('SELECT COUNT(*) FROM main.data').fetchone()[0]
+    conn.commit()
+    c.execute('DETACH DATABASE catalog')
+    c.execute('ANALYZE')
+    c.execute('VACUUM')
+    c.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+    os.chmod(get_shard_path(family, shard_file), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    set_shard_state(family, start_id, 'sealed', row_count)
+    return row_count
+
+def count_overlay_rows(c, start_id, end_id):
+    return c.execute('SELECT COUNT(*) FROM data WHERE id BETWEEN ? AND ?', (start_id, end_id)).fetchone()[0]
+
+def settle_shard(family, shard):
+    started_at = time.time()
+    unseal_shard(family, shard)
+    conn = open_shard_connection(family, shard)
+    try:
+        moved = move_rows_into_shard(conn, shard[0], shard[1])
+        row_count = seal_shard(family, conn, shard)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    print(f"Shard {shard[2]}: moved {moved} rows from the main database, sealed read-only with {row_count} rows ({time.time() - started_at:.1f}s).")
+
+def delete_shard_rows(family, shard, start_id, end_id):
+    unseal_shard(family, shard)
+    conn = open_shard_connection(family, shard)
+    try:
+        c = conn.cursor()
+        for table in reversed(SHARD_TABLES):
+            c.execute(f'DELETE FROM main.{table} WHERE id BETWEEN ? AND ?', (start_id, end_id))
+        deleted_count = c.rowcount
+        conn.commit()
+        seal_shard(family, conn, shard)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return deleted_count
+
+def shard_database(family, shard_size=SHARD_SIZE):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        shards = {shard[0]: shard for shard in load_shards(c)}
+        attach_limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        last_id = get_last_id_from_db(family)
+        present_ranges = get_coverage_ranges(family, 'present')
+        targets = []
+        for start_id in range(1, last_id, shard_size):
+            end_id = start_id + shard_size - 1
+            if end_id >= last_id:
+                break
+            overlaps_shard = any(shard[0] <= end_id and start_id <= shard[1] for shard in shards.values())
+            if not overlaps_shard and count_id_ranges(clip_id_ranges(present_ranges, start_id, end_id)) == shard_size:
+                if len(shards) >= attach_limit:
+                    print(f"Not creating more {family['name']} shards: queries can attach at most {attach_limit}. Use a larger --shard-size.")
+                    break
+                shard = (start_id, end_id, get_shard_file(family, start_id, end_id), 'open')
+                c.execute("INSERT INTO shards (start_id, end_id, path, state) VALUES (?, ?, ?, 'open')", (start_id, end_id, shard[2]))
+                conn.commit()
+                shards[start_id] = shard
+                targets.append(shard)
+        for shard in shards.values():
+            if shard not in targets and (shard[3] != 'sealed' or count_overlay_rows(c, shard[0], shard[1])):
+                targets.append(shard)
+        conn.close()
+        conn = None
+        if not targets:
+            print(f"{family['name']} shards are up to date ({len(shards)} sealed).")
+            return
+        print(f"Sharding {family['name']}: {len(targets)} ID ranges to move into read-only shard files.")
+        for shard in sorted(targets):
+            settle_shard(family, shard)
+    except sqlite3.Error as e:
+        print(f"\nDatabase error while sharding {family['name']}: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def print_shard_summary(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        shards = load_shards(c)
+        if not shards:
+            return
+        overlay_count = sum(count_overlay_rows(c, shard[0], shard[1]) for shard in shards)
+        print(f"{family['name']} shards: {len(shards)} files holding IDs {shards[0][0]}-{shards[-1][1]}, "
+              f"{overlay_count} newer rows for sharded IDs held in the main database until the next --shard run.")
+        for shard in shards:
+            if shard[3] != 'sealed':
+                print(f"Shard {shard[2]} was left open by an interrupted --shard run. Run --shard again to finish it and seal it read-only.")
+    except sqlite3.Error as e:
+        print(f"Database error reading {family['name']} shards: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def cleanup_null_rows_from_top(family):
+    conn = None
+    try:
+        conn = get_db_connection(family)
+        c = conn.cursor()
+        c.execute("SELECT end_id FROM coverage_ranges WHERE kind = 'present' ORDER BY start_id DESC LIMIT 1")
+        row = c.fetchone()
+        if row is None:
+            return
+        highest_db_id = row[0]
+        c.execute("SELECT start_id, end_id FROM coverage_ranges WHERE kind = 'null' ORDER BY start_id DESC LIMIT 1")
+        top_null_range = c.fetchone()
+        if top_null_range is None or top_null_range[1] != highest_db_id:
+            return
+        null_start_id = top_null_range[0]
+        print(f"Highest {family['name']} database ID ({highest_db_id}) is a NULL row. Starting top-down contiguous NULL row cleanup...")
+        deleted_count = 0
+        for shard in load_shards(c):
+            if shard[0] <= highest_db_id and null_start_id <= shard[1]:
+                deleted_count += delete_shard_rows(family, shard, max(shard[0], null_start_id), min(shard[1], highest_db_id))
+        c.execute('DELETE FROM data WHERE id BETWEEN ? AND ?', (null_start_id, highest_db_id))
+        deleted_count += c.rowcount
+        coverage_remove_range(c, 'present', null_start_id, highest_db_id)
+        coverage_remove_range(c, 'null', null_start_id, highest_db_id)
+        conn.commit()
+        print(f"Contiguous NULL row cleanup finished. Deleted {deleted_count} rows.")
+    except sqlite3.Error as e:
+        print(f"Database error during NULL row cleanup: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred during NULL row cleanup: {e}")
+    finally:
+        if conn:
+            conn.close()
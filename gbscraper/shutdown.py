@@ -0,0 +1,58 @@
+import contextlib
+import multiprocessing
+import signal
+import threading
+
+SHUTDOWN_DRAIN_TIMEOUT = 30
+POOL_CLOSE_TIMEOUT = 10
+
+shutdown_event = threading.Event()
+
+def handle_shutdown_signal(signum, frame):
+    if shutdown_event.is_set():
+        raise KeyboardInterrupt
+    shutdown_event.set()
+    print(f"\n{signal.Signals(signum).name} received. Stopping dispatch and finishing in-flight requests (send again to force quit)...")
+
+def install_shutdown_handlers():
+    signal.signal(signal.SIGINT, handle_shutdown_signal)
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+
+def reset_worker_signal_handlers():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+def is_shutdown_requested():
+    return shutdown_event.is_set()
+
+def wait_for_shutdown(seconds):
+    return shutdown_event.wait(seconds)
+
+def close_worker_pool(pool, timeout=POOL_CLOSE_TIMEOUT):
+    pool.close()
+    join_thread = threading.Thread(target=pool.join)
+    join_thread.daemon = True
+    join_thread.start()
+    join_thread.join(timeout)
+    if join_thread.is_alive():
+        print(f"Worker processes did not exit within {timeout} seconds, terminating them.")
+        terminate_worker_pool(pool)
+
+def terminate_worker_pool(pool):
+    terminate_thread = threading.Thread(target=pool.terminate)
+    terminate_thread.daemon = True
+    terminate_thread.start()
+    while terminate_thread.is_alive():
+        for worker in list(pool._pool):
+            if worker.exitcode is None:
+                worker.kill()
+        terminate_thread.join(0.1)
+    pool.join()
+
+@contextlib.contextmanager
+def open_worker_pool(processes, initializer=reset_worker_signal_handlers, initargs=()):
+    pool = multiprocessing.Pool(processes, initializer=initializer, initargs=initargs)
+    try:
+        yield pool
+    finally:
+        terminate_worker_pool(pool)
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+from gbscraper import fetch
+from gbscraper.auth import COOKIE_FILE, load_cookies, save_cookies
+from gbscraper.egress import make_egress_route, quarantine_route
+from gbscraper.scheduler import pick_retry_item, refresh_failed_routes
+from gbscraper.shutdown import terminate_worker_pool
+
+PROXY_ENV_KEYS = ['http_proxy', 'https_proxy', 'all_proxy', 'no_proxy', 'HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'NO_PROXY']
+
+class MockResultHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = 200 if 'session=fresh' in self.headers.get('Cookie', '') else 403
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+class MockProxyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.forwarded.append(self.path)
+        request = urllib.request.Request(self.path, headers={'Cookie': self.headers.get('Cookie', '')})
+        try:
+            with urllib.request.build_opener(urllib.request.ProxyHandler({})).open(request) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_server(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.forwarded = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_cookies(value):
+    cookies = requests.cookies.RequestsCookieJar()
+    cookies.set('session', value)
+    return cookies
+
+def get_status(url, route_index):
+    try:
+        fetch.http_get(url, route_index)
+        return 200
+    except requests.HTTPError as e:
+        return e.response.status_code
+
+class CookieBroadcastTest(unittest.TestCase):
+    def setUp(self):
+        self.saved_env = {key: os.environ.pop(key) for key in PROXY_ENV_KEYS if key in os.environ}
+        self.saved_cwd = os.getcwd()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.temp_dir.name)
+        self.server = start_mock_server(MockResultHandler)
+        self.proxy = start_mock_server(MockProxyHandler)
+        self.pool = None
+
+    def tearDown(self):
+        if self.pool:
+            terminate_worker_pool(self.pool)
+        self.server.shutdown()
+        self.proxy.shutdown()
+        os.chdir(self.saved_cwd)
+        self.temp_dir.cleanup()
+        os.environ.update(self.saved_env)
+
+    def test_each_route_logs_its_own_account_in_again(self):
+        for cookie_file in (COOKIE_FILE, 'account_a.json', 'account_b.json', 'account_c.json'):
+            save_cookies(make_cookies('stale'), cookie_file)
+        for account in ('a', 'b'):
+            with open(f'credentials_{account}.json', 'w') as f:
+                json.dump({'username': account, 'password': 'secret'}, f)
+        routes = [make_egress_route({'name': 'direct', 'cookie_file': 'account_a.json', 'credentials_file': 'credentials_a.json'}),
+                  make_egress_route({'name': 'proxy', 'proxy': f'http://127.0.0.1:{self.proxy.server_port}',
+                                     'cookie_file': 'account_b.json', 'credentials_file': 'credentials_b.json'}),
+                  make_egress_route({'name': 'no-credentials', 'cookie_file': 'account_c.json'})]
+        self.pool = fetch.create_worker_pool(1, load_cookies(COOKIE_FILE), routes=routes)
+        url = f'http://127.0.0.1:{self.server.server_port}/v5/cpu/1'
+        self.assertEqual([self.pool.apply(get_status, (url, route_index)) for route_index in range(len(routes))], [403, 403, 403])
+
+        with mock.patch('gbscraper.auth.login_and_get_cookies', side_effect=lambda username, password: make_cookies(f'fresh-{username}')):
+            unrefreshed_routes = refresh_failed_routes([None], routes, {0, 1, 2})
+
+        self.assertEqual(unrefreshed_routes, [2])
+        self.assertGreater(routes[2]['quarantined_until'], time.time())
+        self.assertEqual([self.pool.apply(get_status, (url, route_index)) for route_index in range(len(routes))], [200, 200, 403])
+        self.assertEqual(len(self.proxy.forwarded), 2)
+        self.assertEqual([load_cookies(cookie_file).get('session') for cookie_file in (COOKIE_FILE, 'account_a.json', 'account_b.json', 'account_c.json')],
+                         ['stale', 'fresh-a', 'fresh-b', 'stale'])
+
+class RetryDispatchTest(unittest.TestCase):
+    def test_blocked_retry_does_not_hold_back_other_work(self):
+        routes = [make_egress_route({'name': 'a'}), make_egress_route({'name': 'b'})]
+        quarantine_route(routes[1], 'is unhealthy', 60)
+        retry_queue = [('source', 6, None), ('source', 5, 0)]
+        self.assertEqual(pick_retry_item(retry_queue, routes), (0, 0))
+        self.assertEqual(pick_retry_item(retry_queue[1:], routes), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()